@@ -32,21 +32,6 @@ def open_file(file_name, data_header):
     temp_log_w.writerow(data_header)
     return log_file
 
-def calibrated_temps(temp, TC):
-    if "Tip" in TC:
-        RawRange = 179.8
-        ReferenceRange = 169.3
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 150.7
-    if "Ceramic" in TC:
-        RawRange = 179.7
-        ReferenceRange = 169.5
-        ActualTemp = (((temp + 159.9) * ReferenceRange) / RawRange) - 150.9
-    # if "Flange" in TC:
-    #     RawRange = 1797
-    #     ReferenceRange = 169.1
-    #     ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 149.2
-    return ActualTemp
-
 def signal_handler(signum, frame):
     raise KeyboardInterrupt
 
@@ -1,11 +1,151 @@
 #include <IO_AD7150.h>
 
+// 0: ASCII CSV lines at 9600 baud (default)
+// 1: fixed-size binary frames, decoded on the host by ad7150_frames.py
+#define BINARY_FRAMES 0
+#define BINARY_BAUD 115200
+
+// 1: continuous conversion, each result is read as soon as RDY goes low
+// 0: the original single conversion + delay(20) + power down cycle
+#define CONTINUOUS 1
+
+// Conversions averaged into each output sample, the host changes it with
+// an "AVG <n>" line (1..MAX_AVG). The output rate is the conversion rate / n.
+// Single-conversion mode keeps one reading per line, as it always printed
+#if CONTINUOUS
+#define DEFAULT_AVG 10
+#else
+#define DEFAULT_AVG 1
+#endif
+#define MAX_AVG 4096
+
+// Binary frame, 18 bytes, little endian:
+//   sync (0xA55A) | seq | t_us (micros) | adc_sum | count | capdac | range code | crc16
+// adc_sum is the sum of count raw conversions, t_us the time of the last one.
+// crc16 is CRC-16/CCITT-FALSE over seq..range code
+#define FRAME_SYNC 0xA55A
+
+struct __attribute__((packed)) AD7150_Frame {
+  uint16_t sync;
+  uint16_t seq;
+  uint32_t t_us;
+  uint32_t adcSum;
+  uint16_t count;
+  uint8_t capdac;
+  uint8_t rangeCode;
+  uint16_t crc;
+};
+
 IO_AD7150 ad7150;
-AD7150_Values result;
+AD7150_Frame frame;
+uint16_t frameSeq = 0;
+
+uint16_t avgCount = DEFAULT_AVG;
+uint32_t adcSum = 0;
+uint16_t adcCount = 0;
+
+char command[16];
+uint8_t commandLen = 0;
+
+uint16_t crc16(const uint8_t *data, uint8_t len)
+{
+  uint16_t crc = 0xFFFF;
+  while (len--) {
+    crc ^= (uint16_t)(*data++) << 8;
+    for (uint8_t i = 0; i < 8; i++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(uint32_t t_us, uint8_t capdac, uint8_t rangeCode)
+{
+  frame.sync = FRAME_SYNC;
+  frame.seq = frameSeq++;
+  frame.t_us = t_us;
+  frame.adcSum = adcSum;
+  frame.count = adcCount;
+  frame.capdac = capdac;
+  frame.rangeCode = rangeCode;
+  frame.crc = crc16((const uint8_t *)&frame.seq, offsetof(AD7150_Frame, crc) - offsetof(AD7150_Frame, seq));
+  Serial.write((const uint8_t *)&frame, sizeof(frame));
+}
+
+void printLine(uint8_t capdac, uint8_t rangeCode)
+{
+  float inputRange = IO_AD7150::rangePF(rangeCode);
+  float adc = (float)adcSum / adcCount;
+
+  // Calculate absolute capacitance
+  float capacitance = (adc - 12288.0) / 40944.0 * inputRange + capdac * 12.5/64;
+
+//  Print CSV line: ADC,CAPDAC,InputRange,Capacitance
+//  Averaged ADC values keep two decimals, single conversions print as integers
+  if (adcCount > 1)
+    Serial.print(adc, 2);            // ADC
+  else
+    Serial.print(adcSum);            // ADC
+  Serial.print(",");
+  Serial.print(capdac);              // CAPDAC
+  Serial.print(",");
+  Serial.print(inputRange);          // Input Range
+  Serial.print(",");
+  Serial.println(capacitance, adcCount > 1 ? 6 : 5);   // Capacitance
+}
+
+// Accumulates one conversion, emits a sample once avgCount are in
+void addConversion(uint16_t value, uint32_t t_us)
+{
+  adcSum += value;
+  adcCount++;
+  if (adcCount < avgCount)
+    return;
+
+  // CAPDAC can move in auto offset mode, so read it per output sample
+  uint8_t capdac = ad7150.readCapdac();
+  uint8_t rangeCode = ad7150.readRangeCode();
+#if BINARY_FRAMES
+  // Raw values only, capacitance is computed on the host
+  sendFrame(t_us, capdac, rangeCode);
+#else
+  printLine(capdac, rangeCode);
+#endif
+  adcSum = 0;
+  adcCount = 0;
+}
+
+// Host commands, one per line. "AVG <n>" sets the number of conversions averaged
+void readCommands()
+{
+  while (Serial.available()) {
+    char c = Serial.read();
+    if (c != '\n' && c != '\r') {
+      if (commandLen < sizeof(command) - 1)
+        command[commandLen++] = c;
+      continue;
+    }
+    command[commandLen] = '\0';
+    if (strncmp(command, "AVG ", 4) == 0) {
+      long n = atol(command + 4);
+      if (n >= 1 && n <= MAX_AVG) {
+        avgCount = n;
+        // Start a fresh average with the new length
+        adcSum = 0;
+        adcCount = 0;
+      }
+    }
+    commandLen = 0;
+  }
+}
 
 void setup()
 {
+#if BINARY_FRAMES
+  Serial.begin(BINARY_BAUD);
+#else
   Serial.begin(9600);
+#endif
   Wire.begin();
 
   ad7150.begin();
@@ -22,12 +162,27 @@ void setup()
   digitalWrite(A4, LOW);
   digitalWrite(A5, LOW);
 
+#if CONTINUOUS
+  ad7150.configure(AD7150_MODE_CONT_CONV);
+#endif
+
+#if !BINARY_FRAMES
   // Print CSV header once
   Serial.println("ADC,CAPDAC,InputRange,Capacitance");
+#endif
 }
 
 void loop()
 {
+  readCommands();
+
+#if CONTINUOUS
+  // Poll RDY and read each result as soon as it is there, no fixed delays
+  if (ad7150.isReady()) {
+    uint32_t t_us = micros();
+    addConversion(ad7150.readData(), t_us);
+  }
+#else
 //  // Start a single conversion
   ad7150.configure(AD7150_MODE_SING_CONV);
   delay(20); // Wait for conversion/
@@ -36,20 +191,9 @@ void loop()
   ad7150.configure(AD7150_MODE_POWER_DOWN);
 //
 //  Read the values
-  result = ad7150.getValue();
-//
-  // Calculate absolute capacitance (optional)
-  float capacitance = (float)(result.value - 12288.0) / 40944.0 * result.inputRange + result.capdac * 12.5/64;
-//
-//  Print everything
-//  Print CSV line: ADC,CAPDAC,InputRange,Capacitance
-  Serial.print(result.value);        // ADC
-  Serial.print(",");
-  Serial.print(result.capdac);       // CAPDAC
-  Serial.print(",");
-  Serial.print(result.inputRange);   // Input Range
-  Serial.print(",");
-  Serial.println(capacitance, 5);       // Capacitance
+  uint32_t t_us = micros();
+  addConversion(ad7150.readData(), t_us);
 
   delay(100);
+#endif
 }
@@ -55,85 +55,92 @@ void IO_AD7150::setRange(AD7150_adRange_t range)
   m_range = range;
 }
 
-AD7150_Values IO_AD7150::getValue(void)
+void IO_AD7150::readRegisters(uint8_t reg, uint8_t *data, uint8_t count)
 {
-  uint8_t data[3];
-
   // set register pointer
-  Wire.beginTransmission(AD7150_I2C_ADDRESS);
-  Wire.write(0);
+  Wire.beginTransmission(m_i2cAddress);
+  Wire.write(reg);
   Wire.endTransmission(false);
 
-
-  Wire.requestFrom(AD7150_I2C_ADDRESS, 3, true);  
-  for (int i = 0; Wire.available(); i++)
+  Wire.requestFrom(m_i2cAddress, count, (uint8_t)true);
+  for (uint8_t i = 0; Wire.available() && i < count; i++)
   {
     data[i] = Wire.read();
   }
+}
 
-  uint16_t val = data[2] | data[1] << 8;
-  uint8_t status = data[0];
-
-  // read CAPDAC
+uint8_t IO_AD7150::readStatus(void)
+{
+  uint8_t status = 0xFF;
+  readRegisters(AD7150_REG_STATUS, &status, 1);
+  return status;
+}
 
-  // set register pointer
-  Wire.beginTransmission(AD7150_I2C_ADDRESS);
-  Wire.write(AD7150_REG_CH1_CAPDAC);
-  Wire.endTransmission(false);
+/**************************************************************************/
+/*!
+    @brief  True once a channel 1 conversion has finished. RDY1 (status
+            bit 0) is active low and clears again when the data is read.
+*/
+/**************************************************************************/
+bool IO_AD7150::isReady(void)
+{
+  return (readStatus() & 0x01) == 0;
+}
 
-  Wire.requestFrom(AD7150_I2C_ADDRESS, 1, true);
-  for (int i = 0; Wire.available(); i++)
-  {
-    data[i] = Wire.read();
-  }
-  uint8_t capdac = data[0] & 0x3f;
+uint16_t IO_AD7150::readData(void)
+{
+  uint8_t data[2] = {0, 0};
+  readRegisters(AD7150_REG_CH1_DATA_HIGH, data, 2);
+  return data[1] | data[0] << 8;
+}
 
-  //read input range
-  Wire.beginTransmission(AD7150_I2C_ADDRESS);
-  Wire.write(AD7150_REG_CH1_SETUP);
-  Wire.endTransmission(false);
+uint8_t IO_AD7150::readCapdac(void)
+{
+  uint8_t capdac = 0;
+  readRegisters(AD7150_REG_CH1_CAPDAC, &capdac, 1);
+  return capdac & 0x3f;
+}
 
-  Wire.requestFrom(AD7150_I2C_ADDRESS, 1, true);
-  for (int i = 0; Wire.available(); i++)
-  {
-    data[i] = Wire.read();
-  }
-  uint8_t range = data[0];
+uint8_t IO_AD7150::readRangeCode(void)
+{
+  uint8_t range = 0;
+  readRegisters(AD7150_REG_CH1_SETUP, &range, 1);
 
   bool range_H = (range & 0x80) >> 7; // 0x80 = 1000 0000
   bool range_L = (range & 0x40) >> 6; // 0x40 = 0100 0000
 
   // Combine bits into a 2-bit index
-  uint8_t index = (range_H << 1) | range_L;
-
-  float inputRangePF;
-  // float capdacStep;
+  return (range_H << 1) | range_L;
+}
 
-  // Use a switch to map the 2-bit value
-  switch (index) {
+float IO_AD7150::rangePF(uint8_t rangeCode)
+{
+  // Map the 2-bit range code to the input range in pF
+  switch (rangeCode & 0x03) {
       case 0b00:
-          inputRangePF = 2.0;
-          // capdacStep = 4;
-          break;
+          return 2.0;
       case 0b01:
-          inputRangePF = 0.5;
-          // capdacStep = 1;
-          break;
+          return 0.5;
       case 0b10:
-          inputRangePF = 1.0;
-          // capdacStep = 2;
-          break;
-      case 0b11:
-          inputRangePF = 4.0;
-          // capdacStep = 8;
-          break;
+          return 1.0;
+      default:
+          return 4.0;
   }
+}
+
+AD7150_Values IO_AD7150::getValue(void)
+{
+  uint8_t data[3] = {0, 0, 0};
+
+  // status and channel 1 data in one transfer
+  readRegisters(AD7150_REG_STATUS, data, 3);
 
   AD7150_Values result;
-  result.status = status;
-  result.value = val;
-  result.capdac = capdac;
-  result.inputRange = inputRangePF;
+  result.status = data[0];
+  result.value = data[2] | data[1] << 8;
+  result.capdac = readCapdac();
+  result.rangeCode = readRangeCode();
+  result.inputRange = rangePF(result.rangeCode);
 
   return result;
 }
@@ -80,6 +80,7 @@ struct AD7150_Values {
   uint8_t status;
   uint16_t value;
   uint8_t capdac;
+  uint8_t rangeCode;    // RNG bits of the setup register: 0 = 2 pF, 1 = 0.5 pF, 2 = 1 pF, 3 = 4 pF
   float inputRange;
 };
 
@@ -100,6 +101,13 @@ protected:
   void setOffset(AD7150_adOffset_t offset);
   void setRange(AD7150_adRange_t range);
   AD7150_Values getValue(void);
+  uint8_t readStatus(void);
+  bool isReady(void);
+  uint16_t readData(void);
+  uint8_t readCapdac(void);
+  uint8_t readRangeCode(void);
+  static float rangePF(uint8_t rangeCode);
 
  private:
+  void readRegisters(uint8_t reg, uint8_t *data, uint8_t count);
 };
@@ -7,12 +7,12 @@ Works with 3 Adafruit MAX31865 digital converters, a 8-relay and a Sensirion SFM
 
 import time
 import csv
-import keyboard
 import os
 import board
 import digitalio
 import adafruit_max31865
 import PID
+from loop_scheduler import LoopScheduler, pid_sample_time
 from datetime import datetime as dt
 from datetime import timedelta
 import serial
@@ -36,23 +36,6 @@ def open_file(file_name,data_header):
     #Returns the log file so it can be saved as a variable and manipulated later
     return log_file     
 
-def calibrated_temps(temp, TC):
-    #if temp > 35:
-    #    raise Exception('Temperature has reached too high on TC {}'.format(TC))
-    if 'Tip' in TC:
-        RawRange = 179.8
-        ReferenceRange = 169.3
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 150.7
-    if 'Ceramic' in TC:
-        RawRange = 179.7
-        ReferenceRange = 169.5
-        ActualTemp = (((temp + 159.9) * ReferenceRange) / RawRange) - 150.9
-    if 'Flange' in TC:
-        RawRange = 1797
-        ReferenceRange = 169.1
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 149.2
-        
-    return ActualTemp
     
 def signal_handler(signum, frame):
     raise KeyboardInterrupt
@@ -105,24 +88,27 @@ if __name__ == '__main__':
     I1 = 1.2*0.2/60
     D1 = 3*0.2*60/40
     
-    #Create PID control
-    controllerF = PID.PID(P1, I1, D1)
+    #set time for loop in seconds
+    loop_time = 0.2
+
+    #Create PID control, stepped on the loop's scheduled deadlines
+    controllerF = PID.PID(P1, I1, D1, current_time=time.monotonic())
     
     #Initialize the controller        
     controllerF.SetPoint = targetT1             
-    controllerF.setSampleTime(0.25)
+    controllerF.setSampleTime(pid_sample_time(loop_time))
 
     Ledger=np.array([[], [], [], [], [], []])
     
     #try and except statement used to catch error and log them to a specified file
     try:     
         runlen = 1
-        #set time for loop in seconds
-        loop_time = 0.2 
         #number of loops that get averaged to the log
         itt_len = 15 
         # keep track of when the loop starts so that we keep a consistant loop runtime
         start_time = time.time() 
+        # paces the loop on absolute monotonic deadlines
+        pacer = LoopScheduler(loop_time)
             
         #Keeps doing the loop
         while True:
@@ -169,7 +155,7 @@ if __name__ == '__main__':
             temp_Flange = Flange.temperature #calibrated_temps(Flange.temperature,'Flange')
             
             #Update the pid controlers
-            controllerF.update(temp_Tip) 
+            controllerF.update(temp_Tip, pacer.deadline) 
 
             MV1 = 10
             MV1 = controllerF.output # get the new pid values
@@ -212,11 +198,8 @@ if __name__ == '__main__':
             #print('{}, {}, {}'.format(Tip.temperature, Ceramic.temperature, Flange.temperature))
             #print(Ledger[:,-1:])
             runlen += 1
-            # how long was it running?
-            elapsed = time.time() - start_time
-            #make loop run every 0.25 seconds 
-            if elapsed < loop_time: time.sleep(loop_time-elapsed) 
-            else: time.sleep(0.1)
+            #wait for the next loop_time deadline
+            pacer.wait()
             
     #Opens the relay when program interrupted and writes to error log if need be
     except KeyboardInterrupt:
@@ -232,7 +215,9 @@ if __name__ == '__main__':
             traceback.print_exc(file=file)
             file.write('\n')
         traceback.print_exc()
-    #finally:
+    finally:
         #Relay.value = False
+        if 'pacer' in locals():
+            print(pacer.summary())
 
         
@@ -6,56 +6,44 @@ Works with 3 Adafruit MAX31865 digital converters, a 8-relay and a Sensirion SFM
 """
 
 import time
-import csv
-import keyboard
 import os
-import board
-import digitalio
-import adafruit_max31865
 import PID
+from loop_scheduler import LoopScheduler, pid_sample_time
+from stage_timer import StageTimer
+from log_rotation import RotationPolicy
+from log_writer import open_log
 from datetime import datetime as dt
 from datetime import timedelta
-import serial
 import numpy as np
 import signal
 import sys
 import traceback
-import busio
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+from live_plot import open_plot
+from shared_ring import SharedRing
 
-def log_temps(f_name,header,data):
-    with open(os.path.join(ROOT_DIR, 'Logs', f_name), 'a', encoding='UTF8', newline='') as log_file:
-        temp_log_w=csv.writer(log_file)
-        temp_log_w.writerow(data)
+# --- Conditional Imports for Mocking ---
+if os.environ.get('TEST_MODE') == '1':
+    print("Running in TEST_MODE: Using mock hardware modules.")
+    from mocks import board, busio, digitalio, adafruit_max31865, serial
+else:
+    import board
+    import busio
+    import digitalio
+    import adafruit_max31865
+    import serial
+# --- End Conditional Imports ---
+
+def log_temps(log_file,header,data):
+    #Queues the row, the background writer appends it to the open log file
+    log_file.write(data)
 
 def open_file(file_name,data_header):
     #Open the log file in the Log subfolder of the working directory with the specified filename
-    log_file = open(os.path.join(ROOT_DIR, 'Logs', file_name),'w',encoding='UTF8', newline='')     
-    temp_log_w = csv.writer(log_file)
     #Writes the data header for the csv file
-    temp_log_w.writerow(data_header)     
-    
-    #Returns the log file so it can be saved as a variable and manipulated later
-    return log_file     
+    #Returns the log writer so it can be saved as a variable and manipulated later
+    #The writer moves on to a new gzipped segment every 4Mb
+    return open_log(os.path.join(ROOT_DIR, 'Logs'), file_name, data_header, rotation=RotationPolicy())
 
-def calibrated_temps(temp, TC):
-    #if temp > 35:
-    #    raise Exception('Temperature has reached too high on TC {}'.format(TC))
-    if 'Tip' in TC:
-        RawRange = 179.8
-        ReferenceRange = 169.3
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 150.7
-    if 'Ceramic' in TC:
-        RawRange = 179.7
-        ReferenceRange = 169.5
-        ActualTemp = (((temp + 159.9) * ReferenceRange) / RawRange) - 150.9
-    if 'Flange' in TC:
-        RawRange = 1797
-        ReferenceRange = 169.1
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 149.2
-        
-    return ActualTemp
     
 def signal_handler(signum, frame):
     raise KeyboardInterrupt
@@ -107,36 +95,48 @@ if __name__ == '__main__':
     I1 = 1.2*0.2/60
     D1 = 3*0.2*60/40
     
-    #Create PID control
-    controllerF = PID.PID(P1, I1, D1)
+    #set time for loop in seconds, the flow readline and three RTD
+    #conversions take about 0.75 s so a shorter period can't be kept
+    loop_time = 1.0
+
+    #Create PID control, stepped on the loop's scheduled deadlines
+    controllerF = PID.PID(P1, I1, D1, current_time=time.monotonic())
     
     #Initialize the controller        
     controllerF.SetPoint = targetT1             
-    controllerF.setSampleTime(0.25)
+    controllerF.setSampleTime(pid_sample_time(loop_time))
 
     Ledger=np.array([[], [], [], [], [], []])
+
+    #Every sample is published in shared memory, the live plot (a separate process, none when headless)
+    #and other readers take it from there so the control loop never waits on them
+    sample_ring = SharedRing.create(200, ['time', 'temp_tip', 'temp_ceramic', 'temp_flange', 'flow', 'mv'],
+                                    name='cryoprobe_realtime')
+    plot_layout = [
+        {'ylabel': 'Temperature (°C)', 'title': 'Real-Time Slow Control Cryogenic Probe', 'margin': 5,
+         'lines': [(1, 'Tip Temperature', 'b-'), (2, 'Ceramic Temperature', 'r-'), (3, 'Flange Temperature', 'g-')]},
+    ]
+    plotter = open_plot(sample_ring, plot_layout, interval=1.0)
+    plot_start = time.time()
     
     #try and except statement used to catch error and log them to a specified file
     try:     
         runlen = 1
-        #set time for loop in seconds
-        loop_time = 0.2 
-        #number of loops that get averaged to the log
-        itt_len = 15 
+        #number of loops that get averaged to the log, about 3 s
+        itt_len = 3
         # keep track of when the loop starts so that we keep a consistant loop runtime
         start_time = time.time() 
+        # paces the loop on absolute monotonic deadlines
+        pacer = LoopScheduler(loop_time)
+        # per-stage timings, summarised every minute; kill -USR1 toggles them
+        timer = StageTimer(os.path.join(ROOT_DIR, 'Logs', 'stage_times.txt'))
             
         #Keeps doing the loop
         while True:
+            timer.start()
             
             print('**********************')
             
-            #checks if the current log file is 4Mb, if it is it creates a new log file
-            #if os.stat(os.path.join(ROOT_DIR, 'Logs', data_f_name)).st_size>= 4194304:      
-            #    data_f_name='Temp_log_{}.csv'.format(dt.now().strftime('%m-%d-%Y, %H-%M'))
-            #    log_file.close()
-            #    log_file = open_file(data_f_name, data_header)
-            
             #Reads the tip, ceramic and flange temperatures
             #Tip.initiate_one_shot_measurement()
             #Ceramic.initiate_one_shot_measurement()
@@ -149,6 +149,7 @@ if __name__ == '__main__':
             ser.flushInput()
             ser.flushOutput()
             flow = ser.readline().decode('utf-8')
+            timer.lap('flow')
             #flow = (rawflow-SF)/OF
             
             end_time = time.time()
@@ -163,98 +164,37 @@ if __name__ == '__main__':
             #Print data
             print('N2 Flow (slm):', flow , end = "" )
             print('Time:', elapsed_time, 'sec')
-            print('Tip:', round(Tip.temperature,3), 'C')
-            print('Ceramic:', round(Ceramic.temperature,3), 'C')
-            print('Flange:', round(Flange.temperature,3), 'C')
-            
+            #Each .temperature is a new conversion, read every RTD once
             temp_Tip = Tip.temperature #calibrated_temps(Tip.temperature, 'Tip')
             temp_Ceramic = Ceramic.temperature #calibrated_temps(Ceramic.temperature,'Ceramic')
             temp_Flange = Flange.temperature #calibrated_temps(Flange.temperature,'Flange')
+            timer.lap('spi')
+
+            print('Tip:', round(temp_Tip,3), 'C')
+            print('Ceramic:', round(temp_Ceramic,3), 'C')
+            print('Flange:', round(temp_Flange,3), 'C')
             
             #Update the pid controlers
-            controllerF.update(temp_Tip) 
+            controllerF.update(temp_Tip, pacer.deadline) 
 
             MV1 = 10
             MV1 = controllerF.output # get the new pid values
             print('MV:', MV1)
+            timer.lap('pid')
             
              
             #Write to temp log file
-            log_temps(data_f_name, data_header,[elapsed_time, round(Tip.temperature,3), round(Ceramic.temperature,3), round(Flange.temperature,3), flow, round(MV1,3)])    
+            log_temps(log_file, data_header,[elapsed_time, round(temp_Tip,3), round(temp_Ceramic,3), round(temp_Flange,3), flow, round(MV1,3)])    
             #log_file.flush()
+            timer.lap('log')
             
-            #*****
-            #Initialize global data lists
-            time_data = []
-            tip_data = []
-            ceramic_data = []
-            flange_data = []
-
-            #Initialize time tracking
-            start_time = time.time()
-
-            #Create the figure and axis
-            fig, ax = plt.subplots()
-            line1, = ax.plot([], [], 'b-', label='Tip Temperature')
-            line2, = ax.plot([], [], 'r-', label='Ceramic Temperature')
-            line3, = ax.plot([], [], 'g-', label='Flange Temperature')
-
-
-            #Initialize variables to track the min and max values
-            y_min = float('inf')
-            y_max = float('-inf')
-            #Set graph to continuously update
-            def update(frame):
-                global line1, line2, line3
-                current_time = time.time() - start_time
-                global y_min, y_max
-    
-                #Read sensor data
-                tip_temp = Tip.temperature
-                ceramic_temp = Ceramic.temperature
-                flange_temp = Flange.temperature
-    
-                time_data.append(current_time)
-                tip_data.append(tip_temp)
-                ceramic_data.append(ceramic_temp)
-                flange_data.append(flange_temp)
-    
-                #Creating a new graph or updating the graph
-                line1.set_data(time_data, tip_data)
-                line2.set_data(time_data, ceramic_data)
-                line3.set_data(time_data, flange_data)
-    
-                #plt.xlim(time_data[0], time_data[-1]) *this didn't work, use if statement for x limits
-                if len(time_data) > 1:
-                    x_min = min(time_data)
-                    x_max = max(time_data)
-                    if x_max == x_min:
-                        x_max += 1  # Expand the range if limits are the same
-                    plt.xlim(x_min, x_max)
-    
-                #Autoscale the y_min and y_max values based on data
-                all_data = tip_data + ceramic_data + flange_data
-                y_min = min(all_data) - 5
-                y_max = max(all_data) + 5
-
-                #Update y-axis limits if they have changed
-                if ax.get_ylim()[0] != y_min or ax.get_ylim()[1] != y_max:
-                    ax.set_ylim(y_min, y_max)
-
-
-            #Create the animation for real-time 
-            ani = FuncAnimation(fig, update, interval=1000, frames=None, cache_frame_data=False)
-
-            # Labeling the plot
-            plt.xlabel('Time (s)')
-            plt.ylabel('Temperature (°C)')
-            plt.title('Real-Time Slow Control Cryogenic Probe')
-            plt.legend()
-            plt.xticks(rotation=45)  #Rotate x labels for better readability
-
-            # Show the plot
-            plt.tight_layout()
-            plt.show()
+            #Publish the sample, the plot window redraws from its own process
+            try:
+                flow_slm = float(flow)
+            except ValueError:
+                flow_slm = float('nan')
+            sample_ring.push((time.time() - plot_start, temp_Tip, temp_Ceramic, temp_Flange, flow_slm, MV1))
+            timer.lap('plot')
 
             #temp too low, close valve
             if MV1 > 0:      
@@ -269,7 +209,11 @@ if __name__ == '__main__':
             #time_stamp= dt.now().strftime('%H:%M:%S')  
               
             Ledger=np.append(Ledger, [[elapsed_time], [temp_Tip], [temp_Ceramic], [temp_Flange], [flow], [MV1]], axis=1)
+            timer.lap('relay')
+            timer.end()
 
+            #wait for the next loop_time deadline
+            pacer.wait()
             
     #Opens the relay when program interrupted and writes to error log if need be
     except KeyboardInterrupt:
@@ -295,7 +239,7 @@ if __name__ == '__main__':
                 Ceramic_avg=np.average(Ledger[2,-itt_len:].astype('float32'))
                 Flange_avg=np.average(Ledger[3,-itt_len:].astype('float32'))
                 #write to temp log file
-                log_temps(data_f_name,data_header,[elapsed_time, Tip_avg, Ceramic_avg, Flange_avg, flow])     
+                log_temps(log_file,data_header,[elapsed_time, Tip_avg, Ceramic_avg, Flange_avg, flow])     
                 #pushes the data collected this loop to the csv.
                 log_file.flush() 
                 runlen = 0
@@ -308,10 +252,13 @@ if __name__ == '__main__':
             #print('{}, {}, {}'.format(Tip.temperature, Ceramic.temperature, Flange.temperature))
             #print(Ledger[:,-1:])
         runlen += 1
-            # how long was it running?
-        elapsed = time.time() - start_time
-            #make loop run every 0.25 seconds 
-        if elapsed < loop_time: time.sleep(loop_time-elapsed) 
-        else: time.sleep(0.1)
- 
-            
+    finally:
+        if 'pacer' in locals():
+            print(pacer.summary())
+        if 'timer' in locals():
+            timer.write_summary()
+        #Drain queued rows and close the log file
+        log_file.close()
+        if plotter is not None:
+            plotter.terminate()
+        sample_ring.close()
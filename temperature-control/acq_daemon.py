@@ -0,0 +1,439 @@
+"""
+Acquisition daemon for the tip temperatures, the AD7150 capacitance and the flow meter.
+
+monitor.py, the capacitance scripts and flowmeter.py each own a serial port
+and poll it from their own loop, and the capacitance and flow scripts both
+default to /dev/ttyACM0. This daemon runs all three instruments in one
+asyncio event loop:
+
+    - the serial ports are read by the loop as data arrives (add_reader on the
+      port's file descriptor, polling for ports without one), split into
+      AD7150 lines or binary frames and flow meter lines
+    - the MAX31865 reads block for ~75 ms each, they run on a one-thread
+      executor that owns the SPI bus, paced on absolute deadlines
+    - every sample goes to a Hub that fans it out to the consumers' bounded
+      queues: the controller (PID on the tip, driving the LN2 relay), the
+      loggers (one CSV per source, in gzipped segments) and the shared sample ring read by
+      the live plot and the browser dashboard (--dashboard PORT)
+
+A consumer that falls behind loses its oldest samples, never the others'.
+
+    python acq_daemon.py --cap-port /dev/ttyACM1 --flow-port /dev/ttyACM0
+    TEST_MODE=1 python acq_daemon.py --duration 60 --dashboard 8050
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import signal
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt, timedelta
+
+import PID
+from ad7150_frames import FrameDecoder
+from ad7150_reader import CapSample, frame_samples, parse_line
+from dashboard import Dashboard
+from live_plot import open_plot
+from loop_scheduler import pid_sample_time
+from log_rotation import RotationPolicy, zstandard
+from log_writer import open_log
+from shared_ring import SharedRing
+
+# --- Conditional Imports for Mocking ---
+if os.environ.get('TEST_MODE') == '1':
+    print("Running in TEST_MODE: Using mock hardware modules.")
+    from mocks import board, digitalio, adafruit_max31865, serial
+else:
+    import board
+    import digitalio
+    import adafruit_max31865
+    import serial
+# --- End Conditional Imports ---
+
+ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
+
+# source is 'temps' (dict of sensor name -> C), 'cap' (CapSample), 'flow'
+# (slm) or 'mv' (controller output); t is the event loop's monotonic clock,
+# the scheduled deadline of the read for 'temps'
+Sample = namedtuple('Sample', ['source', 't', 'value'])
+
+# Sensor name -> chip select pin, as wired for monitor.py
+RTD_PINS = {'Tip': 'D19', 'Ceramic': 'D16'}
+
+
+class Hub:
+    """Fans samples out to every subscriber's bounded queue"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.dropped = {}
+        self.published = {}
+
+    def subscribe(self, name, maxsize=256):
+        q = asyncio.Queue(maxsize)
+        self.subscribers[name] = q
+        self.dropped[name] = 0
+        return q
+
+    def publish(self, sample):
+        self.published[sample.source] = self.published.get(sample.source, 0) + 1
+        for name, q in self.subscribers.items():
+            if q.full():
+                # Drop the subscriber's oldest sample, it only ever falls behind on its own
+                q.get_nowait()
+                self.dropped[name] += 1
+            q.put_nowait(sample)
+
+
+class LineSplitter:
+    """Whole lines out of arbitrary chunks of a byte stream"""
+
+    def __init__(self, max_line=4096):
+        self._buf = b''
+        self.max_line = max_line
+
+    def feed(self, data):
+        self._buf += data
+        *lines, self._buf = self._buf.split(b'\n')
+        if len(self._buf) > self.max_line:
+            self._buf = b''
+        return lines
+
+
+class SerialStream:
+    """Reads a serial port from the event loop and passes each chunk to on_data(bytes, t)
+
+    The port must be opened with timeout=0 so reads never block.
+    """
+
+    def __init__(self, name, ser, on_data, poll_interval=0.02):
+        self.name = name
+        self.ser = ser
+        self.on_data = on_data
+        self.poll_interval = poll_interval
+        self.bytes = 0
+        self.errors = 0
+        self._loop = None
+        self._fd = None
+        self._task = None
+
+    def start(self, loop):
+        self._loop = loop
+        try:
+            self._fd = self.ser.fileno()
+        except (AttributeError, OSError):
+            self._fd = None
+        if self._fd is not None:
+            loop.add_reader(self._fd, self._readable)
+        else:
+            self._task = loop.create_task(self._poll())
+        return self
+
+    def stop(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _read(self):
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except (OSError, serial.SerialException) as e:
+            self.errors += 1
+            print('{} port error: {}'.format(self.name, e))
+            self.stop()
+            return
+        if data:
+            self.bytes += len(data)
+            self.on_data(data, self._loop.time())
+
+    def _readable(self):
+        self._read()
+
+    async def _poll(self):
+        # Ports without a file descriptor (mocks)
+        while True:
+            self._read()
+            await asyncio.sleep(self.poll_interval)
+
+
+def cap_parser(hub, binary):
+    """on_data callback publishing the AD7150 samples"""
+    if binary:
+        decoder = FrameDecoder()
+
+        def on_data(data, t):
+            frames = decoder.feed(data)
+            if len(frames):
+                for sample in frame_samples(decoder, frames, t):
+                    hub.publish(Sample('cap', t, sample))
+        return on_data
+
+    splitter = LineSplitter()
+
+    def on_data(data, t):
+        for line in splitter.feed(data):
+            fields = parse_line(line)
+            if fields is not None:
+                hub.publish(Sample('cap', t, CapSample(t, *fields)))
+    return on_data
+
+
+def flow_parser(hub):
+    """on_data callback publishing the flow meter readings in slm"""
+    splitter = LineSplitter()
+
+    def on_data(data, t):
+        for line in splitter.feed(data):
+            try:
+                hub.publish(Sample('flow', t, float(line.decode('ascii', errors='replace').strip())))
+            except ValueError:
+                pass
+    return on_data
+
+
+def read_temperatures(sensors):
+    """{name: C} of the RTDs, runs on the SPI executor thread"""
+    return {name: sensor.temperature for name, sensor in sensors.items()}
+
+
+async def poll_temperatures(hub, sensors, period, executor):
+    """Reads every RTD once per period, on absolute deadlines
+
+    Samples are stamped with their deadline rather than the time the read
+    returned, so the controller sees whole periods between them.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
+    while True:
+        temps = await loop.run_in_executor(executor, read_temperatures, sensors)
+        hub.publish(Sample('temps', deadline, temps))
+        deadline += period
+        now = loop.time()
+        if now >= deadline:
+            # Overran, keep to the grid like LoopScheduler's 'skip' policy
+            deadline += ((now - deadline) // period + 1) * period
+        await asyncio.sleep(deadline - now)
+
+
+# ------------------ Consumers ------------------
+async def control(hub, q, relay, feedback, setpoint, gains, sample_time):
+    """PID on one temperature, switching the LN2 relay like monitor.py"""
+    controller = PID.PID(*gains, current_time=asyncio.get_running_loop().time())
+    controller.SetPoint = setpoint
+    controller.setSampleTime(sample_time)
+    while True:
+        sample = await q.get()
+        if sample.source != 'temps' or feedback not in sample.value:
+            continue
+        controller.update(sample.value[feedback], sample.t)
+        mv = controller.output
+        relay.value = mv > 0
+        hub.publish(Sample('mv', sample.t, mv))
+
+
+async def log_samples(q, logs, t0):
+    """Writes each sample to the log of its source"""
+    while True:
+        sample = await q.get()
+        log_file = logs.get(sample.source)
+        if log_file is None:
+            continue
+        elapsed = str(timedelta(seconds=sample.t - t0))
+        if sample.source == 'temps':
+            log_file.write([elapsed] + [round(v, 3) for v in sample.value.values()])
+        elif sample.source == 'cap':
+            cap = sample.value
+            log_file.write([elapsed, cap.adc, cap.capdac, cap.input_range, cap.capacitance])
+        elif sample.source == 'mv':
+            log_file.write([elapsed, round(sample.value, 3), int(sample.value > 0)])
+        else:
+            log_file.write([elapsed, sample.value])
+
+
+async def publish_samples(q, ring, names, t0):
+    """Pushes the latest value of every channel to the shared ring on each temperature sample"""
+    nan = float('nan')
+    cap = flow = mv = nan
+    while True:
+        sample = await q.get()
+        if sample.source == 'cap':
+            cap = sample.value.capacitance
+        elif sample.source == 'flow':
+            flow = sample.value
+        elif sample.source == 'mv':
+            mv = sample.value
+        elif sample.source == 'temps':
+            ring.push([sample.t - t0] + [sample.value.get(n, nan) for n in names] + [cap, flow, mv])
+
+
+async def report(hub, streams, interval):
+    """Prints the sample counts every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        print(dt.now().strftime('%H:%M:%S'), ' '.join('{}={}'.format(k, v) for k, v in sorted(hub.published.items())),
+              ' '.join('{}_bytes={}'.format(s.name, s.bytes) for s in streams), flush=True)
+
+
+# ------------------ Daemon ------------------
+def open_serial(port, baudrate):
+    # timeout=0: reads return what has arrived and never block the event loop
+    return serial.Serial(port=port, baudrate=baudrate, timeout=0)
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    hub = Hub()
+    t0 = loop.time()
+    stamp = dt.now().strftime('%m-%d-%Y, %H-%M-%S')
+    log_dir = os.path.join(ROOT_DIR, 'Logs')
+    names = list(args.rtd)
+    rotation = RotationPolicy(args.rotate_mb * 1024 * 1024 if args.rotate_mb else None, args.rotate_interval,
+                              compress=args.compress)
+    durability = {'fsync_interval': args.fsync_interval or None, 'checksum': args.checksum}
+
+    spi = board.SPI()
+    sensors = {name: adafruit_max31865.MAX31865(spi, digitalio.DigitalInOut(getattr(board, pin)), wires=2)
+               for name, pin in args.rtd.items()}
+    relay = digitalio.DigitalInOut(board.D6)
+    relay.direction = digitalio.Direction.OUTPUT
+    relay.value = False
+    # The SPI bus is used from this one thread only
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spi')
+
+    logs = {'temps': open_log(log_dir, 'Acq temps {}.csv'.format(stamp), ['Real time'] + names, rotation=rotation,
+                              **durability)}
+    streams = []
+    if args.cap_port:
+        logs['cap'] = open_log(log_dir, 'Acq cap {}.csv'.format(stamp),
+                               ['Real time', 'ADC', 'CAPDAC', 'InputRange', 'Capacitance'], rotation=rotation,
+                               **durability)
+        cap_ser = open_serial(args.cap_port, 115200 if args.cap_binary else 9600)
+        streams.append(SerialStream('cap', cap_ser, cap_parser(hub, args.cap_binary)))
+    if args.flow_port:
+        logs['flow'] = open_log(log_dir, 'Acq flow {}.csv'.format(stamp), ['Real time', 'Flow'], rotation=rotation,
+                                **durability)
+        streams.append(SerialStream('flow', open_serial(args.flow_port, 115200), flow_parser(hub)))
+    if args.control:
+        logs['mv'] = open_log(log_dir, 'Acq control {}.csv'.format(stamp), ['Real time', 'MV', 'Relay'],
+                              rotation=rotation, **durability)
+
+    plot_layout = [
+        {'ylabel': 'Temperature (C)', 'title': 'CryoProbe Acquisition',
+         'lines': [(i + 1, name, style) for i, (name, style) in enumerate(zip(names, ('b-', 'r-', 'g-', 'm-')))]},
+        {'ylabel': 'Capacitance (pF)', 'lines': [(len(names) + 1, 'Capacitance (pF)', 'g-')]},
+        {'ylabel': 'Flow (slm)', 'lines': [(len(names) + 2, 'N2 flow', 'k-')]},
+    ]
+    # Latest values for the plot and any other reader: python shared_ring.py cryoprobe_acq
+    sample_ring = SharedRing.create(200, ['time'] + ['temp_' + n.lower() for n in names] + ['capacitance', 'flow', 'mv'],
+                                    name='cryoprobe_acq')
+    plotter = open_plot(sample_ring, plot_layout)
+    dashboard = None
+    if args.dashboard:
+        dashboard = Dashboard(sample_ring, args.dashboard, args.dashboard_host).start()
+        print('Dashboard at', dashboard.url)
+
+    tasks = []
+    cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.monotonic()
+    try:
+        for stream in streams:
+            stream.start(loop)
+        if args.cap_port:
+            await asyncio.sleep(2)  # the Arduino resets when the port is opened
+            cap_ser.write('AVG {}\n'.format(args.cap_average).encode('ascii'))
+
+        tasks.append(loop.create_task(poll_temperatures(hub, sensors, args.period, executor)))
+        if args.control:
+            tasks.append(loop.create_task(control(hub, hub.subscribe('control', 16), relay, args.feedback,
+                                                  args.setpoint, (0.2 * 0.6, 1.2 * 0.2 / 60, 3 * 0.2 * 60 / 40),
+                                                  pid_sample_time(args.period))))
+        tasks.append(loop.create_task(log_samples(hub.subscribe('log', 4096), logs, t0)))
+        tasks.append(loop.create_task(publish_samples(hub.subscribe('ring', 256), sample_ring, names, t0)))
+        tasks.append(loop.create_task(report(hub, streams, args.report_interval)))
+
+        try:
+            await asyncio.wait_for(stop.wait(), args.duration)
+        except asyncio.TimeoutError:
+            pass
+        print('\nStopping')
+    finally:
+        relay.value = False
+        for stream in streams:
+            stream.stop()
+            stream.ser.close()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        executor.shutdown(wait=True)
+        for log_file in logs.values():
+            log_file.close()
+        if plotter is not None:
+            plotter.terminate()
+        if dashboard is not None:
+            dashboard.stop()
+        sample_ring.close()
+
+        cpu = resource.getrusage(resource.RUSAGE_SELF)
+        wall = time.monotonic() - wall_start
+        busy = cpu.ru_utime + cpu.ru_stime - cpu_start.ru_utime - cpu_start.ru_stime
+        print('Samples:', ', '.join('{} {}'.format(k, v) for k, v in sorted(hub.published.items())))
+        print('Dropped:', ', '.join('{} {}'.format(k, v) for k, v in sorted(hub.dropped.items())))
+        if wall > 0:
+            print('CPU {:.1f}% over {:.0f} s'.format(100 * busy / wall, wall))
+
+
+def _rtd(text):
+    name, _, pin = text.partition('=')
+    if not pin:
+        raise argparse.ArgumentTypeError('expected NAME=PIN, e.g. Tip=D19')
+    return name, pin
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Acquire temperatures, capacitance and flow in one process')
+    parser.add_argument('--cap-port', default='/dev/ttyACM1', help="AD7150 Arduino, '' to disable")
+    parser.add_argument('--cap-binary', action='store_true', help='the sketch sends binary frames (BINARY_FRAMES 1)')
+    parser.add_argument('--cap-average', type=int, default=10, help='conversions averaged per capacitance sample')
+    parser.add_argument('--flow-port', default='/dev/ttyACM0', help="flow meter Arduino, '' to disable")
+    parser.add_argument('--rtd', type=_rtd, action='append', help='MAX31865 NAME=PIN, default {}'.format(
+        ' '.join('{}={}'.format(*item) for item in RTD_PINS.items())))
+    parser.add_argument('--period', type=float, default=0.25, help='temperature period in seconds')
+    parser.add_argument('--no-control', dest='control', action='store_false', help='do not drive the LN2 relay')
+    parser.add_argument('--feedback', default='Tip', help='RTD the controller regulates')
+    parser.add_argument('--setpoint', type=float, default=-110.0)
+    parser.add_argument('--report-interval', type=float, default=10.0)
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--dashboard', type=int, metavar='PORT', help='serve the browser dashboard on this port')
+    parser.add_argument('--dashboard-host', default='127.0.0.1', help='0.0.0.0 to allow other machines')
+    parser.add_argument('--rotate-mb', type=float, default=4.0, help='log segment size, 0 for no limit')
+    parser.add_argument('--rotate-interval', type=float, metavar='SECONDS',
+                        help='also start a new segment on each multiple of this, 3600 = on the hour')
+    parser.add_argument('--compress', choices=('gzip', 'zstd', 'none'), default='gzip',
+                        help='compression of closed log segments')
+    parser.add_argument('--fsync-interval', type=float, default=5.0, metavar='SECONDS',
+                        help='sync the logs to the card this often, 0 to leave it to the OS')
+    parser.add_argument('--no-checksum', dest='checksum', action='store_false',
+                        help='do not end log rows with a CRC32')
+    args = parser.parse_args(argv)
+    args.rtd = dict(args.rtd) if args.rtd else dict(RTD_PINS)
+    args.compress = None if args.compress == 'none' else args.compress
+    if args.compress == 'zstd' and zstandard is None:
+        parser.error('--compress zstd needs the zstandard package')
+    if args.control and args.feedback not in args.rtd:
+        parser.error('--feedback {} is not one of the RTDs ({})'.format(args.feedback, ', '.join(args.rtd)))
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Decoder for the IO_AD7150 binary frame stream (BINARY_FRAMES 1 in the sketch).
+
+Each frame is 18 bytes, little endian:
+
+    sync 0xA55A | seq u16 | t_us u32 | adc_sum u32 | count u16 | capdac u8 | range code u8 | crc16 u16
+
+adc_sum is the sum of `count` raw conversions averaged on the Arduino (set
+with "AVG <n>"), t_us the MCU time of the last of them. The CRC is
+CRC-16/CCITT-FALSE over seq..range code. FrameDecoder takes raw bytes in
+arbitrary chunks and returns whole frames as a structured array, decoded with
+np.frombuffer, with the CRC checked for all frames at once. After corruption
+it resynchronises on the next sync word. Frames lost on the way show up as
+gaps in the sequence numbers.
+"""
+
+import numpy as np
+
+SYNC_WORD = 0xA55A
+SYNC = SYNC_WORD.to_bytes(2, 'little')
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', '<u2'),
+    ('t_us', '<u4'),
+    ('adc_sum', '<u4'),
+    ('count', '<u2'),
+    ('capdac', 'u1'),
+    ('range', 'u1'),
+    ('crc', '<u2'),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+# Input range in pF for each range code, as IO_AD7150::getValue maps them
+RANGE_PF = np.array([2.0, 0.5, 1.0, 4.0])
+
+# Bytes covered by the CRC
+_CRC_START = FRAME_DTYPE.fields['seq'][1]
+_CRC_END = FRAME_DTYPE.fields['crc'][1]
+
+
+def _crc_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table[byte] = crc & 0xFFFF
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(rows):
+    """CRC-16/CCITT-FALSE of each row of a 2-D uint8 array"""
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for col in rows.T:
+        crc = (crc << 8) ^ _CRC_TABLE[(crc >> 8) ^ col]
+    return crc
+
+
+def encode(seq, t_us, adc_sum, capdac, range_code, count=1):
+    """Frames in the firmware's format, for tests and simulated ports"""
+    n = len(np.atleast_1d(seq))
+    frames = np.zeros(n, dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['seq'] = seq
+    frames['t_us'] = t_us
+    frames['adc_sum'] = adc_sum
+    frames['count'] = count
+    frames['capdac'] = capdac
+    frames['range'] = range_code
+    raw = frames.view(np.uint8).reshape(n, FRAME_SIZE)
+    frames['crc'] = crc16(raw[:, _CRC_START:_CRC_END])
+    return frames.tobytes()
+
+
+def mean_adc(frames):
+    """Averaged raw ADC value of each frame"""
+    return frames['adc_sum'] / np.maximum(frames['count'], 1)
+
+
+def capacitance(frames):
+    """Absolute capacitance in pF, computed as the ASCII firmware does"""
+    adc = mean_adc(frames)
+    return (adc - 12288.0) / 40944.0 * RANGE_PF[frames['range'] & 3] + frames['capdac'] * 12.5 / 64
+
+
+def sequence_gaps(seq, previous=None):
+    """Number of frames missing before each frame of seq (uint16 wrap-around)"""
+    seq = seq.astype(np.int64)
+    if previous is None:
+        before = seq[:1] - 1
+    else:
+        before = np.array([previous], dtype=np.int64)
+    return (np.diff(seq, prepend=before) - 1) % 65536
+
+
+class FrameDecoder:
+    """Incremental frame decoder
+
+    feed() returns the valid frames completed by the new bytes. Counters:
+    frames, bad_frames (sync found but CRC wrong), skipped_bytes (bytes
+    discarded while hunting for sync), lost (frames missing from the sequence)
+    and gaps (number of places where frames went missing).
+    """
+
+    def __init__(self):
+        self._buf = b''
+        self.last_seq = None
+        self.frames = 0
+        self.bad_frames = 0
+        self.skipped_bytes = 0
+        self.lost = 0
+        self.gaps = 0
+        # MCU timestamp unwrapping, micros() wraps every ~71.6 minutes
+        self._last_t_us = None
+        self._t_epoch = 0
+
+    def feed(self, data):
+        buf = self._buf + bytes(data)
+        pos = 0
+        chunks = []
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing first sync byte, the second may be in the next chunk
+                keep = len(buf) - 1 if buf[-1:] == SYNC[:1] else len(buf)
+                self.skipped_bytes += max(keep - pos, 0)
+                pos = max(keep, pos)
+                break
+            self.skipped_bytes += start - pos
+            n = (len(buf) - start) // FRAME_SIZE
+            if n == 0:
+                pos = start
+                break
+            frames = np.frombuffer(buf, FRAME_DTYPE, count=n, offset=start)
+            raw = np.frombuffer(buf, np.uint8, count=n * FRAME_SIZE, offset=start).reshape(n, FRAME_SIZE)
+            ok = (frames['sync'] == SYNC_WORD) & (crc16(raw[:, _CRC_START:_CRC_END]) == frames['crc'])
+            good = n if ok.all() else int(np.argmin(ok))
+            if good:
+                chunks.append(frames[:good])
+                pos = start + good * FRAME_SIZE
+            else:
+                self.bad_frames += 1
+                pos = start + 1
+        self._buf = buf[pos:]
+
+        if not chunks:
+            return np.empty(0, dtype=FRAME_DTYPE)
+        frames = np.concatenate(chunks)
+        gaps = sequence_gaps(frames['seq'], self.last_seq)
+        self.lost += int(gaps.sum())
+        self.gaps += int(np.count_nonzero(gaps))
+        self.last_seq = int(frames['seq'][-1])
+        self.frames += len(frames)
+        return frames
+
+    def mcu_seconds(self, frames):
+        """MCU timestamps of frames in seconds, unwrapped across micros() overflow
+
+        Call once per feed() result, in order.
+        """
+        t = frames['t_us'].astype(np.int64)
+        if not len(t):
+            return t.astype(np.float64)
+        prev = t[0] if self._last_t_us is None else self._last_t_us
+        wraps = np.cumsum(np.diff(t, prepend=prev) < 0)
+        out = t + (self._t_epoch + wraps) * (1 << 32)
+        self._t_epoch += int(wraps[-1])
+        self._last_t_us = int(t[-1])
+        return out / 1e6
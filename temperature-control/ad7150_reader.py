@@ -0,0 +1,177 @@
+"""
+Background reader for the IO_AD7150 Arduino capacitance stream.
+
+The Arduino prints "ADC,CAPDAC,InputRange,Capacitance" lines, ADC being a
+decimal mean when it averages several conversions. Reading them with
+ser.readline() inside a control loop blocks for up to the serial timeout and
+makes the loop skip its work whenever a line is missing. AD7150Reader reads
+the port on its own thread, stamps each line with its arrival time, parses it
+into a CapSample and keeps the most recent samples in a bounded queue. The
+control loop asks for the latest value and its age and never waits.
+
+With binary=True the reader expects the sketch's binary frames instead
+(BINARY_FRAMES 1, see ad7150_frames.py). Samples then also carry the frame
+sequence number and the MCU timestamp, and lost frames are counted.
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from ad7150_frames import FRAME_SIZE, FrameDecoder, RANGE_PF, capacitance, mean_adc
+
+# t is the arrival time on the reader's clock (time.monotonic by default).
+# seq and t_mcu (seconds) are only known in binary mode.
+CapSample = namedtuple('CapSample', ['t', 'adc', 'capdac', 'input_range', 'capacitance', 'seq', 't_mcu'],
+                       defaults=(None, None))
+
+
+def parse_line(line):
+    """(adc, capdac, input_range, capacitance) from one Arduino line, None for headers and junk"""
+    if isinstance(line, bytes):
+        line = line.decode('ascii', errors='replace')
+    parts = line.strip().split(',')
+    if len(parts) != 4 or parts[0] == 'ADC':
+        return None
+    try:
+        adc = float(parts[0]) if '.' in parts[0] else int(parts[0])
+        return adc, int(parts[1]), float(parts[2]), float(parts[3])
+    except ValueError:
+        return None
+
+
+def frame_samples(decoder, frames, t):
+    """CapSamples of binary frames returned by decoder.feed(), all stamped with arrival time t"""
+    adcs = mean_adc(frames).tolist()
+    caps = capacitance(frames).tolist()
+    ranges = RANGE_PF[frames['range'] & 3].tolist()
+    t_mcu = decoder.mcu_seconds(frames).tolist()
+    return [CapSample(t, adc, capdac, rng, cap, seq, t_frame)
+            for seq, capdac, adc, cap, rng, t_frame in zip(frames['seq'].tolist(), frames['capdac'].tolist(),
+                                                           adcs, caps, ranges, t_mcu)]
+
+
+class AD7150Reader:
+    """Reads and parses the AD7150 serial stream on a background thread
+
+    When the queue is full the oldest sample is discarded, so consumers that
+    fall behind always see the newest data. latest() works whether or not
+    anyone drains the queue.
+    """
+
+    def __init__(self, ser, max_queue=1000, clock=time.monotonic, binary=False):
+        self.ser = ser
+        self.clock = clock
+        self.decoder = FrameDecoder() if binary else None
+        self.lines = 0
+        self.bad_lines = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._latest = None
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='AD7150Reader', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def latest(self):
+        """(newest sample, its age in seconds), or (None, None) before the first sample"""
+        sample = self._latest
+        if sample is None:
+            return None, None
+        return sample, self.clock() - sample.t
+
+    def get(self, timeout=None):
+        """Next queued sample, waiting up to timeout. Returns None on timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """All queued samples, oldest first, without waiting"""
+        samples = []
+        while True:
+            try:
+                samples.append(self._queue.get_nowait())
+            except queue.Empty:
+                return samples
+
+    def _publish(self, sample):
+        self._latest = sample
+        while True:
+            try:
+                self._queue.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def set_averaging(self, n):
+        """Asks the Arduino to average n conversions per sample"""
+        self.ser.write('AVG {}\n'.format(int(n)).encode('ascii'))
+
+    @property
+    def lost(self):
+        """Frames missing from the sequence (binary mode only)"""
+        return self.decoder.lost if self.decoder is not None else 0
+
+    def _run(self):
+        if self.decoder is not None:
+            self._run_binary()
+            return
+        while self._running:
+            try:
+                raw = self.ser.readline()
+            except Exception:
+                # Port went away, keep the last sample and let its age grow
+                time.sleep(0.5)
+                continue
+            t = self.clock()
+            if not raw:
+                continue
+            self.lines += 1
+            fields = parse_line(raw)
+            if fields is None:
+                self.bad_lines += 1
+                continue
+            self._publish(CapSample(t, *fields))
+
+    def _run_binary(self):
+        decoder = self.decoder
+        while self._running:
+            try:
+                # Whatever has arrived, or block (up to the port timeout) for one frame
+                raw = self.ser.read(self.ser.in_waiting or FRAME_SIZE)
+            except Exception:
+                time.sleep(0.5)
+                continue
+            t = self.clock()
+            if not raw:
+                continue
+            bad = decoder.bad_frames
+            frames = decoder.feed(raw)
+            self.bad_lines += decoder.bad_frames - bad
+            if not len(frames):
+                continue
+            self.lines += len(frames)
+            for sample in frame_samples(decoder, frames, t):
+                self._publish(sample)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
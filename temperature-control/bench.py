@@ -0,0 +1,363 @@
+"""
+Microbenchmarks of the control loop hot paths.
+
+    python bench.py                    run everything, compare with the baseline
+    python bench.py -k pid -k parse    only benchmarks whose name contains pid or parse
+    python bench.py --save-baseline    make this run the new baseline
+
+Each benchmark is calibrated to run for at least --min-time seconds per
+repeat, and the median and minimum time per operation over --repeat repeats
+are reported. Results are stored in bench_results.json under the current
+commit (with '+dirty' when the tree has changes), next to the Python version
+and host. A benchmark whose median is more than --tolerance slower than in
+bench_baseline.json is flagged and the exit status is 1.
+
+Baselines only compare well on the machine they were recorded on.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime as dt
+
+import numpy as np
+
+ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
+RESULTS_PATH = os.path.join(ROOT_DIR, 'bench_results.json')
+BASELINE_PATH = os.path.join(ROOT_DIR, 'bench_baseline.json')
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registers a setup function: setup(tmp_dir) -> (op, operations per op call)"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ------------------ Benchmarks ------------------
+@benchmark('pid_update')
+def _pid_update(tmp_dir):
+    import PID
+    pid = PID.PID(0.12, 0.004, 0.9, current_time=0.0)
+    pid.SetPoint = -110.0
+    pid.setWindup(20)
+    clock = iter(np.arange(1, 10 ** 8) * 0.25)
+
+    def op():
+        pid.update(-109.5, current_time=next(clock))
+    return op, 1
+
+
+@benchmark('pid_bank_update')
+def _pid_bank_update(tmp_dir):
+    from pid_bank import PIDBank
+    bank = PIDBank([0.12, 0.12], [0.004, 0.004], [0.9, 0.9], setpoint=[-110.0, -110.0], current_time=0.0)
+    clock = iter(np.arange(1, 10 ** 8) * 0.25)
+
+    def op():
+        bank.update((-109.5, -110.5), current_time=next(clock))
+    return op, 1
+
+
+@benchmark('calibrated_temps')
+def _calibrated_temps(tmp_dir):
+    from calibration import calibrated_temps
+    calibrated_temps(-100.0, 'HeatExB')
+
+    def op():
+        calibrated_temps(-100.0, 'HeatExB')
+    return op, 1
+
+
+@benchmark('ad7150_parse_line')
+def _ad7150_parse_line(tmp_dir):
+    from ad7150_reader import parse_line
+    line = b'47704.70,0,2.00,1.730007\r\n'
+
+    def op():
+        parse_line(line)
+    return op, 1
+
+
+@benchmark('ad7150_frame_decode')
+def _ad7150_frame_decode(tmp_dir):
+    from ad7150_frames import FrameDecoder, encode
+    n = 64
+    seq = np.arange(n)
+    data = encode(seq, seq * 100000, 47705 * 10, 0, 0, count=10)
+    decoder = FrameDecoder()
+
+    def op():
+        decoder.feed(data)
+    return op, n
+
+
+@benchmark('avg_buffer')
+def _avg_buffer(tmp_dir):
+    # The itt_len averaging of temperature_control.py
+    from ring_buffer import RingBuffer
+    avg_buffer = RingBuffer(6, 4, track_extrema=[])
+    row = (-180.0, -110.0, -110.5, 15.0)
+
+    def op():
+        avg_buffer.append(row)
+        avg_buffer.view().mean(axis=0).tolist()
+    return op, 1
+
+
+@benchmark('log_temps_csv')
+def _log_temps_csv(tmp_dir):
+    # The former log_temps of temperature_control.py: a csv.writer per row on the open file
+    log_file = open(os.path.join(tmp_dir, 'log_temps.csv'), 'w', encoding='UTF8', newline='')
+    data = ['12:00:00', -180.123, -110.456, -110.789, 15.012, 1, 0]
+
+    def op():
+        temp_log_w = csv.writer(log_file)
+        temp_log_w.writerow(data)
+    return op, 1
+
+
+@benchmark('log_writer_write')
+def _log_writer_write(tmp_dir):
+    # log_temps of monitor.py: queued for the background writer
+    from log_writer import LogWriter
+    writer = LogWriter(os.path.join(tmp_dir, 'log_writer.csv'), ['Time', 'Tip', 'Ceramic', 'MV'],
+                       max_queue=10 ** 6)
+    data = ['0:00:01.250000', -110.456, -60.789, 1.5]
+
+    def op():
+        writer.write(data)
+    return op, 1
+
+
+def _plot_frame(full):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from live_plot import BlitRenderer, build_figure, update_frame
+    from ring_buffer import RingBuffer
+
+    # monitor.py's layout and window
+    layout = [
+        {'ylabel': 'Temperature (C)', 'title': 'CryoProbe Real-Time Monitoring',
+         'lines': [(1, 'Tip Temperature', 'b-'), (2, 'Ceramic Temperature', 'r-')]},
+        {'ylabel': 'Capacitance (pF)', 'lines': [(3, 'Capacitance (pF)', 'g-')]},
+    ]
+    fig, axes, lines = build_figure(plt, layout)
+    renderer = BlitRenderer(fig, [line for _, line, _ in lines])
+    buffer = RingBuffer(200, 4)
+    rng = np.random.default_rng(0)
+    state = {'t': 0.0}
+
+    def push():
+        t = state['t'] = state['t'] + 0.25
+        buffer.append((t, -110 + rng.normal(), -60 + rng.normal(), 1.73 + rng.normal() * 1e-4))
+
+    for _ in range(200):
+        push()
+
+    def op():
+        push()
+        changed = update_frame(axes, lines, layout, buffer)
+        renderer.draw(full=full or changed)
+    return op, 1
+
+
+@benchmark('plot_frame_agg')
+def _plot_frame_agg(tmp_dir):
+    # What run_plotter does per frame
+    return _plot_frame(full=False)
+
+
+@benchmark('plot_frame_full_agg')
+def _plot_frame_full_agg(tmp_dir):
+    # Every frame drawn from scratch, for comparison
+    return _plot_frame(full=True)
+
+
+LOG_ROWS = 20000
+
+
+def _write_sample_log(tmp_dir):
+    """A temperature_control.py style log with LOG_ROWS rows"""
+    path = os.path.join(tmp_dir, 'Temp log 01-27-2026, 17-49-06.csv')
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='UTF8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Rt', 'Cold Head', 'Heat F', 'Heat B', 'Chamber', 'Heat F Status', 'Heat B Status'])
+            for i in range(LOG_ROWS):
+                s = 17 * 3600 + 49 * 60 + 6 + i
+                writer.writerow(['{:02d}:{:02d}:{:02d}'.format(s // 3600 % 24, s // 60 % 60, s % 60),
+                                 -180.0 + i * 1e-3, -110.25, -110.5, 15.0, 1, 0])
+    return path
+
+
+@benchmark('log_index_scan')
+def _log_index_scan(tmp_dir):
+    import log_index
+    path = _write_sample_log(tmp_dir)
+    start = log_index.start_from_name(os.path.basename(path)).timestamp()
+
+    def op():
+        log_index._scan_csv(path, log_index._new_entry(os.path.basename(path), start))
+    return op, LOG_ROWS
+
+
+@benchmark('replay_read_log')
+def _replay_read_log(tmp_dir):
+    from replay import read_log
+    path = _write_sample_log(tmp_dir)
+
+    def op():
+        read_log(path)
+    return op, LOG_ROWS
+
+
+# ------------------ Runner ------------------
+def measure(op, per_call, repeat=5, min_time=0.1):
+    """Seconds per operation of each repeat, op is called enough times to last min_time"""
+    op()
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls = calls * 10 if elapsed < min_time / 10 else int(calls * min_time / elapsed) + 1
+
+    times = [elapsed / (calls * per_call)]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            op()
+        times.append((time.perf_counter() - start) / (calls * per_call))
+    return times
+
+
+def commit_id():
+    """Short hash of HEAD, with '+dirty' when tracked files have changed"""
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        commit = git('rev-parse', '--short', 'HEAD')
+        return commit + ('+dirty' if git('status', '--porcelain', '--untracked-files=no') else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def load_json(path):
+    try:
+        with open(path, encoding='UTF8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='UTF8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run(names, repeat=5, min_time=0.1):
+    """{name: {'median_us', 'min_us', 'repeats_us'}} of the named benchmarks"""
+    results = {}
+    tmp_dir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        for name in names:
+            op, per_call = BENCHMARKS[name](tmp_dir)
+            times = [t * 1e6 for t in measure(op, per_call, repeat, min_time)]
+            results[name] = {'median_us': statistics.median(times), 'min_us': min(times),
+                             'repeats_us': [round(t, 4) for t in times]}
+            print('{:<22} {:>12.3f} us/op  (min {:.3f})'.format(name, results[name]['median_us'],
+                                                               results[name]['min_us']), flush=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """[(name, ratio)] of benchmarks whose median is slower than baseline by more than tolerance"""
+    slow = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if base and base['median_us'] > 0:
+            ratio = result['median_us'] / base['median_us']
+            if ratio > 1 + tolerance:
+                slow.append((name, ratio))
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the control loop hot paths')
+    parser.add_argument('-k', dest='filters', action='append', default=[],
+                        help='run benchmarks whose name contains this, may be repeated')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.1, help='seconds per repeat')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return 0
+    names = [n for n in BENCHMARKS if not args.filters or any(f in n for f in args.filters)]
+    if not names:
+        parser.error('no benchmark matches {}'.format(', '.join(args.filters)))
+
+    commit = commit_id()
+    print('Commit {}, Python {}'.format(commit, platform.python_version()))
+    record = {
+        'date': dt.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'results': run(names, args.repeat, args.min_time),
+    }
+
+    history = load_json(args.results)
+    if commit in history:
+        # Keep results of benchmarks not run this time, and startup_profile.py's
+        record['results'] = dict(history[commit].get('results', {}), **record['results'])
+        record = dict(history[commit], **record)
+    history[commit] = record
+    save_json(args.results, history)
+
+    if args.save_baseline:
+        save_json(args.baseline, dict(record, commit=commit))
+        print('Baseline saved to', args.baseline)
+        return 0
+
+    baseline = load_json(args.baseline)
+    if not baseline:
+        print('No baseline in {}, run with --save-baseline to create one'.format(args.baseline))
+        return 0
+    if baseline.get('host') != record['host']:
+        print('Baseline was recorded on {}, comparisons may be meaningless'.format(baseline.get('host')))
+    slow = regressions({n: record['results'][n] for n in names}, baseline, args.tolerance)
+    for name, ratio in slow:
+        print('REGRESSION {:<22} {:.2f}x the baseline ({})'.format(name, ratio, baseline.get('commit')))
+    if not slow:
+        print('No regressions against baseline {}'.format(baseline.get('commit')))
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Table-driven temperature calibration for the CryoProbe thermocouples and RTDs.
+
+The per-channel constants that used to live in each script's calibrated_temps()
+are kept in calibration.json and compiled once into NumPy coefficient arrays.
+A linear entry
+
+    ActualTemp = (temp + raw_offset) * reference_range / raw_range + offset
+
+becomes gain * temp + bias. An entry may instead give 'poly', the ascending
+polynomial coefficients in the raw temperature. Whole frames of channels or
+whole historical columns are then calibrated with one array expression.
+
+Offline use:
+    python calibration.py "Logs/Real_time_log_01-01-2025-12-00.csv" out.csv --map Temp_Tip=Tip,Temp_Ceramic=Ceramic
+"""
+
+import argparse
+import csv
+import json
+import os
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'calibration.json')
+
+
+def _coefficients(entry):
+    if 'poly' in entry:
+        return [float(c) for c in entry['poly']]
+    gain = float(entry.get('reference_range', 1.0)) / float(entry.get('raw_range', 1.0))
+    bias = float(entry.get('raw_offset', 0.0)) * gain + float(entry.get('offset', 0.0))
+    return [bias, gain]
+
+
+class ChannelMap:
+    """Compiled calibration for a fixed, ordered list of channels"""
+
+    def __init__(self, names, coefficients):
+        self.names = list(names)
+        degree = max(len(c) for c in coefficients)
+        # coeffs[k, i] multiplies temp**k on channel i
+        self.coeffs = np.zeros((degree, len(coefficients)))
+        for i, c in enumerate(coefficients):
+            self.coeffs[:len(c), i] = c
+        self.bias = self.coeffs[0]
+        self.gain = self.coeffs[1] if degree > 1 else np.zeros(len(coefficients))
+        self.higher = self.coeffs[2:]
+
+    def apply(self, raw):
+        """Calibrates raw, whose last axis runs over the channels of this map"""
+        raw = np.asarray(raw, dtype=float)
+        out = raw * self.gain + self.bias
+        if len(self.higher):
+            # Horner for the terms above linear
+            acc = np.zeros_like(out)
+            for c in self.higher[::-1]:
+                acc = (acc + c) * raw
+            out += acc * raw
+        return out
+
+
+class CalibrationTable:
+    """Registry of per-channel calibrations loaded from a JSON file"""
+
+    def __init__(self, entries):
+        self.entries = {name: entry for name, entry in entries.items() if not name.startswith('_')}
+        self._maps = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, encoding='UTF8') as f:
+            return cls(json.load(f))
+
+    def channels(self, names):
+        """ChannelMap for names, in that order. Unknown channels raise KeyError."""
+        key = tuple(names)
+        if key not in self._maps:
+            missing = [n for n in key if n not in self.entries]
+            if missing:
+                raise KeyError('No calibration for channel(s): {}'.format(', '.join(missing)))
+            self._maps[key] = ChannelMap(key, [_coefficients(self.entries[n]) for n in key])
+        return self._maps[key]
+
+    def calibrate(self, temp, name):
+        """Calibrates a scalar or a column of readings from one channel"""
+        out = self.channels((name,)).apply(np.asarray(temp, dtype=float)[..., np.newaxis])[..., 0]
+        return float(out) if out.ndim == 0 else out
+
+
+_default = None
+
+
+def default_table():
+    """The table from calibration.json, loaded on first use"""
+    global _default
+    if _default is None:
+        _default = CalibrationTable.load()
+    return _default
+
+
+def calibrated_temps(temp, TC):
+    """Drop-in replacement for the per-script calibrated_temps(temp, TC)"""
+    return default_table().calibrate(temp, TC)
+
+
+def calibrate_csv(in_path, out_path, column_map, table=None):
+    """Rewrites the mapped columns of a CSV log with calibrated values"""
+    table = table or default_table()
+    with open(in_path, encoding='UTF8', newline='') as f:
+        rows = list(csv.reader(f))
+    header, body = rows[0], rows[1:]
+    cols = [header.index(c) for c in column_map]
+    cmap = table.channels([column_map[c] for c in column_map])
+
+    raw = np.full((len(body), len(cols)), np.nan)
+    for r, row in enumerate(body):
+        for j, c in enumerate(cols):
+            try:
+                raw[r, j] = float(row[c])
+            except (IndexError, ValueError):
+                pass
+    calibrated = cmap.apply(raw)
+    for r, row in enumerate(body):
+        for j, c in enumerate(cols):
+            if c < len(row) and not np.isnan(calibrated[r, j]):
+                row[c] = round(calibrated[r, j], 3)
+
+    with open(out_path, 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply calibration.json to columns of a CSV log')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--map', required=True, help='column=channel pairs, comma separated')
+    parser.add_argument('--table', default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    column_map = dict(pair.split('=', 1) for pair in args.map.split(','))
+    calibrate_csv(args.input, args.output, column_map, CalibrationTable.load(args.table))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Pipelined one-shot conversions for a set of Adafruit MAX31856 thermocouple amplifiers.
+
+The scripts used to start a conversion on every chip and then block in
+_wait_for_oneshot() on each chip in turn, so the conversion time was dead
+time for the whole loop. The scheduler instead re-arms each chip as soon as
+its result has been read. The next conversion then runs while the loop does
+its PID, DAC, plotting and logging work, and collect() on the next cycle
+usually finds every result already waiting.
+"""
+
+import time
+
+
+class ConversionScheduler:
+    """Keeps one conversion in flight on every MAX31856
+
+    sensors is a list of (name, MAX31856) pairs. collect() returns the readings
+    in that order together with the estimated conversion-complete time of each
+    reading, on the clock passed in (time.monotonic by default).
+    """
+
+    def __init__(self, sensors, poll_interval=0.002, timeout=2.0, clock=time.monotonic, rate_alpha=0.1):
+        self.names = [name for name, _ in sensors]
+        self.chips = [chip for _, chip in sensors]
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.clock = clock
+        self.rate_alpha = rate_alpha
+
+        n = len(self.chips)
+        self.triggered = [None] * n
+        self.last_done = [None] * n
+        self.interval = [None] * n
+        # Conversion time learned from chips that were seen finishing
+        self.conversion_time = [None] * n
+        self.waited = 0.0
+
+    def start(self):
+        """Starts a conversion on every chip"""
+        for i, chip in enumerate(self.chips):
+            chip.initiate_one_shot_measurement()
+            self.triggered[i] = self.clock()
+
+    def _finish(self, i, seen_pending, now):
+        chip = self.chips[i]
+        value = chip.unpack_temperature()
+        # Re-arm straight away so the conversion overlaps the rest of the cycle
+        chip.initiate_one_shot_measurement()
+
+        started = self.triggered[i]
+        if seen_pending:
+            done = now
+            took = now - started
+            prev = self.conversion_time[i]
+            self.conversion_time[i] = took if prev is None else prev + self.rate_alpha * (took - prev)
+        elif self.conversion_time[i] is not None:
+            # Finished before we looked, best estimate is trigger + conversion time
+            done = min(now, started + self.conversion_time[i])
+        else:
+            done = now
+        self.triggered[i] = self.clock()
+
+        last = self.last_done[i]
+        if last is not None and done > last:
+            dt = done - last
+            prev = self.interval[i]
+            self.interval[i] = dt if prev is None else prev + self.rate_alpha * (dt - prev)
+        self.last_done[i] = done
+        return value, done
+
+    def collect(self):
+        """Waits for the conversions in flight and returns (values, completion times)"""
+        if None in self.triggered:
+            self.start()
+        n = len(self.chips)
+        values = [None] * n
+        stamps = [None] * n
+        pending = list(range(n))
+        polls = 0
+        begin = self.clock()
+
+        while pending:
+            still = []
+            now = self.clock()
+            for i in pending:
+                if self.chips[i].oneshot_pending:
+                    still.append(i)
+                else:
+                    values[i], stamps[i] = self._finish(i, polls > 0, now)
+            pending = still
+            if pending:
+                if now - begin > self.timeout:
+                    raise RuntimeError('MAX31856 conversion timed out on {}'.format(
+                        ', '.join(self.names[i] for i in pending)))
+                time.sleep(self.poll_interval)
+                polls += 1
+
+        self.waited = self.clock() - begin
+        return values, stamps
+
+    def rates(self):
+        """Achieved sample rate per channel in Hz"""
+        return {name: (1.0 / dt if dt else 0.0) for name, dt in zip(self.names, self.interval)}
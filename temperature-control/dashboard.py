@@ -0,0 +1,341 @@
+"""
+Browser dashboard for a running control script.
+
+Follows one of the shared sample rings (see shared_ring.py) and serves a page
+that plots every temperature, capacitance, controller output and flow channel
+for the whole run. No X display is needed on the Pi, only a browser anywhere
+that can reach the port.
+
+    python dashboard.py cryoprobe_monitor --port 8050
+    python acq_daemon.py --dashboard 8050       serves it from the daemon itself
+
+The history of each channel is a DownsampledTrace (lttb.py): it stays at a
+few hundred points, spread evenly over the run however long it is, so the
+page loads the same for a 12 hour cooldown as for a short test and the Pi's
+work per sample is fixed. New samples are pushed to the page with
+Server-Sent Events as they arrive.
+
+The daemon's dashboard covers the whole run. A standalone one only finds the
+rows still in the ring when it attaches (200 for acq_daemon and monitor.py,
+under a minute); give it the run's logs to fill in what came before:
+
+    python dashboard.py cryoprobe_monitor --log Logs/Real_time_log_04-15-2025-08-15.session
+
+    GET /               the page
+    GET /api/channels   panels and their channels
+    GET /api/history    {"start": epoch s, "traces": {name: [[t...], [y...]]}}, ?points=N
+    GET /api/stream     event stream, one JSON row [t, values...] per sample
+"""
+
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from lttb import DownsampledTrace
+from replay import find_column, read_log
+from shared_ring import SharedRing
+
+# Panels by channel name prefix, channels matching none of them are not shown
+PANELS = [
+    ('Temperature (C)', ('temp',)),
+    ('Capacitance (pF)', ('capacitance',)),
+    ('Controller output', ('mv', 'dac')),
+    ('Flow (slm)', ('flow',)),
+]
+
+
+def panels(names):
+    """[{'title', 'channels'}] for the channel names that have a panel"""
+    result = []
+    for title, prefixes in PANELS:
+        channels = [n for n in names[1:] if n.lower().startswith(prefixes)]
+        if channels:
+            result.append({'title': title, 'channels': channels})
+    return result
+
+
+class RingFollower:
+    """Copies new rows out of a SharedRing into per-channel histories and to stream subscribers"""
+
+    def __init__(self, ring, max_points=500, interval=0.25):
+        self.ring = ring
+        self.interval = interval
+        self.names = ring.names
+        self.shown = [n for p in panels(self.names) for n in p['channels']]
+        self._columns = [self.names.index(n) for n in self.shown]
+        self.traces = {n: DownsampledTrace(max_points) for n in self.shown}
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._seen = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='RingFollower', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(2)
+
+    def subscribe(self, maxsize=1000):
+        q = queue.Queue(maxsize)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.remove(q)
+
+    def history(self, points=None):
+        with self._lock:
+            traces = {}
+            for name, trace in self.traces.items():
+                x, y = trace.points(points)
+                traces[name] = [[round(v, 3) for v in x.tolist()], y.tolist()]
+        return {'start': self.ring.start_ns / 1e9, 'traces': traces}
+
+    def prefill(self, t, columns):
+        """Adds the rows of a log recorded before the ring's oldest row, call before start()
+
+        t and columns are as returned by replay.read_log(); channels are
+        matched to columns by name, ignoring case. Returns the rows used.
+        """
+        window = self.ring.window()
+        cutoff = window[0, 0] if len(window) else math.inf
+        x = np.asarray(t) - self.ring.start_ns / 1e9
+        # A millisecond of slack for the ns to s rounding of the log times
+        early = x < cutoff - 1e-3
+        with self._lock:
+            for name in self.shown:
+                try:
+                    values = find_column(columns, name)
+                except KeyError:
+                    continue
+                for xi, yi in zip(x[early].tolist(), values[early].tolist()):
+                    if not math.isnan(yi):
+                        self.traces[name].append(xi, yi)
+        return int(np.count_nonzero(early))
+
+    def poll(self):
+        """Takes in the rows pushed since the last call"""
+        count = self.ring.count
+        if count <= self._seen:
+            return
+        rows = self.ring.window(min(count - self._seen, self.ring.capacity))
+        self._seen = count
+        with self._lock:
+            for row in rows.tolist():
+                t = row[0]
+                values = [row[c] for c in self._columns]
+                for name, y in zip(self.shown, values):
+                    if not math.isnan(y):
+                        self.traces[name].append(t, y)
+                message = json.dumps([round(t, 3)] + [None if math.isnan(v) else v for v in values])
+                for q in self._subscribers:
+                    if q.full():
+                        try:
+                            q.get_nowait()
+                        except queue.Empty:
+                            pass
+                    q.put_nowait(message)
+
+    def _run(self):
+        while self._running:
+            self.poll()
+            time.sleep(self.interval)
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CryoProbe</title>
+<style>
+body { font-family: sans-serif; margin: 1em; background: #fafafa; }
+canvas { width: 100%; height: 260px; background: #fff; border: 1px solid #ccc; }
+h3 { margin: 0.8em 0 0.2em; font-weight: normal; }
+#status { color: #666; }
+</style></head><body>
+<div id="status">connecting...</div><div id="panels"></div>
+<script>
+const COLORS = ['#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b', '#e377c2'];
+let layout = [], shown = [], start = 0, traces = {}, lastFetch = 0, rows = 0;
+
+function draw() {
+  layout.forEach((panel, p) => {
+    const canvas = document.getElementById('c' + p);
+    const w = canvas.width = canvas.clientWidth, h = canvas.height = canvas.clientHeight;
+    const ctx = canvas.getContext('2d');
+    let x0 = Infinity, x1 = -Infinity, y0 = Infinity, y1 = -Infinity;
+    panel.channels.forEach(n => { const [xs, ys] = traces[n];
+      for (let i = 0; i < xs.length; i++) { x0 = Math.min(x0, xs[i]); x1 = Math.max(x1, xs[i]);
+        y0 = Math.min(y0, ys[i]); y1 = Math.max(y1, ys[i]); } });
+    if (!(x1 > x0)) return;
+    if (!(y1 > y0)) { y0 -= 1; y1 += 1; }
+    const pad = (y1 - y0) * 0.05; y0 -= pad; y1 += pad;
+    const L = 70, R = 10, T = 10, B = 25;
+    const sx = v => L + (v - x0) / (x1 - x0) * (w - L - R), sy = v => T + (y1 - v) / (y1 - y0) * (h - T - B);
+    ctx.font = '11px sans-serif'; ctx.fillStyle = '#444'; ctx.strokeStyle = '#eee';
+    for (let k = 0; k <= 4; k++) {
+      const yv = y0 + (y1 - y0) * k / 4, xv = x0 + (x1 - x0) * k / 4;
+      ctx.beginPath(); ctx.moveTo(L, sy(yv)); ctx.lineTo(w - R, sy(yv)); ctx.stroke();
+      ctx.fillText(yv.toPrecision(5), 2, sy(yv) + 4);
+      ctx.fillText(new Date((start + xv) * 1000).toLocaleTimeString(), sx(xv) - 25 * (k > 0) - 25 * (k == 4), h - 8);
+    }
+    panel.channels.forEach((n, i) => { const [xs, ys] = traces[n];
+      ctx.strokeStyle = COLORS[i % COLORS.length]; ctx.beginPath();
+      for (let j = 0; j < xs.length; j++) { j ? ctx.lineTo(sx(xs[j]), sy(ys[j])) : ctx.moveTo(sx(xs[j]), sy(ys[j])); }
+      ctx.stroke(); ctx.fillStyle = ctx.strokeStyle;
+      const last = ys.length ? ' ' + ys[ys.length - 1].toPrecision(6) : '';
+      ctx.fillText(n + last, L + 10 + i * 170, T + 12); });
+  });
+}
+
+async function fetchHistory() {
+  const points = Math.max(200, Math.min(2000, Math.floor(window.innerWidth)));
+  const data = await (await fetch('api/history?points=' + points)).json();
+  start = data.start; traces = data.traces; lastFetch = Date.now();
+  draw();
+}
+
+async function init() {
+  layout = await (await fetch('api/channels')).json();
+  shown = layout.flatMap(p => p.channels);
+  document.getElementById('panels').innerHTML =
+    layout.map((p, i) => '<h3>' + p.title + '</h3><canvas id="c' + i + '"></canvas>').join('');
+  await fetchHistory();
+  const source = new EventSource('api/stream');
+  let pending = false;
+  source.onmessage = e => {
+    const row = JSON.parse(e.data); rows++;
+    shown.forEach((n, i) => { if (row[i + 1] !== null) { traces[n][0].push(row[0]); traces[n][1].push(row[i + 1]); } });
+    document.getElementById('status').textContent = rows + ' samples live, ' +
+      new Date((start + row[0]) * 1000).toLocaleTimeString();
+    // The server keeps the long history downsampled, refetch it now and then
+    if (Date.now() - lastFetch > 60000) fetchHistory();
+    else if (!pending) { pending = true; requestAnimationFrame(() => { pending = false; draw(); }); }
+  };
+  source.onerror = () => { document.getElementById('status').textContent = 'disconnected, retrying...'; };
+  window.onresize = draw;
+}
+init();
+</script></body></html>
+"""
+
+
+def make_handler(follower):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, body, content_type):
+            body = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/':
+                self._send(PAGE, 'text/html; charset=utf-8')
+            elif url.path == '/api/channels':
+                self._send(json.dumps(panels(follower.names)), 'application/json')
+            elif url.path == '/api/history':
+                points = parse_qs(url.query).get('points', [None])[0]
+                points = max(3, min(int(points), 5000)) if points and points.isdigit() else None
+                self._send(json.dumps(follower.history(points)), 'application/json')
+            elif url.path == '/api/stream':
+                self._stream()
+            else:
+                self.send_error(404)
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            q = follower.subscribe()
+            try:
+                while True:
+                    try:
+                        message = 'data: {}\n\n'.format(q.get(timeout=15))
+                    except queue.Empty:
+                        message = ': keepalive\n\n'
+                    self.wfile.write(message.encode('utf-8'))
+                    self.wfile.flush()
+            except OSError:
+                # Browser went away
+                pass
+            finally:
+                follower.unsubscribe(q)
+
+    return Handler
+
+
+class Dashboard:
+    """Follower and HTTP server for one ring, both on daemon threads"""
+
+    def __init__(self, ring, port=8050, host='127.0.0.1', max_points=500):
+        self.follower = RingFollower(ring, max_points)
+        self.server = ThreadingHTTPServer((host, port), make_handler(self.follower))
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+        self.follower.start()
+        self._thread = threading.Thread(target=self.server.serve_forever, name='Dashboard', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.follower.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a browser dashboard for a running control script')
+    parser.add_argument('ring', help='shared ring name, e.g. cryoprobe_monitor')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--host', default='127.0.0.1', help='0.0.0.0 to allow other machines')
+    parser.add_argument('--points', type=int, default=500, help='history points kept per channel')
+    parser.add_argument('--log', action='append', default=[],
+                        help='CSV or .session log of the run, oldest segment first, to fill the history '
+                             'from before the ring\'s oldest row; may be repeated')
+    args = parser.parse_args(argv)
+
+    ring = SharedRing.attach(args.ring)
+    dashboard = Dashboard(ring, args.port, args.host, args.points)
+    for path in args.log:
+        print('{}: {} rows from before the ring'.format(path, dashboard.follower.prefill(*read_log(path))))
+    dashboard.start()
+    print('Dashboard for {} at {}'.format(args.ring, dashboard.url))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dashboard.stop()
+        ring.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Live plot window running in its own process.
+
+The control loop pushes each sample into a SharedRing and never touches
+matplotlib. The renderer process attaches to the ring, redraws at its own
+frame rate and simply exits when its window is closed; the control loop
+keeps running either way.
+
+layout is a list of axes, top to bottom. Each axes is a dict with 'ylabel',
+optional 'title' and 'margin' (padding added around the y range) and
+'lines', a list of (ring column, label, matplotlib style). Column 0 of the
+ring is the x value (seconds since start).
+
+Frames are blitted: the ticks, labels and legend are drawn once into a
+cached background and each frame only restores it and draws the lines on
+top. Axis limits move only when the data leaves them (with headroom to the
+right in x, and in y only once the data no longer fits or fills less than
+half the range), and only then is the whole figure drawn again.
+
+Headless runs (HEADLESS=1, or no display on Linux) start no renderer, so
+matplotlib and Tk are never loaded; the ring is still published for other
+readers. HEADLESS=0 forces the window on.
+"""
+
+import math
+import os
+import sys
+import time
+
+from ring_buffer import RingBuffer
+
+
+def headless():
+    """Whether the live plot is off for this run"""
+    setting = os.environ.get('HEADLESS')
+    if setting is not None:
+        return setting == '1'
+    return sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def build_figure(plt, layout, xlabel='Time (s)'):
+    """Figure, its axes and (axes, line, ring column) for every plotted line"""
+    fig, axes = plt.subplots(len(layout), 1, figsize=(8, 6), sharex=True, squeeze=False)
+    axes = axes[:, 0]
+
+    lines = []
+    for ax, spec in zip(axes, layout):
+        for col, label, style in spec['lines']:
+            line, = ax.plot([], [], style, label=label)
+            lines.append((ax, line, col))
+        ax.set_ylabel(spec['ylabel'])
+        if 'title' in spec:
+            ax.set_title(spec['title'])
+        ax.legend()
+    axes[-1].set_xlabel(xlabel)
+    plt.tight_layout()
+    return fig, axes, lines
+
+
+def scroll_limits(lo, hi, current, headroom=0.25):
+    """New x limits for data spanning lo..hi, None while it still fits current
+
+    The right limit is put headroom times the span past hi, so a scrolling
+    trace only moves the axis once every headroom * window samples.
+    """
+    if current is not None and current[0] <= lo and hi <= current[1]:
+        return None
+    span = hi - lo
+    return lo, hi + (headroom * span if span > 0 else 1)
+
+
+def band_limits(lo, hi, current, pad=0.1, shrink=0.5):
+    """New y limits for data spanning lo..hi, None while current still suits it
+
+    current is kept while it holds lo..hi and lo..hi covers at least shrink
+    of it, otherwise the limits become lo..hi padded by pad of its span.
+    """
+    if not (math.isfinite(lo) and math.isfinite(hi)):
+        return None
+    span = hi - lo
+    if current is not None and current[0] <= lo and hi <= current[1] and span >= shrink * (current[1] - current[0]):
+        return None
+    pad = pad * span if span > 0 else max(abs(hi) * 1e-3, 1e-9)
+    return lo - pad, hi + pad
+
+
+class BlitRenderer:
+    """Draws a figure's line artists over a cached background of everything else"""
+
+    def __init__(self, fig, artists):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.artists = list(artists)
+        for artist in self.artists:
+            artist.set_animated(True)
+        self._background = None
+        self.full_draws = 0
+        # Every full draw, including the ones from window resizes, refreshes
+        # the background
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def draw(self, full=False):
+        """Shows the artists' current data, full redraws the background too"""
+        if full or self._background is None:
+            self.full_draws += 1
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_artists()
+            self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+
+def update_frame(axes, lines, layout, buffer):
+    """Moves the lines to the rows in buffer, True if the axis limits moved too"""
+    view = buffer.view()
+    x = view[:, 0]
+    for ax, line, col in lines:
+        line.set_data(x, view[:, col])
+    changed = False
+    xlim = scroll_limits(x[0], x[-1], axes[0].get_xlim())
+    if xlim is not None:
+        axes[0].set_xlim(xlim)
+        changed = True
+    for ax, spec in zip(axes, layout):
+        cols = [col for col, _, _ in spec['lines']]
+        margin = spec.get('margin', 1)
+        ylim = band_limits(buffer.min(*cols) - margin, buffer.max(*cols) + margin, ax.get_ylim(), pad=0)
+        if ylim is not None:
+            ax.set_ylim(ylim)
+            changed = True
+    return changed
+
+
+def run_plotter(ring_name, layout, window=200, interval=0.1, xlabel='Time (s)'):
+    """Renderer loop, the target of the plotter process"""
+    import matplotlib.pyplot as plt
+    from shared_ring import SharedRing
+
+    ring = SharedRing.attach(ring_name)
+    fig, axes, lines = build_figure(plt, layout, xlabel)
+    renderer = BlitRenderer(fig, [line for _, line, _ in lines])
+    plt.show(block=False)
+
+    # Local copy of the window, only new rows are copied out of shared memory
+    # and the y limits come from its running min/max
+    buffer = RingBuffer(window, ring.channels)
+    seen = 0
+
+    try:
+        while plt.fignum_exists(fig.number):
+            frame_start = time.monotonic()
+            total = ring.count
+            fresh = total > seen
+            if fresh:
+                for row in ring.window(min(total - seen, window)):
+                    buffer.append(row)
+                seen = total
+            if fresh and len(buffer) > 1:
+                renderer.draw(full=update_frame(axes, lines, layout, buffer))
+            else:
+                fig.canvas.flush_events()
+            time.sleep(max(interval - (time.monotonic() - frame_start), 0.001))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+def start_plotter(ring, layout, **kwargs):
+    """Starts the renderer for ring in a separate daemon process and returns it"""
+    import multiprocessing
+    process = multiprocessing.Process(target=run_plotter, args=(ring.name, layout), kwargs=kwargs,
+                                      name='live_plot', daemon=True)
+    process.start()
+    return process
+
+
+def open_plot(ring, layout, **kwargs):
+    """Renderer process for ring, or None when headless"""
+    if headless():
+        return None
+    return start_plotter(ring, layout, window=ring.capacity, **kwargs)
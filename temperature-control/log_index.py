@@ -0,0 +1,313 @@
+"""
+Time-range index over the Logs directory.
+
+Each CSV log only stores elapsed time (or a bare wall-clock time) per row, so
+finding a time span used to mean parsing every file. The index records, per
+file, the earliest/latest time, row count, columns and the byte offset of a
+row every CHECKPOINT_ROWS rows. Rows are not always in time order (the serial
+scripts sometimes log a stray fragment such as 968160 as the first time), so
+a checkpoint is dropped when a later row is earlier than it. Every row after
+a checkpoint is then no earlier than the checkpoint time, which is what lets
+a query seek to a checkpoint and stop at the next one past its range. It is kept in Logs/.log_index.json and
+updated incrementally: unchanged files are skipped and files that grew are
+scanned from where the last scan stopped. Rotated segments compressed to
+.csv.gz or .csv.zst are read the same way, as are compressed .session files.
+
+Usage:
+    python log_index.py build [--dir Logs]
+    python log_index.py query --from "2025-04-15 08:15" --to "2025-04-15 09:15" --channels Capacitance
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import os
+import re
+import sys
+from datetime import datetime as dt
+
+import numpy as np
+
+import session_log
+from log_rotation import open_log_file, strip_compression
+
+INDEX_NAME = '.log_index.json'
+INDEX_VERSION = 2
+CHECKPOINT_ROWS = 256
+
+# Column names for logs written without a usable header
+DEFAULT_COLUMNS = {
+    'Cap_Serial': ['Time', 'Capacitance'],
+}
+
+_NAME_TIME = re.compile(r'(\d{2})-(\d{2})-(\d{4})[-, ]+(\d{2})-(\d{2})(?:-(\d{2}))?')
+_ELAPSED = re.compile(r'^(?:(\d+) days?, )?(\d+):(\d{2}):(\d{2}(?:\.\d+)?)$')
+
+
+def start_from_name(file_name):
+    """Session start encoded in the log file name, or None"""
+    m = _NAME_TIME.search(file_name)
+    if m is None:
+        return None
+    month, day, year, hour, minute, second = m.groups()
+    return dt(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+
+
+def parse_elapsed(text):
+    """Seconds from a str(timedelta) or plain float field, None if it is neither"""
+    text = text.strip()
+    m = _ELAPSED.match(text)
+    if m is not None:
+        days, hours, minutes, seconds = m.groups()
+        return int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _split(line, delimiter):
+    return next(csv.reader([line], delimiter=delimiter))
+
+
+def _prefix(file_name):
+    for prefix in DEFAULT_COLUMNS:
+        if file_name.startswith(prefix):
+            return prefix
+    return None
+
+
+class TimeDecoder:
+    """Turns the first column of a row into absolute epoch seconds
+
+    'elapsed' rows hold seconds since the file start. 'clock' rows (the Rt
+    column) hold HH:MM:SS wall-clock times, which wrap at midnight.
+    """
+
+    def __init__(self, start, fmt, day=0, last=None):
+        self.start = start
+        self.fmt = fmt
+        self.day = day
+        self.last = last
+        self.midnight = dt.fromtimestamp(start).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+    def __call__(self, field):
+        seconds = parse_elapsed(field)
+        if seconds is None:
+            return None
+        if self.fmt == 'elapsed':
+            return self.start + seconds
+        if self.last is not None and seconds < self.last - 43200:
+            self.day += 1
+        self.last = seconds
+        return self.midnight + self.day * 86400 + seconds
+
+
+def _scan_csv(path, entry):
+    """Scans a CSV log from entry['scanned'] onwards, updating entry in place"""
+    with open_log_file(path, 'rb') as f:
+        f.seek(entry['scanned'])
+        offset = entry['scanned']
+        decoder = TimeDecoder(entry['start'], entry['time_format'], entry['day'], entry['last_clock'])
+        for raw in iter(f.readline, b''):
+            if not raw.endswith(b'\n'):
+                # Partial line still being written, pick it up on the next update
+                break
+            line_offset = offset
+            offset += len(raw)
+            line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+            if not line.strip():
+                continue
+
+            t = decoder(re.split(r'[\t,]', line, 1)[0])
+
+            if t is None:
+                if entry['rows'] == 0 and not entry['columns']:
+                    # Header row, some scripts joined the names with tabs into one cell
+                    names = re.split(r'[\t,]', line)
+                    entry['columns'] = [n.strip() for n in names if n.strip()]
+                    if entry['columns'] and entry['columns'][0] == 'Rt':
+                        entry['time_format'] = decoder.fmt = 'clock'
+                continue
+
+            checkpoints = entry['checkpoints']
+            while checkpoints and checkpoints[-1][0] > t:
+                checkpoints.pop()
+            if entry['rows'] % CHECKPOINT_ROWS == 0:
+                checkpoints.append([t, line_offset])
+            if entry['first'] is None:
+                entry['first'] = entry['last'] = t
+                entry['delimiter'] = '\t' if '\t' in line and ',' not in line else ','
+                if not entry['columns']:
+                    n = len(_split(line, entry['delimiter']))
+                    default = DEFAULT_COLUMNS.get(_prefix(entry['name']))
+                    entry['columns'] = default if default and len(default) == n else ['col{}'.format(i) for i in range(n)]
+            entry['first'] = min(entry['first'], t)
+            entry['last'] = max(entry['last'], t)
+            entry['rows'] += 1
+        entry['scanned'] = offset
+        entry['day'] = decoder.day
+        entry['last_clock'] = decoder.last
+
+
+def _new_entry(name, start):
+    return {
+        'name': name, 'kind': 'csv', 'start': start, 'first': None, 'last': None,
+        'rows': 0, 'columns': [], 'delimiter': None, 'time_format': 'elapsed',
+        'checkpoints': [], 'scanned': 0, 'day': 0, 'last_clock': None,
+        'size': 0, 'mtime': 0.0,
+    }
+
+
+def _index_session(path, name):
+    header, records = session_log.read_session(path, intact=True)
+    t = records['t_ns'] if len(records) else None
+    return {
+        'name': name, 'kind': 'session', 'start': header['start_ns'] / 1e9,
+        'first': float(t[0]) / 1e9 if t is not None else None,
+        'last': float(t[-1]) / 1e9 if t is not None else None,
+        'rows': len(records), 'columns': [n for n, _ in header['fields']],
+    }
+
+
+def index_path(log_dir):
+    return os.path.join(log_dir, INDEX_NAME)
+
+
+def load_index(log_dir):
+    try:
+        with open(index_path(log_dir), encoding='UTF8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {'version': INDEX_VERSION, 'files': {}}
+    if index.get('version') != INDEX_VERSION:
+        return {'version': INDEX_VERSION, 'files': {}}
+    return index
+
+
+def save_index(log_dir, index):
+    tmp = index_path(log_dir) + '.tmp'
+    with open(tmp, 'w', encoding='UTF8') as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path(log_dir))
+
+
+def update_index(log_dir):
+    """Brings the index up to date with the directory and returns it"""
+    index = load_index(log_dir)
+    files = index['files']
+    present = set()
+
+    for name in sorted(os.listdir(log_dir)):
+        path = os.path.join(log_dir, name)
+        if not (strip_compression(name).endswith('.csv') or session_log.is_session(name)) or not os.path.isfile(path):
+            continue
+        present.add(name)
+        st = os.stat(path)
+        entry = files.get(name)
+        if entry is not None and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            continue
+
+        if session_log.is_session(name):
+            try:
+                entry = _index_session(path, name)
+            except (OSError, ValueError):
+                continue
+        else:
+            if entry is None or st.st_size < entry['scanned']:
+                start = start_from_name(name)
+                entry = _new_entry(name, start.timestamp() if start else st.st_mtime)
+            _scan_csv(path, entry)
+        entry['size'] = st.st_size
+        entry['mtime'] = st.st_mtime
+        files[name] = entry
+
+    for name in set(files) - present:
+        del files[name]
+    save_index(log_dir, index)
+    return index
+
+
+def _query_csv(path, entry, t_from, t_to, channels):
+    cols = [entry['columns'].index(c) for c in channels]
+    times = [c[0] for c in entry['checkpoints']]
+    # No row is earlier than a checkpoint before it: read from the last checkpoint
+    # at or before t_from (or the top of the file) up to the first one past t_to
+    i = bisect.bisect_right(times, t_from) - 1
+    j = bisect.bisect_right(times, t_to)
+    stop = entry['checkpoints'][j][1] if j < len(times) else None
+    decoder = TimeDecoder(entry['start'], entry['time_format'])
+    with open_log_file(path, 'rb') as f:
+        offset = 0
+        if i >= 0:
+            offset = entry['checkpoints'][i][1]
+            f.seek(offset)
+            if entry['time_format'] == 'clock':
+                # Re-seed the midnight wrap from the checkpoint time
+                decoder.day = int((times[i] - decoder.midnight) // 86400)
+        for raw in iter(f.readline, b''):
+            if not raw.endswith(b'\n') or offset == stop:
+                break
+            offset += len(raw)
+            fields = _split(raw.decode('utf-8', errors='replace').rstrip('\r\n'), entry['delimiter'])
+            if not fields:
+                continue
+            t = decoder(fields[0])
+            if t is None or t < t_from or t > t_to:
+                continue
+            if len(fields) > max(cols, default=0):
+                yield t, [fields[c] for c in cols]
+
+
+def _query_session(path, entry, t_from, t_to, channels):
+    _, records = session_log.read_session(path, intact=True)
+    t = records['t_ns']
+    lo = np.searchsorted(t, int(t_from * 1e9), side='left')
+    hi = np.searchsorted(t, int(t_to * 1e9), side='right')
+    for row in records[lo:hi]:
+        yield row['t_ns'] / 1e9, [row[c].item() for c in channels]
+
+
+def query(log_dir, t_from, t_to, channels):
+    """Yields (file name, epoch seconds, [channel values]) for rows inside [t_from, t_to]"""
+    index = update_index(log_dir)
+    entries = sorted(index['files'].values(), key=lambda e: e['first'] or 0)
+    for entry in entries:
+        if entry['first'] is None or entry['last'] < t_from or entry['first'] > t_to:
+            continue
+        if not all(c in entry['columns'] for c in channels):
+            continue
+        path = os.path.join(log_dir, entry['name'])
+        rows = _query_session if entry['kind'] == 'session' else _query_csv
+        for t, values in rows(path, entry, t_from, t_to, channels):
+            yield entry['name'], t, values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index and query CryoProbe logs by time')
+    parser.add_argument('--dir', default=os.path.join(os.path.dirname(os.path.realpath(__file__)), 'Logs'))
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='create or update the index')
+    q = sub.add_parser('query', help='print rows between two times as CSV')
+    q.add_argument('--from', dest='t_from', required=True, help='e.g. "2025-04-15 08:15"')
+    q.add_argument('--to', dest='t_to', required=True)
+    q.add_argument('--channels', required=True, help='comma separated column names')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        index = update_index(args.dir)
+        print('Indexed {} files'.format(len(index['files'])))
+        return
+
+    channels = [c.strip() for c in args.channels.split(',')]
+    t_from = dt.fromisoformat(args.t_from).timestamp()
+    t_to = dt.fromisoformat(args.t_to).timestamp()
+    out = csv.writer(sys.stdout)
+    out.writerow(['File', 'Time'] + channels)
+    for name, t, values in query(args.dir, t_from, t_to, channels):
+        out.writerow([name, dt.fromtimestamp(t).isoformat(sep=' ')] + values)
+
+
+if __name__ == '__main__':
+    main()
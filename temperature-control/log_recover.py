@@ -0,0 +1,206 @@
+"""
+Recovery of CSV logs damaged by a power loss or a crash.
+
+After the Pi loses power mid-write a log can end in a torn row, hold blocks of
+zero bytes where the file system had allocated space but not yet written it,
+or, when compressed, stop before the end of its stream. This scans such a
+log, keeps every intact row and reports what was lost and where:
+
+    python log_recover.py "Logs/Temp log 01-27-2026, 17-49-06.csv"
+    python log_recover.py Logs/Real_time_log_04-15-2025-08-15.csv.gz -o fixed.csv
+    python log_recover.py Logs/*.csv --check      report only, write nothing
+
+A row is intact when it is a complete line of valid UTF-8 with as many
+fields as the header and, in logs written with checksum=True (a 'crc32'
+last column, see log_writer.py), a matching CRC32. Without checksums a row
+torn in the middle of its last field can't be told from a whole one.
+Recovered rows are written, unchanged, to <log name>.recovered.csv next to
+the log. The exit status is 1 when any log lost rows.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import zlib
+
+from log_index import parse_elapsed
+from log_rotation import open_log_file, strip_compression
+from log_writer import CRC_COLUMN, verify_line
+
+# Reasons a line is not kept, in report order
+REASONS = ['truncated', 'zero-filled', 'undecodable', 'bad checksum', 'wrong field count']
+
+
+def read_damaged(path):
+    """(bytes, whether a compressed stream ended early) of everything readable in path"""
+    chunks = []
+    cut = False
+    with open_log_file(path, 'rb') as f:
+        while True:
+            try:
+                # read1 makes one read of the stream, so all that was
+                # decompressed before a cut is returned first
+                chunk = f.read1(1 << 16)
+            except (EOFError, zlib.error, OSError):
+                cut = True
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b''.join(chunks), cut
+
+
+def _fields(text):
+    return next(csv.reader([text]), [])
+
+
+def recover(data):
+    """Splits a log's bytes into the lines to keep and a report of the rest
+
+    Returns (header text or None, [kept row texts], report), the report being
+    a dict with the line, damaged line, byte and per-reason counts, the mean kept row size and the lost runs as
+    (first line, last line, reasons, last time kept before, first time kept after).
+    """
+    lines = data.split(b'\n')
+    # Without a final newline the last line was still being written
+    tail = lines.pop()
+    header = None
+    checked = False
+    width = None
+    kept = []
+    lost = {reason: 0 for reason in REASONS}
+    damaged = set()
+    runs = []
+    run = None
+    last_time = None
+
+    def lose(number, reason):
+        nonlocal run
+        lost[reason] += 1
+        damaged.add(number)
+        if run is None:
+            run = [number, number, set(), last_time, None]
+            runs.append(run)
+        run[1] = number
+        run[2].add(reason)
+
+    for number, raw in enumerate(lines, 1):
+        if b'\x00' in raw:
+            # A zero-filled block; rows written after it may follow the zeros
+            lose(number, 'zero-filled')
+            raw = raw.rsplit(b'\x00', 1)[1]
+            if not raw.strip():
+                continue
+        try:
+            text = raw.decode('utf-8').rstrip('\r')
+        except UnicodeDecodeError:
+            lose(number, 'undecodable')
+            continue
+        if not text.strip():
+            continue
+
+        if header is None and not kept:
+            fields = _fields(text)
+            if fields and parse_elapsed(fields[0]) is None:
+                header = text
+                checked = fields[-1] == CRC_COLUMN
+                width = len(fields)
+                continue
+
+        if checked and verify_line(text) is None:
+            lose(number, 'bad checksum')
+            continue
+        fields = _fields(text)
+        if width is None:
+            # No header survived, the first intact row sets the width
+            width = len(fields)
+        if len(fields) != width:
+            lose(number, 'wrong field count')
+            continue
+
+        kept.append(text)
+        last_time = fields[0]
+        if run is not None:
+            run[4] = last_time
+            run = None
+
+    if tail.strip(b'\x00\r\n\t '):
+        lose(len(lines) + 1, 'truncated')
+    elif tail:
+        lose(len(lines) + 1, 'zero-filled')
+
+    report = {
+        'lines': len(lines) + (1 if tail else 0),
+        'kept': len(kept),
+        'damaged': len(damaged),
+        'lost': lost,
+        'zero_bytes': data.count(b'\x00'),
+        'row_bytes': sum(len(text) + 2 for text in kept) / len(kept) if kept else None,
+        'checksums': checked,
+        'runs': [(first, last, sorted(reasons, key=REASONS.index), before, after)
+                 for first, last, reasons, before, after in runs],
+    }
+    return header, kept, report
+
+
+def recovered_path(path):
+    root = os.path.splitext(strip_compression(path))[0]
+    return root + '.recovered.csv'
+
+
+def write_recovered(out_path, header, kept):
+    with open(out_path, 'w', encoding='UTF8', newline='') as f:
+        if header is not None:
+            f.write(header + '\r\n')
+        for text in kept:
+            f.write(text + '\r\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def print_report(path, report, cut, max_runs=20):
+    print('{}: {} rows kept, {} damaged lines{}'.format(path, report['kept'], report['damaged'],
+                                                        '' if report['checksums'] else ' (no checksums)'))
+    if cut:
+        print('  compressed stream ends early, the rest of the segment is gone')
+    for reason in REASONS:
+        if report['lost'][reason]:
+            print('  {:<18} {}'.format(reason, report['lost'][reason]))
+    if report['zero_bytes']:
+        # Zeros replace whole rows, newlines included
+        rows = ', about {:.0f} rows'.format(report['zero_bytes'] / report['row_bytes']) if report['row_bytes'] else ''
+        print('  {} zero bytes{}'.format(report['zero_bytes'], rows))
+    for first, last, reasons, before, after in report['runs'][:max_runs]:
+        span = 'line {}'.format(first) if first == last else 'lines {}-{}'.format(first, last)
+        print('  {} ({}), between rows at {} and {}'.format(span, ', '.join(reasons),
+                                                            before or 'the start', after or 'the end'))
+    if len(report['runs']) > max_runs:
+        print('  ... {} more damaged runs'.format(len(report['runs']) - max_runs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keep the intact rows of damaged CSV logs')
+    parser.add_argument('logs', nargs='+', help='plain, .gz or .zst CSV logs')
+    parser.add_argument('-o', '--output', help='recovered CSV, only with a single log')
+    parser.add_argument('--check', action='store_true', help='report only')
+    args = parser.parse_args(argv)
+    if args.output and len(args.logs) > 1:
+        parser.error('--output needs a single log')
+
+    damaged = False
+    for path in args.logs:
+        data, cut = read_damaged(path)
+        header, kept, report = recover(data)
+        print_report(path, report, cut)
+        if cut or report['damaged']:
+            damaged = True
+        if not args.check:
+            out_path = args.output or recovered_path(path)
+            write_recovered(out_path, header, kept)
+            print('  written to', out_path)
+    return 1 if damaged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Rotation and compression of the CSV logs.
+
+A LogWriter given a RotationPolicy moves on to a new segment when the current
+one reaches max_bytes, when the wall clock crosses a multiple of interval
+(3600 rotates on the hour, 86400 at midnight, local time) or when rotate() is
+called for a session event. The size is the count of bytes the writer has
+written, so no stat() call is made per row.
+
+Segments keep the session's name with a counter before the extension, each
+starting with the header row:
+
+    Temp log 01-27-2026, 17-49-06.csv
+    Temp log 01-27-2026, 17-49-06.001.csv
+    Temp log 01-27-2026, 17-49-06.002.csv
+
+Segments closed by a rotation are compressed by a background thread at low
+priority, to .csv.gz or, with the zstandard package installed, .csv.zst. The
+file being written, and so the last segment of a log, stays plain text: it
+can be followed live, a run that never rotated leaves the usual .csv, and
+log_index can seek straight to its checkpoints. log_index and
+replay open compressed segments through open_log_file() like any other log.
+"""
+
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+_STOP = object()
+
+
+def segment_path(path, n):
+    """Path of segment n of the log started at path, segment 0 being path itself"""
+    if n == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return '{}.{:03d}{}'.format(root, n, ext)
+
+
+def strip_compression(name):
+    """name without a .gz or .zst suffix"""
+    for suffix in SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def open_log_file(path, mode='rb', **kwargs):
+    """Opens a log, plain or compressed as its suffix says; kwargs are the text mode ones of open()"""
+    if path.endswith(SUFFIXES['gzip']):
+        return gzip.open(path, mode, **kwargs)
+    if path.endswith(SUFFIXES['zstd']):
+        if zstandard is None:
+            raise OSError('{} needs the zstandard package'.format(path))
+        return zstandard.open(path, mode, **kwargs)
+    return open(path, mode, **kwargs)
+
+
+def compress_file(path, method='gzip', level=6, fsync=False):
+    """Replaces path by its compressed copy and returns the new path
+
+    The copy is written under a temporary name and renamed into place before
+    path is removed, so an interruption leaves at least one complete file.
+    With fsync that also holds across a power loss.
+    """
+    target = path + SUFFIXES[method]
+    tmp = target + '.tmp'
+    with open(path, 'rb') as src:
+        if method == 'zstd':
+            with open(tmp, 'wb') as dst:
+                zstandard.ZstdCompressor(level=level).copy_stream(src, dst)
+        else:
+            with gzip.open(tmp, 'wb', compresslevel=level) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+    shutil.copystat(path, tmp)
+    if fsync:
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+    os.replace(tmp, target)
+    if fsync:
+        sync_dir(target)
+    os.remove(path)
+    return target
+
+
+def sync_dir(path):
+    """fsyncs the directory holding path, so a new or renamed entry survives a power loss"""
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        # Directories can't be opened on Windows, nor need syncing there
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class RotationPolicy:
+    """When a log moves on to a new segment and how closed segments are compressed
+
+    max_bytes and interval may be None to turn that trigger off, compress
+    'gzip', 'zstd' or None.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, interval=None, compress='gzip', level=6):
+        if compress not in (None, 'gzip', 'zstd'):
+            raise ValueError('unknown compression {!r}'.format(compress))
+        if compress == 'zstd' and zstandard is None:
+            raise ValueError('zstd compression needs the zstandard package')
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = compress
+        self.level = level
+
+    def next_boundary(self, now):
+        """First multiple of interval in local time after now, inf without an interval"""
+        if not self.interval:
+            return float('inf')
+        offset = time.localtime(now).tm_gmtoff
+        return ((now + offset) // self.interval + 1) * self.interval - offset
+
+    def due(self, size, now, boundary):
+        """Whether a segment of size bytes opened before boundary should be closed at now"""
+        return (self.max_bytes is not None and size >= self.max_bytes) or now >= boundary
+
+
+class Compressor:
+    """Compresses the files passed to submit() one at a time on a background thread"""
+
+    def __init__(self, method='gzip', level=6, fsync=False):
+        self.method = method
+        self.level = level
+        self.fsync = fsync
+        self.compressed = []
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def submit(self, path):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='Compressor', daemon=True)
+            self._thread.start()
+        self._queue.put(path)
+
+    def close(self, timeout=None):
+        """Waits for the files submitted so far"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            # Linux nice values are per thread, keep the CPU for the control loop
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            path = self._queue.get()
+            if path is _STOP:
+                return
+            try:
+                self.compressed.append(compress_file(path, self.method, self.level, self.fsync))
+            except Exception:
+                # The segment stays uncompressed, readers handle both
+                self.errors += 1
+                traceback.print_exc()
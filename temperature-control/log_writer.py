@@ -0,0 +1,285 @@
+"""
+Buffered CSV logging for the CryoProbe acquisition scripts.
+Rows are handed to a bounded in-memory queue and written by a background
+thread through one file handle that stays open for the whole session, so the
+control loop never blocks on the SD card. With a RotationPolicy the log is
+split into compressed segments (see log_rotation.py).
+
+For power-loss safety a writer can fsync the file every fsync_interval
+seconds, committing all rows written in that window with one call, and end
+every row with a CRC32 of its text in a 'crc32' column. log_recover.py uses
+the checksums to tell intact rows from torn or zero-filled ones after a crash.
+"""
+
+import csv
+import io
+import os
+import queue
+import threading
+import time
+import traceback
+import zlib
+
+from log_rotation import Compressor, segment_path, sync_dir
+
+_FLUSH = object()
+_ROTATE = object()
+_STOP = object()
+
+CRC_COLUMN = 'crc32'
+
+
+def checked_line(text):
+    """text, one CSV row without its line ending, followed by its CRC32 field"""
+    return '{},{:08x}'.format(text, zlib.crc32(text.encode('utf-8')))
+
+
+def verify_line(line):
+    """The row text of a checked_line(), None if the checksum does not match"""
+    text, _, crc = line.rpartition(',')
+    try:
+        return text if int(crc, 16) == zlib.crc32(text.encode('utf-8')) else None
+    except ValueError:
+        return None
+
+
+class LogWriter:
+    """Background CSV writer
+
+    Rows passed to write() are queued and written in batches. The file is
+    flushed every flush_interval seconds or every flush_rows rows, whichever
+    comes first. When the queue is full the row is dropped and counted rather
+    than stalling the caller.
+
+    rotation is an optional RotationPolicy. The path given is then the first
+    segment, and the path attribute the segment being written.
+
+    With fsync_interval (seconds, 0 for every flush) flushed rows are also
+    synced to the card, so a power loss costs at most the queued rows and
+    about fsync_interval + flush_interval seconds of written ones. checksum
+    adds the CRC32 column.
+    """
+
+    def __init__(self, path, header=None, max_queue=10000, flush_interval=1.0, flush_rows=50, mode='w',
+                 rotation=None, fsync_interval=None, checksum=False):
+        self.path = path
+        self.header = header
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.rotation = rotation
+        self.fsync_interval = fsync_interval
+        self.checksum = checksum
+
+        self.rows_written = 0
+        self.dropped_rows = 0
+        self.max_queue_depth = 0
+        self.segment = 0
+        self.segment_bytes = 0
+        self.fsyncs = 0
+        self.max_fsync_ms = 0.0
+        self.error = None
+
+        self._base_path = path
+        self._boundary = None
+        self._compressor = None
+        if rotation is not None and rotation.compress:
+            self._compressor = Compressor(rotation.compress, rotation.level, fsync=fsync_interval is not None)
+        # Rows are formatted here first when they need a checksum
+        self._line = io.StringIO()
+        self._line_csv = csv.writer(self._line)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._open_segment(mode)
+
+        self._thread = threading.Thread(target=self._run, name='LogWriter', daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """Number of rows waiting to be written"""
+        return self._queue.qsize()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def write(self, row):
+        """Queues one row without blocking. Returns False if the row was dropped."""
+        if self.error is not None or not self._thread.is_alive():
+            self.dropped_rows += 1
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped_rows += 1
+            return False
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return True
+
+    def writerow(self, row):
+        """Alias of write() so the writer can stand in for a csv.writer"""
+        return self.write(row)
+
+    def flush(self):
+        """Asks the writer thread to flush everything queued so far"""
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass
+
+    def rotate(self):
+        """Starts a new segment after the rows queued so far, for session events"""
+        if self.rotation is not None:
+            try:
+                self._queue.put_nowait(_ROTATE)
+            except queue.Full:
+                pass
+
+    def close(self, timeout=5.0):
+        """Drains the queue, flushes and closes the file, and waits for the rotated segments' compression
+
+        If the writer thread does not finish within timeout, the file is left
+        for it to close and error says so.
+        """
+        if self._thread.is_alive():
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(max(deadline - time.monotonic(), 0.0))
+        if self._thread.is_alive():
+            if self.error is None:
+                self.error = TimeoutError('log writer still busy after {} s, {} rows queued'.format(
+                    timeout, self.queue_depth))
+            return
+        if not self._file.closed:
+            self._file.close()
+        if self._compressor is not None:
+            # The last segment stays plain, like a log that never rotated
+            self._compressor.close(timeout)
+            self._compressor = None
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'dropped_rows': self.dropped_rows,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'segments': self.segment + 1,
+            'fsyncs': self.fsyncs,
+            'max_fsync_ms': round(self.max_fsync_ms, 3),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _open_segment(self, mode):
+        self.path = segment_path(self._base_path, self.segment)
+        self._file = open(self.path, mode, encoding='UTF8', newline='')
+        self._csv = csv.writer(self._file)
+        # Bytes are counted as written (characters, the same for these ASCII
+        # rows) rather than asking the file system each time
+        self.segment_bytes = self._file.tell() if mode == 'a' else 0
+        if self.header is not None and self.segment_bytes == 0:
+            header = list(self.header) + [CRC_COLUMN] if self.checksum else self.header
+            self.segment_bytes += self._csv.writerow(header)
+            self._file.flush()
+        if self.fsync_interval is not None:
+            # The new file's directory entry has to reach the card as well
+            self._sync()
+            sync_dir(self.path)
+        if self.rotation is not None:
+            self._boundary = self.rotation.next_boundary(time.time())
+
+    def _write_row(self, row):
+        if not self.checksum:
+            return self._csv.writerow(row)
+        self._line.seek(0)
+        self._line.truncate()
+        self._line_csv.writerow(row)
+        return self._file.write(checked_line(self._line.getvalue().rstrip('\r\n')) + '\r\n')
+
+    def _sync(self):
+        start = time.perf_counter()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self.max_fsync_ms = max(self.max_fsync_ms, (time.perf_counter() - start) * 1000)
+
+    def _rotate(self):
+        if self.fsync_interval is not None:
+            self._file.flush()
+            self._sync()
+        self._file.close()
+        if self._compressor is not None:
+            self._compressor.submit(self.path)
+        self.segment += 1
+        self._open_segment('w')
+
+    def _run(self):
+        pending = 0
+        last_flush = last_sync = time.monotonic()
+        unsynced = False
+        try:
+            while True:
+                timeout = self.flush_interval - (time.monotonic() - last_flush)
+                try:
+                    item = self._queue.get(timeout=max(timeout, 0.0))
+                except queue.Empty:
+                    item = None
+
+                force = False
+                while item is not None:
+                    if item is _STOP:
+                        self._file.flush()
+                        if self.fsync_interval is not None:
+                            self._sync()
+                        return
+                    if item is _FLUSH:
+                        force = True
+                    elif item is _ROTATE:
+                        self._rotate()
+                        pending = 0
+                    else:
+                        self.segment_bytes += self._write_row(item)
+                        self.rows_written += 1
+                        pending += 1
+                        if pending >= self.flush_rows:
+                            break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+
+                now = time.monotonic()
+                if force or pending >= self.flush_rows or now - last_flush >= self.flush_interval:
+                    if pending or force:
+                        self._file.flush()
+                        unsynced = True
+                    pending = 0
+                    last_flush = now
+                # Group commit: one fsync for everything flushed since the last one
+                if unsynced and self.fsync_interval is not None and now - last_sync >= self.fsync_interval:
+                    self._sync()
+                    unsynced = False
+                    last_sync = now
+                if self.rotation is not None and self.rotation.due(self.segment_bytes, time.time(), self._boundary):
+                    self._rotate()
+                    pending = 0
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            if not self._file.closed:
+                self._file.close()
+
+
+def open_log(log_dir, file_name, header, **kwargs):
+    """Creates log_dir if needed and returns a LogWriter for file_name inside it, kwargs as LogWriter's"""
+    os.makedirs(log_dir, exist_ok=True)
+    return LogWriter(os.path.join(log_dir, file_name), header, **kwargs)
@@ -0,0 +1,149 @@
+"""
+Fixed-rate loop pacing on absolute monotonic deadlines.
+
+The control scripts used to sleep for loop_time minus the time the cycle took,
+measured with time.time(). Every cycle then adds its own rounding and wake-up
+latency to the period, so the loop drifts, and an overrun loses its place
+in the schedule. NTP steps to the wall clock show up in the PID's delta_time.
+
+LoopScheduler keeps a grid of deadlines start + k * period on time.monotonic
+and sleeps until the next one. When a cycle overruns, the policy decides
+what happens to the missed deadlines:
+
+    'skip'      drop them and continue on the next grid point (default)
+    'catch_up'  run the missed cycles back to back, at most max_catch_up of them
+
+Per-cycle wake-up jitter, overruns, skipped cycles and the achieved rate are
+recorded.
+
+Give the PID scheduler.deadline, the scheduled start of the cycle, as
+current_time rather than the time it actually woke up. Its delta_time is then
+exactly the period (a whole number of periods after a skip) whatever the
+wake-up jitter, and with a sample_time from pid_sample_time() no update is
+dropped because one wake-up came a little earlier than the previous one.
+
+With STARTUP_REPORT=1 the first completed cycle prints the peak RSS and
+whether matplotlib and Tk were loaded, for startup_profile.py.
+"""
+
+import os
+import sys
+import time
+
+from window_stats import SlidingStats
+
+SKIP = 'skip'
+CATCH_UP = 'catch_up'
+
+STARTUP_REPORT = os.environ.get('STARTUP_REPORT') == '1'
+
+
+def pid_sample_time(period):
+    """sample_time for a PID stepped on scheduler.deadline, below the period so
+    float rounding of the deadlines never makes an update look early"""
+    return 0.9 * period
+
+
+def _report_startup():
+    import resource
+    print('STARTUP rss_kb={} matplotlib={} tkinter={}'.format(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, int('matplotlib' in sys.modules),
+        int('tkinter' in sys.modules)), flush=True)
+
+
+class LoopScheduler:
+    """Paces a loop at a fixed period
+
+        scheduler = LoopScheduler(loop_time)
+        while True:
+            ...  # cycle body
+            scheduler.wait()
+    """
+
+    def __init__(self, period, policy=SKIP, max_catch_up=10, clock=time.monotonic, sleep=time.sleep,
+                 stats_window=1000):
+        if policy not in (SKIP, CATCH_UP):
+            raise ValueError('policy must be {!r} or {!r}, not {!r}'.format(SKIP, CATCH_UP, policy))
+        self.period = period
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self._sleep = sleep
+        self.reset()
+        # Recent wake-up lateness and cycle body times in seconds
+        self.jitter = SlidingStats(stats_window)
+        self.busy = SlidingStats(stats_window)
+
+    def reset(self):
+        """Starts a new schedule with the first deadline now"""
+        self.start = self.clock()
+        self.deadline = self.start
+        # Scheduled time between the last two cycle starts
+        self.dt = self.period
+        self.cycle_start = self.start
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_jitter = 0.0
+
+    def wait(self):
+        """Sleeps until the next deadline and returns it, the scheduled start of the new cycle"""
+        now = self.clock()
+        self.busy.push(now - self.cycle_start)
+        deadline = self.deadline + self.period
+
+        if now >= deadline:
+            self.overruns += 1
+            missed = int((now - deadline) // self.period)
+            if self.policy == SKIP or missed > self.max_catch_up:
+                # Keep to the grid, start late on the most recent deadline
+                self.skipped += missed
+                deadline += missed * self.period
+        else:
+            while now < deadline:
+                self._sleep(deadline - now)
+                now = self.clock()
+
+        self.dt = deadline - self.deadline
+        self.deadline = deadline
+        self.cycle_start = now
+        self.cycles += 1
+        late = now - deadline
+        self.jitter.push(late)
+        if late > self.max_jitter:
+            self.max_jitter = late
+        if STARTUP_REPORT and self.cycles == 1:
+            _report_startup()
+        return deadline
+
+    def __iter__(self):
+        """Yields the scheduled start of each cycle, the first one immediately"""
+        yield self.deadline
+        while True:
+            yield self.wait()
+
+    def rate(self):
+        """Achieved cycles per second since the schedule started"""
+        elapsed = self.cycle_start - self.start
+        return self.cycles / elapsed if elapsed > 0 else float('nan')
+
+    def stats(self):
+        return {
+            'period': self.period,
+            'cycles': self.cycles,
+            'rate_hz': self.rate(),
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'jitter_mean': self.jitter.mean,
+            'jitter_max': self.max_jitter,
+            'busy_mean': self.busy.mean,
+            'busy_max': self.busy.max,
+        }
+
+    def summary(self):
+        """One-line report for the end of a run"""
+        s = self.stats()
+        return ('Loop {:.3f} Hz (target {:.3f}), {} cycles, {} overruns, {} skipped, '
+                'jitter mean {:.2f} ms max {:.2f} ms, body mean {:.2f} ms max {:.2f} ms').format(
+            s['rate_hz'], 1 / self.period, s['cycles'], s['overruns'], s['skipped'],
+            s['jitter_mean'] * 1e3, s['jitter_max'] * 1e3, s['busy_mean'] * 1e3, s['busy_max'] * 1e3)
@@ -0,0 +1,152 @@
+"""
+Largest-Triangle-Three-Buckets downsampling.
+
+lttb_indices() picks n_out points of a trace that keep its visual shape: the
+first and last points, and from each of n_out - 2 equal buckets the point
+forming the largest triangle with the point picked before it and the mean of
+the next bucket.
+
+DownsampledTrace keeps a whole run at a bounded size with even coverage in
+time. Once it holds 2 * max_points raw points the span so far is cut into
+max_points buckets of equal duration, and from then on each bucket keeps only
+its lowest and highest point. When the run outgrows the last bucket,
+neighbouring buckets are merged pairwise and the bucket duration doubles. The
+first hour of a 12 hour cooldown therefore keeps as many points as the last,
+peaks and dips survive every merge, and the work and memory per point do not
+grow with the run. points() can reduce the result further with LTTB for
+display.
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the n_out points LTTB keeps, all of them if there are no more than n_out"""
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Mean of the next bucket, the last point for the last bucket
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx = x[nlo:nhi].mean()
+        cy = y[nlo:nhi].mean()
+        bx = x[lo:hi]
+        by = y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+class DownsampledTrace:
+    """A trace bounded to 2 * max_points points, decimated by time
+
+    x must not decrease; a point earlier than the newest one is counted into
+    the newest bucket.
+    """
+
+    def __init__(self, max_points=500):
+        self.max_points = max_points
+        # Raw points until the first reduction, then the min and max point of
+        # each bucket, bucket k covering [x0 + k * width, x0 + (k + 1) * width)
+        self._x = np.empty(2 * max_points)
+        self._y = np.empty(2 * max_points)
+        self._n = 0
+        self.x0 = None
+        self.width = None
+        self._k = np.empty(max_points, dtype=np.int64)
+        self._lo = np.empty((max_points, 2))
+        self._hi = np.empty((max_points, 2))
+        self._nb = 0
+        self.total = 0
+
+    def __len__(self):
+        if self.width is None:
+            return self._n
+        return self._nb + int(np.count_nonzero((self._lo[:self._nb] != self._hi[:self._nb]).any(axis=1)))
+
+    def append(self, x, y):
+        self.total += 1
+        if self.width is None:
+            self._x[self._n] = x
+            self._y[self._n] = y
+            self._n += 1
+            if self._n == len(self._x):
+                self._bucket_raw()
+            return
+        k = int((x - self.x0) // self.width)
+        while k >= self.max_points:
+            self._merge()
+            k = int((x - self.x0) // self.width)
+        last = self._nb - 1
+        if k <= self._k[last]:
+            if y < self._lo[last, 1]:
+                self._lo[last] = x, y
+            if y >= self._hi[last, 1]:
+                self._hi[last] = x, y
+        else:
+            self._k[self._nb] = k
+            self._lo[self._nb] = self._hi[self._nb] = x, y
+            self._nb += 1
+
+    def _bucket_raw(self):
+        x, y = self._x, self._y
+        self.x0 = float(x[0])
+        span = float(x[-1]) - self.x0
+        # The raw points fill the first half of the buckets, leaving room to grow
+        self.width = 2 * span / self.max_points if span > 0 else 1.0
+        k = ((x - self.x0) // self.width).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self._nb = len(starts)
+        self._k[:self._nb] = k[starts]
+        for b, (i, j) in enumerate(zip(starts, np.r_[starts[1:], len(x)])):
+            lo = i + int(np.argmin(y[i:j]))
+            hi = i + int(np.argmax(y[i:j]))
+            self._lo[b] = x[lo], y[lo]
+            self._hi[b] = x[hi], y[hi]
+
+    def _merge(self):
+        n = self._nb
+        k = self._k[:n] // 2
+        lo, hi = self._lo[:n].copy(), self._hi[:n].copy()
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+        self._nb = 0
+        for i, j in zip(starts, np.r_[starts[1:], n]):
+            a = i + int(np.argmin(lo[i:j, 1]))
+            b = i + int(np.argmax(hi[i:j, 1]))
+            self._k[self._nb] = k[i]
+            self._lo[self._nb] = lo[a]
+            self._hi[self._nb] = hi[b]
+            self._nb += 1
+        self.width *= 2
+
+    def _arrays(self):
+        if self.width is None:
+            return self._x[:self._n].copy(), self._y[:self._n].copy()
+        lo, hi = self._lo[:self._nb], self._hi[:self._nb]
+        # Each bucket's two points in time order, one where they are the same point
+        first = np.where((lo[:, 0] <= hi[:, 0])[:, None], lo, hi)
+        second = np.where((lo[:, 0] <= hi[:, 0])[:, None], hi, lo)
+        pairs = np.stack([first, second], axis=1)
+        keep = np.ones((self._nb, 2), dtype=bool)
+        keep[:, 1] = (lo != hi).any(axis=1)
+        points = pairs[keep]
+        return points[:, 0].copy(), points[:, 1].copy()
+
+    def points(self, n_out=None):
+        """(x, y) copies, reduced to n_out points with LTTB if given"""
+        x, y = self._arrays()
+        if n_out is not None and n_out < len(x):
+            keep = lttb_indices(x, y, n_out)
+            return x[keep], y[keep]
+        return x, y
@@ -0,0 +1,20 @@
+"""
+Simulated hardware for running the scripts without a Raspberry Pi.
+
+With TEST_MODE=1 the scripts import these modules in place of Blinka and the
+device drivers:
+
+    board, busio, digitalio   pins and buses
+    adafruit_max31856         thermocouple converters
+    adafruit_max31865         RTD converters
+    adafruit_mcp4725          DAC setting the heater supply
+    serial                    the AD7150 and flow meter Arduinos
+
+All of them read and drive one thermal model (plant.PLANT), so heater and
+valve commands change the temperatures the sensors report. wiring.py maps
+pins and ports to plant nodes, timing.py adds bus and conversion latency.
+
+Environment variables:
+    MOCK_SPEEDUP   simulated seconds per real second (default 1)
+    MOCK_LATENCY   scale of the simulated device delays (default 1, 0 for none)
+"""
@@ -0,0 +1,72 @@
+"""Mock of adafruit_max31856 reading thermocouple temperatures from the plant"""
+
+import random
+import time
+
+from mocks import timing, wiring
+from mocks.plant import PLANT
+
+# Temperature LSB of the linearised thermocouple register
+RESOLUTION = 2 ** -7
+NOISE = 0.03
+
+
+class ThermocoupleType:
+    B = 0b0000
+    E = 0b0001
+    J = 0b0010
+    K = 0b0011
+    N = 0b0100
+    R = 0b0101
+    S = 0b0110
+    T = 0b0111
+    G8 = 0b1000
+    G32 = 0b1100
+
+
+class MAX31856:
+    def __init__(self, spi, cs, thermocouple_type=ThermocoupleType.K, baudrate=500000):
+        self.spi = spi
+        self.cs = cs
+        self.thermocouple_type = thermocouple_type
+        self.node = wiring.MAX31856_CS.get(getattr(cs.pin, 'name', None), 'chamber')
+        self.averaging = 1
+        self.noise_rejection = 60
+        self._done_at = None
+        timing.spi(3)
+
+    def initiate_one_shot_measurement(self):
+        timing.spi(2)
+        conversion = timing.MAX31856_CONVERSION * timing.SCALE * random.uniform(0.98, 1.02)
+        self._done_at = time.monotonic() + conversion
+
+    @property
+    def oneshot_pending(self):
+        timing.spi()
+        return self._done_at is not None and time.monotonic() < self._done_at
+
+    def _wait_for_oneshot(self):
+        while self.oneshot_pending:
+            time.sleep(0.01)
+
+    def unpack_temperature(self):
+        timing.spi()
+        value = PLANT.read(self.node) + random.gauss(0.0, NOISE)
+        return round(value / RESOLUTION) * RESOLUTION
+
+    @property
+    def temperature(self):
+        self.initiate_one_shot_measurement()
+        self._wait_for_oneshot()
+        return self.unpack_temperature()
+
+    @property
+    def reference_temperature(self):
+        timing.spi()
+        return round(PLANT.read('chamber') * 64) / 64
+
+    @property
+    def fault(self):
+        timing.spi()
+        return {name: False for name in ('cj_range', 'tc_range', 'cj_high', 'cj_low',
+                                         'tc_high', 'tc_low', 'voltage', 'open_tc')}
@@ -0,0 +1,75 @@
+"""Mock of adafruit_max31865 reading RTD temperatures from the plant"""
+
+import random
+
+from mocks import timing, wiring
+from mocks.plant import PLANT
+
+# 15-bit RTD ratio with a 430 ohm reference on a PT100, about 0.034 C per LSB
+RESOLUTION = 430.0 / 32768 / 0.385
+NOISE = 0.02
+
+# Callendar-Van Dusen coefficients of a PT100
+A = 3.9083e-3
+B = -5.775e-7
+C = -4.183e-12
+
+
+class MAX31865:
+    def __init__(self, spi, cs, rtd_nominal=100, ref_resistor=430.0, wires=2, filter_frequency=60):
+        self.spi = spi
+        self.cs = cs
+        self.rtd_nominal = rtd_nominal
+        self.ref_resistor = ref_resistor
+        self.wires = wires
+        self.node = wiring.MAX31865_CS.get(getattr(cs.pin, 'name', None), 'flange')
+        timing.spi(2)
+
+    def read_rtd(self):
+        """Raw 15-bit RTD code, with the bias settle and conversion waits of the driver"""
+        timing.spi()
+        timing.delay(timing.MAX31865_BIAS)
+        timing.spi()
+        timing.delay(timing.MAX31865_CONVERSION)
+        timing.spi(2)
+        t = PLANT.read(self.node) + random.gauss(0.0, NOISE)
+        r = self.rtd_nominal * (1 + A * t + B * t * t + (C * (t - 100) * t ** 3 if t < 0 else 0.0))
+        return max(0, min(int(round(r / self.ref_resistor * 32768)), 32767))
+
+    @property
+    def resistance(self):
+        return self.read_rtd() * self.ref_resistor / 32768
+
+    @property
+    def temperature(self):
+        # The driver's conversion: quadratic above 0 C, polynomial fit below
+        raw = self.resistance
+        z1 = -A
+        z2 = A * A - (4 * B)
+        z3 = (4 * B) / self.rtd_nominal
+        z4 = 2 * B
+        temp = z2 + (z3 * raw)
+        temp = (temp ** 0.5 + z1) / z4 if temp > 0 else -273.15
+        if temp >= 0:
+            return temp
+        raw = raw / self.rtd_nominal * 100
+        rpoly = raw
+        temp = -242.02
+        temp += 2.2228 * rpoly
+        rpoly *= raw
+        temp += 2.5859e-3 * rpoly
+        rpoly *= raw
+        temp -= 4.8260e-6 * rpoly
+        rpoly *= raw
+        temp -= 2.8183e-8 * rpoly
+        rpoly *= raw
+        temp += 1.5243e-10 * rpoly
+        return temp
+
+    @property
+    def fault(self):
+        timing.spi()
+        return (False,) * 6
+
+    def clear_faults(self):
+        timing.spi()
@@ -0,0 +1,45 @@
+"""Mock of adafruit_mcp4725, the DAC sets the bench supply feeding the plant's heater"""
+
+from mocks import timing
+from mocks.plant import PLANT, SUPPLY_MAX
+
+VREF = 3.3
+
+
+class MCP4725:
+    def __init__(self, i2c, address=0x62):
+        self.i2c = i2c
+        self.address = address
+        self._raw = 0
+
+    @property
+    def raw_value(self):
+        timing.i2c()
+        return self._raw
+
+    @raw_value.setter
+    def raw_value(self, value):
+        if not 0 <= value <= 4095:
+            raise ValueError('raw_value must be a 12-bit value (0-4095)')
+        # Fast write command, 3 bytes on the bus
+        timing.i2c()
+        self._raw = int(value)
+        control = self._raw / 4095 * VREF
+        # 0-5 V control input of the supply maps to 0-SUPPLY_MAX volts
+        PLANT.set_supply(control / 5 * SUPPLY_MAX)
+
+    @property
+    def value(self):
+        return self.raw_value << 4
+
+    @value.setter
+    def value(self, value):
+        self.raw_value = value >> 4
+
+    @property
+    def normalized_value(self):
+        return self.raw_value / 4095
+
+    @normalized_value.setter
+    def normalized_value(self, value):
+        self.raw_value = int(round(value * 4095))
@@ -0,0 +1,31 @@
+"""Mock of Blinka's board module: named pins and the default buses"""
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'board.{}'.format(self.name)
+
+
+for _n in range(28):
+    globals()['D{}'.format(_n)] = Pin('D{}'.format(_n))
+
+SCL = Pin('SCL')
+SDA = Pin('SDA')
+SCK = SCLK = Pin('SCK')
+MOSI = Pin('MOSI')
+MISO = Pin('MISO')
+CE0 = D8
+CE1 = D7
+
+
+def SPI():
+    from mocks import busio
+    return busio.SPI(SCK, MOSI, MISO)
+
+
+def I2C():
+    from mocks import busio
+    return busio.I2C(SCL, SDA)
@@ -0,0 +1,41 @@
+"""Mock of busio: the buses only carry the lock API the drivers use"""
+
+import threading
+
+
+class _Bus:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def try_lock(self):
+        return self._lock.acquire(blocking=False)
+
+    def unlock(self):
+        self._lock.release()
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.deinit()
+
+
+class SPI(_Bus):
+    def __init__(self, clock, MOSI=None, MISO=None):
+        super().__init__()
+        self.clock = clock
+
+    def configure(self, baudrate=100000, polarity=0, phase=0, bits=8):
+        pass
+
+
+class I2C(_Bus):
+    def __init__(self, scl, sda, frequency=100000):
+        super().__init__()
+        self.frequency = frequency
+
+    def scan(self):
+        return [0x62]
@@ -0,0 +1,54 @@
+"""Mock of digitalio, output pins listed in wiring.OUTPUTS drive the plant"""
+
+from mocks import timing, wiring
+from mocks.plant import PLANT
+
+
+class Direction:
+    INPUT = 'INPUT'
+    OUTPUT = 'OUTPUT'
+
+
+class Pull:
+    UP = 'UP'
+    DOWN = 'DOWN'
+
+
+class DriveMode:
+    PUSH_PULL = 'PUSH_PULL'
+    OPEN_DRAIN = 'OPEN_DRAIN'
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self._value = False
+        self._target = wiring.OUTPUTS.get(getattr(pin, 'name', None))
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        # A sysfs/gpiod write costs a few microseconds
+        timing.delay(5e-6)
+        self._value = bool(value)
+        if self._target == 'valve':
+            # Relay energised closes the LN2 valve
+            PLANT.set_valve(not self._value)
+        elif self._target is not None:
+            PLANT.set_heater(self._target, self._value)
+
+    def deinit(self):
+        pass
@@ -0,0 +1,140 @@
+"""
+Lumped thermal model of the test stand shared by all mock devices.
+
+Each node has a heat capacity and is linked to other nodes, to the room and
+to cold sinks by thermal conductances:
+
+    C_i dT_i/dt = sum_j G_ij (T_j - T_i) + G_room_i (T_room - T_i) + G_sink_i (T_sink_i - T_i) + P_i
+
+The cryocooler is a fixed conductance from the cold head to a -200 C sink.
+The LN2 valve adds a conductance from the tip to -196 C while it is open
+(relay off; the scripts close it with Relay.value = True). The heaters add
+power to the heat exchangers: a fixed wattage while their GPIO pin is high,
+or V^2 / R where V is the bench supply voltage set through the MCP4725
+(0-5 V control input scaled to 0-36 V, as temperature_pid_control.py assumes).
+
+Time is time.monotonic scaled by MOCK_SPEEDUP (default 1), so a cooldown can
+run faster than real time. The state is integrated lazily whenever a sensor
+is read or an actuator changes.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+NODES = ['cold_head', 'hex_f', 'hex_b', 'chamber', 'tip', 'ceramic', 'flange']
+
+# Heat capacity in J/K
+CAPACITY = {'cold_head': 800.0, 'hex_f': 300.0, 'hex_b': 300.0, 'chamber': 2000.0,
+            'tip': 40.0, 'ceramic': 60.0, 'flange': 400.0}
+
+# Conductances between nodes in W/K
+LINKS = {('cold_head', 'hex_f'): 0.8, ('cold_head', 'hex_b'): 0.8, ('hex_f', 'chamber'): 0.05,
+         ('hex_b', 'chamber'): 0.05, ('tip', 'ceramic'): 0.15, ('ceramic', 'flange'): 0.1}
+
+# Conductances to the room in W/K
+ROOM = {'cold_head': 0.02, 'hex_f': 0.01, 'hex_b': 0.01, 'chamber': 0.3, 'tip': 0.005,
+        'ceramic': 0.01, 'flange': 0.5}
+ROOM_TEMPERATURE = 20.0
+
+CRYOCOOLER = ('cold_head', -200.0, 1.5)
+LN2 = ('tip', -196.0, 0.4)
+
+HEATER_POWER = 25.0        # W for an on/off heater pin
+HEATER_RESISTANCE = 25.0   # ohm for the supply driven heater
+SUPPLY_MAX = 36.0          # V at 5 V control input
+SUPPLY_HEATER = 'hex_b'    # node the MCP4725 driven heater sits on
+
+
+class ThermalPlant:
+    """The coupled nodes, their actuators and a scaled clock"""
+
+    def __init__(self, speedup=1.0, initial=ROOM_TEMPERATURE, max_step=0.5):
+        self.speedup = speedup
+        self.max_step = max_step
+        n = len(NODES)
+        self.index = {name: i for i, name in enumerate(NODES)}
+        self.capacity = np.array([CAPACITY[name] for name in NODES])
+
+        # Conductance matrix, dT/dt = (A @ T + b) / C
+        self._a = np.zeros((n, n))
+        for (u, v), g in LINKS.items():
+            i, j = self.index[u], self.index[v]
+            self._a[i, j] += g
+            self._a[j, i] += g
+            self._a[i, i] -= g
+            self._a[j, j] -= g
+        self._room = np.array([ROOM.get(name, 0.0) for name in NODES])
+
+        self.temperature = np.full(n, float(initial))
+        self.heater_on = {}        # node -> bool, GPIO heaters
+        self.supply_voltage = 0.0  # V on the supply driven heater
+        self.valve_open = True
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self._last = 0.0
+
+    def now(self):
+        """Simulated seconds since the plant was created"""
+        return (time.monotonic() - self._t0) * self.speedup
+
+    def _power(self):
+        p = np.zeros(len(NODES))
+        for node, on in self.heater_on.items():
+            if on:
+                p[self.index[node]] += HEATER_POWER
+        p[self.index[SUPPLY_HEATER]] += self.supply_voltage ** 2 / HEATER_RESISTANCE
+        return p
+
+    def _sinks(self):
+        g = self._room.copy()
+        b = self._room * ROOM_TEMPERATURE
+        node, t_sink, g_sink = CRYOCOOLER
+        g[self.index[node]] += g_sink
+        b[self.index[node]] += g_sink * t_sink
+        if self.valve_open:
+            node, t_sink, g_sink = LN2
+            g[self.index[node]] += g_sink
+            b[self.index[node]] += g_sink * t_sink
+        return g, b
+
+    def advance(self):
+        """Integrates up to the current simulated time"""
+        with self._lock:
+            now = self.now()
+            span = now - self._last
+            if span <= 0:
+                return
+            g, b = self._sinks()
+            b = b + self._power()
+            a = self._a - np.diag(g)
+            # Explicit Euler, with steps short enough for the fastest node
+            stable = 0.5 * float(np.min(self.capacity / -np.diag(a)))
+            steps = max(1, int(np.ceil(span / min(self.max_step, stable))))
+            dt = span / steps
+            temperature = self.temperature
+            for _ in range(steps):
+                temperature = temperature + dt * (a @ temperature + b) / self.capacity
+            self.temperature = temperature
+            self._last = now
+
+    def read(self, node):
+        self.advance()
+        return float(self.temperature[self.index[node]])
+
+    def set_heater(self, node, on):
+        self.advance()
+        self.heater_on[node] = bool(on)
+
+    def set_supply(self, volts):
+        self.advance()
+        self.supply_voltage = max(0.0, min(float(volts), SUPPLY_MAX))
+
+    def set_valve(self, open_):
+        self.advance()
+        self.valve_open = bool(open_)
+
+
+PLANT = ThermalPlant(speedup=float(os.environ.get('MOCK_SPEEDUP', '1')))
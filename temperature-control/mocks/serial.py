@@ -0,0 +1,173 @@
+"""
+Mock of pyserial's Serial for the Arduino ports.
+
+The port named in wiring.SERIAL_PORTS decides what is on the other end:
+
+    'ad7150'  the IO_AD7150 sketch: a CSV header, then one line per averaged
+              sample ("ADC,CAPDAC,InputRange,Capacitance"), or 18-byte binary
+              frames when opened at 115200 baud or more. "AVG <n>" commands
+              change the averaging, each conversion takes 10 ms.
+    'flow'    the flow meter Arduino: one reading in slm per line, 10 per
+              second, near zero while the LN2 valve is closed.
+
+Data becomes readable at the rate the device produces it, and read() and
+readline() block up to the timeout like the real port.
+"""
+
+import random
+import time
+
+from mocks import wiring
+from mocks.plant import PLANT
+
+AD7150_CONVERSION = 0.010
+AD7150_HEADER = b'ADC,CAPDAC,InputRange,Capacitance\r\n'
+FLOW_PERIOD = 0.1
+FLOW_OPEN = 8.0   # slm through the open valve
+
+
+class SerialException(IOError):
+    pass
+
+
+class SerialTimeoutException(SerialException):
+    pass
+
+
+def tip_capacitance(t_tip):
+    """Sensor capacitance in pF, the dielectric stiffens as the tip cools"""
+    return 1.7300 + 0.0004 * (20.0 - t_tip) / 216.0 + random.gauss(0.0, 2e-5)
+
+
+class Serial:
+    def __init__(self, port=None, baudrate=9600, timeout=None, **kwargs):
+        self.port = port
+        self.baudrate = int(baudrate)
+        self.timeout = timeout
+        self.device = wiring.SERIAL_PORTS.get(port, 'ad7150')
+        self.binary = self.device == 'ad7150' and self.baudrate >= 115200
+        self.averaging = 10
+        self.is_open = True
+        self._buffer = bytearray()
+        self._seq = 0
+        self._opened = time.monotonic()
+        # The sketch restarts when the port opens, first sample after setup()
+        self._next = self._opened + 0.5
+        if self.device == 'ad7150' and not self.binary:
+            self._buffer += AD7150_HEADER
+
+    def _period(self):
+        return AD7150_CONVERSION * self.averaging if self.device == 'ad7150' else FLOW_PERIOD
+
+    def _sample(self, t):
+        if self.device == 'flow':
+            flow = FLOW_OPEN if PLANT.valve_open else 0.0
+            return '{:.3f}\r\n'.format(flow + random.gauss(0.0, 0.02)).encode('ascii')
+
+        capdac = 0
+        range_code = 0
+        input_range = 2.0
+        count = self.averaging
+        adc = (tip_capacitance(PLANT.read('tip')) - capdac * 12.5 / 64) / input_range * 40944 + 12288
+        adc_sum = int(round(adc * count))
+        if self.binary:
+            self._seq = (self._seq + 1) & 0xFFFF
+            t_us = int((t - self._opened) * 1e6) & 0xFFFFFFFF
+            # Imported here so the ASCII ports do not need numpy frames
+            from ad7150_frames import encode
+            return encode(self._seq, t_us, adc_sum, capdac, range_code, count)
+        # The sketch's printLine()
+        adc = adc_sum / count
+        cap = (adc - 12288.0) / 40944.0 * input_range + capdac * 12.5 / 64
+        if count > 1:
+            line = '{:.2f},{},{:.2f},{:.6f}\r\n'.format(adc, capdac, input_range, cap)
+        else:
+            line = '{},{},{:.2f},{:.5f}\r\n'.format(adc_sum, capdac, input_range, cap)
+        return line.encode('ascii')
+
+    def _fill(self):
+        now = time.monotonic()
+        while self._next <= now:
+            self._buffer += self._sample(self._next)
+            self._next += self._period()
+        return now
+
+    def _check_open(self):
+        if not self.is_open:
+            raise SerialException('Attempting to use a port that is not open')
+
+    @property
+    def in_waiting(self):
+        self._check_open()
+        self._fill()
+        return len(self._buffer)
+
+    def inWaiting(self):
+        return self.in_waiting
+
+    def _wait(self, ready):
+        """Waits until ready() or the timeout, returns whether it is ready"""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            now = self._fill()
+            if ready():
+                return True
+            if deadline is not None and now >= deadline:
+                return False
+            wake = self._next if deadline is None else min(self._next, deadline)
+            time.sleep(max(wake - now, 0.0))
+
+    def read(self, size=1):
+        self._check_open()
+        self._wait(lambda: len(self._buffer) >= size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        self._check_open()
+        self._wait(lambda: b'\n' in self._buffer)
+        end = self._buffer.find(b'\n')
+        end = len(self._buffer) if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, size)
+        data = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return data
+
+    def write(self, data):
+        self._check_open()
+        for line in bytes(data).decode('ascii', errors='replace').splitlines():
+            parts = line.split()
+            if self.device == 'ad7150' and len(parts) == 2 and parts[0].upper() == 'AVG':
+                try:
+                    self.averaging = max(1, min(int(parts[1]), 4096))
+                except ValueError:
+                    pass
+        return len(data)
+
+    def flush(self):
+        self._check_open()
+
+    def reset_input_buffer(self):
+        self._check_open()
+        self._fill()
+        del self._buffer[:]
+
+    def reset_output_buffer(self):
+        self._check_open()
+
+    flushInput = reset_input_buffer
+    flushOutput = reset_output_buffer
+
+    def close(self):
+        self.is_open = False
+
+    def open(self):
+        self.is_open = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
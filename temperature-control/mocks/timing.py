@@ -0,0 +1,41 @@
+"""
+Simulated bus and conversion delays.
+
+Short SPI/I2C transactions busy-wait, as the CPU is tied up in the spidev or
+smbus call on a Pi. Conversion waits longer than a millisecond sleep.
+MOCK_LATENCY scales every delay (default 1, 0 turns them off).
+"""
+
+import os
+import time
+
+SCALE = float(os.environ.get('MOCK_LATENCY', '1'))
+
+# Per-transaction costs measured through Blinka on a Raspberry Pi 4, roughly
+SPI_TRANSACTION = 60e-6
+I2C_TRANSACTION = 350e-6
+# MAX31856 one-shot conversion, 60 Hz filter, no averaging
+MAX31856_CONVERSION = 0.155
+# adafruit_max31865 read_rtd(): bias settle + one-shot conversion
+MAX31865_BIAS = 0.010
+MAX31865_CONVERSION = 0.065
+
+
+def delay(seconds):
+    seconds *= SCALE
+    if seconds <= 0:
+        return
+    if seconds >= 1e-3:
+        time.sleep(seconds)
+        return
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def spi(transactions=1):
+    delay(SPI_TRANSACTION * transactions)
+
+
+def i2c(transactions=1):
+    delay(I2C_TRANSACTION * transactions)
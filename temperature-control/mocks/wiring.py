@@ -0,0 +1,16 @@
+"""
+Which plant node or actuator each mocked pin is connected to.
+
+The chip selects follow the scripts: the MAX31856s of temperature_control.py
+and temperature_pid_control.py, and the MAX31865s of monitor.py. Scripts that
+wire pins differently can patch these dicts before creating devices.
+"""
+
+MAX31856_CS = {'D13': 'cold_head', 'D16': 'hex_f', 'D25': 'hex_b', 'D26': 'chamber'}
+MAX31865_CS = {'D19': 'tip', 'D16': 'ceramic', 'D21': 'flange'}
+
+# GPIO outputs: heater pins drive the node's heater, 'valve' is the LN2 relay
+OUTPUTS = {'D22': 'hex_f', 'D23': 'hex_b', 'D6': 'valve'}
+
+# Serial ports: 'ad7150' is the capacitance Arduino, 'flow' the SFM3000 meter
+SERIAL_PORTS = {'/dev/ttyACM1': 'ad7150', '/dev/ttyACM0': 'flow'}
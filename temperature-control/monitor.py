@@ -6,45 +6,43 @@ Works with 3 Adafruit MAX31865 digital converters, a 8-relay and a Sensirion SFM
 """
 
 import time
-import csv
 import os
-import board
-import digitalio
-import adafruit_max31865
 import PID
+from log_rotation import RotationPolicy
+from log_writer import open_log
+from session_log import SessionWriter
 from datetime import datetime as dt, timedelta
 import numpy as np
 import signal
 import traceback
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import serial
-from collections import deque
+from live_plot import open_plot
+from shared_ring import SharedRing
+from ad7150_reader import AD7150Reader
+from loop_scheduler import LoopScheduler, pid_sample_time
+from stage_timer import StageTimer
+
+# --- Conditional Imports for Mocking ---
+if os.environ.get("TEST_MODE") == "1":
+    print("Running in TEST_MODE: Using mock hardware modules.")
+    from mocks import board, digitalio, adafruit_max31865, serial
+else:
+    import board
+    import digitalio
+    import adafruit_max31865
+    import serial
+# --- End Conditional Imports ---
 
 
 # ------------------ Utility Functions ------------------
-def log_temps(f_name, data):
-    with open(os.path.join(ROOT_DIR, "Logs", f_name), "a", encoding="UTF8", newline="") as log_file:
-        csv_writer = csv.writer(log_file)
-        csv_writer.writerow(data)
+def log_temps(log_file, data):
+    log_file.write(data)
 
 def open_file(file_name, data_header):
-    os.makedirs(os.path.join(ROOT_DIR, "Logs"), exist_ok=True)
-    log_file = open(os.path.join(ROOT_DIR, "Logs", file_name), "w", encoding="UTF8", newline="")
-    temp_log_w = csv.writer(log_file)
-    temp_log_w.writerow(data_header)
-    return log_file
-
-def calibrated_temps(temp, TC):
-    if "Tip" in TC:
-        RawRange = 179.8
-        ReferenceRange = 169.3
-        ActualTemp = (((temp + 159.6) * ReferenceRange) / RawRange) - 150.7
-    if "Ceramic" in TC:
-        RawRange = 179.7
-        ReferenceRange = 169.5
-        ActualTemp = (((temp + 159.9) * ReferenceRange) / RawRange) - 150.9
-    return ActualTemp
+    # Rows are written by a background thread through one long-lived handle,
+    # a new gzipped segment is started every 4 MB. Rows carry a CRC32 and are
+    # fsynced together every 5 s
+    return open_log(os.path.join(ROOT_DIR, "Logs"), file_name, data_header, rotation=RotationPolicy(),
+                    fsync_interval=5.0, checksum=True)
 
 def signal_handler(signum, frame):
     raise KeyboardInterrupt
@@ -60,6 +58,23 @@ if __name__ == "__main__":
     data_header = ["Real time", "Temp_Tip", "Temp_Ceramic", "MV", 'ADC', 'CAPDAC', 'InputRange', 'Capacitance']
     log_file = open_file(data_f_name, data_header)
 
+    # Binary session log next to the CSV, convert with `python session_log.py to-csv`.
+    # Written in the background with the CSV's rotation, fsync and checksums
+    # adc is a decimal mean when the Arduino averages (AVG > 1)
+    session_fields = [("t_ns", "i8"), ("temp_tip", "f8"), ("temp_ceramic", "f8"), ("mv", "f8"),
+                      ("adc", "f8"), ("capdac", "i4"), ("input_range", "f8"), ("capacitance", "f8")]
+    session_csv = [{"name": "Real time", "field": "t_ns", "format": "elapsed"},
+                   {"name": "Temp_Tip", "field": "temp_tip", "round": 3},
+                   {"name": "Temp_Ceramic", "field": "temp_ceramic", "round": 3},
+                   {"name": "MV", "field": "mv", "round": 3},
+                   {"name": "ADC", "field": "adc"},
+                   {"name": "CAPDAC", "field": "capdac"},
+                   {"name": "InputRange", "field": "input_range"},
+                   {"name": "Capacitance", "field": "capacitance"}]
+    session = SessionWriter(os.path.join(ROOT_DIR, "Logs", data_f_name.replace(".csv", ".session")),
+                            session_fields, session_csv, rotation=RotationPolicy(), fsync_interval=5.0,
+                            checksum=True)
+
     # Create sensor object, communicating over the board's default SPI bus
     spi = board.SPI()
 
@@ -74,7 +89,16 @@ if __name__ == "__main__":
     Ceramic = adafruit_max31865.MAX31865(spi, cs16, wires=2)
 
     # Initialize Cap reading/Serial Set up
-    ser = serial.Serial(port='/dev/ttyACM1', baudrate=9600, timeout=1)
+    # Set binary_frames to match BINARY_FRAMES in IO_AD7150.ino
+    binary_frames = False
+    ser = serial.Serial(port='/dev/ttyACM1', baudrate=115200 if binary_frames else 9600, timeout=1)
+    # Lines are read and parsed on a background thread, the loop only takes the latest one
+    cap_reader = AD7150Reader(ser, binary=binary_frames).start()
+    # Conversions averaged per sample on the Arduino (continuous conversion mode)
+    cap_average = 10
+    time.sleep(2)  # the Arduino resets when the port is opened
+    cap_reader.set_averaging(cap_average)
+    cap_timeout = 5  # seconds before a capacitance reading counts as missing
 
     # Close valve
     Relay.value = True
@@ -87,98 +111,63 @@ if __name__ == "__main__":
     I1 = 1.2 * 0.2 / 60
     D1 = 3 * 0.2 * 60 / 40
 
-    controllerF = PID.PID(P1, I1, D1)
+    # Control loop period in seconds
+    loop_time = 0.25
+
+    # The PID is stepped on the loop's scheduled deadlines (monotonic clock),
+    # so its sample time sits just below the period
+    controllerF = PID.PID(P1, I1, D1, current_time=time.monotonic())
     controllerF.SetPoint = targetT1
-    controllerF.setSampleTime(0.25)
+    controllerF.setSampleTime(pid_sample_time(loop_time))
 
     # Ledger = np.array([[], [], [], []])
 
-    # Initialize arrays for plotting
+    # ------------------ Plotting Setup ------------------
+    # Every sample goes into shared memory, where the plot window (its own
+    # process, none when headless) and any other reader pick it up, so the
+    # control loop never waits on them. python shared_ring.py cryoprobe_monitor
     window_size = 200  # number of points to display
-    time_data = deque(maxlen=window_size)
-    tip_data = deque(maxlen=window_size)
-    ceramic_data = deque(maxlen=window_size)
-    cap_data = deque(maxlen=window_size)
+    sample_ring = SharedRing.create(window_size, ["time", "temp_tip", "temp_ceramic", "mv",
+                                                  "adc", "capdac", "input_range", "capacitance"],
+                                    name="cryoprobe_monitor")
+    plot_layout = [
+        {"ylabel": "Temperature (°C)", "title": "CryoProbe Real-Time Monitoring",
+         "lines": [(1, "Tip Temperature", "b-"), (2, "Ceramic Temperature", "r-")]},
+        {"ylabel": "Capacitance (pF)", "lines": [(7, "Capacitance (pF)", "g-")]},
+    ]
+    plotter = open_plot(sample_ring, plot_layout)
 
-    # time_data, tip_data, ceramic_data = [], [], []
     start_time = time.time()
 
-    # ------------------ Plotting Setup ------------------
-    fig, (ax_temp, ax_cap) = plt.subplots(2, 1, figsize=(8, 6), sharex=True)
-
-    # Temperature lines
-    line_tip, = ax_temp.plot([], [], "b-", label="Tip Temperature")
-    line_ceramic, = ax_temp.plot([], [], "r-", label="Ceramic Temperature")
-    ax_temp.set_ylabel("Temperature (°C)")
-    ax_temp.legend()
-    ax_temp.set_title("CryoProbe Real-Time Monitoring")
-
-    # Capacitance line
-    line_cap, = ax_cap.plot([], [], "g-", label="Capacitance (pF)")
-    ax_cap.set_xlabel("Time (s)")
-    ax_cap.set_ylabel("Capacitance (pF)")
-    ax_cap.legend()
-
-    plt.tight_layout()
-    plt.show(block=False)
-
-    def update_plot():
-        line_tip.set_data(time_data, tip_data)
-        line_ceramic.set_data(time_data, ceramic_data)
-        line_cap.set_data(time_data, cap_data)
-
-        # ax_temp.relim()
-        # ax_temp.autoscale_view()
-        # ax_cap.relim()
-        # ax_cap.autoscale_view()
-
-        # X-axis rolling window
-        if time_data:
-            ax_temp.set_xlim(time_data[0], time_data[-1])
-            ax_cap.set_xlim(time_data[0], time_data[-1])
-
-        # Y-axis ±1 around current min/max
-        if tip_data and ceramic_data:
-            t_min = min(min(tip_data), min(ceramic_data))
-            t_max = max(max(tip_data), max(ceramic_data))
-            ax_temp.set_ylim(t_min - 1, t_max + 1)
-
-        if cap_data:
-            c_min = min(cap_data)
-            c_max = max(cap_data)
-            ax_cap.set_ylim(c_min - 1, c_max + 1)
-
-        plt.pause(0.01)
-
     # ------------------ Control Loop ------------------
     try:
         runlen = 1
-        # loop_time = 0.2
         itt_len = 15
         start_time = time.time()
+        pacer = LoopScheduler(loop_time)
+        # Per-stage timings, summarised every minute; kill -USR1 toggles them
+        timer = StageTimer(os.path.join(ROOT_DIR, "Logs", "stage_times.txt"))
 
         while True:
+            timer.start()
             end_time = time.time()
             elapsed_time = str(timedelta(seconds=end_time - start_time))
 
             #Read Temperature
             temp_Tip = Tip.temperature
             temp_Ceramic = Ceramic.temperature
-            controllerF.update(temp_Tip)
+            timer.lap("spi")
+            controllerF.update(temp_Tip, pacer.deadline)
             MV1 = controllerF.output
+            timer.lap("pid")
 
-            # Read capacitance data from Arduino
-            line_str = ser.readline().decode().strip()
-            if not line_str or line_str.startswith("ADC"):  # skip Arduino header
-                continue
-
-            # Parse Arduino CSV line
-            parts = line_str.split(",")
-            if len(parts) != 4:
-                continue
-
-            adc, capdac, ir, cap = parts
-            adc, capdac, ir, cap = int(adc), int(capdac), float(ir), float(cap)
+            # Latest capacitance from the Arduino, never waits for a new line
+            cap_sample, cap_age = cap_reader.latest()
+            if cap_sample is not None and cap_age < cap_timeout:
+                adc, capdac, ir, cap = cap_sample.adc, cap_sample.capdac, cap_sample.input_range, cap_sample.capacitance
+            else:
+                adc, capdac, ir, cap = -1, -1, float("nan"), float("nan")
+                print("No recent capacitance reading")
 
             print("Time:", elapsed_time)
             print("Tip:", round(temp_Tip, 3), "C")
@@ -189,30 +178,28 @@ if __name__ == "__main__":
             print("InputRange:", ir)
             print("Capacitance:", cap, "pF")
             print("-------------------------------")
+            timer.lap("cap+print")
 
-            # Append data
+            # Publish for the plot process and other readers
             current_time = time.time() - start_time
-            time_data.append(current_time)
-            tip_data.append(temp_Tip)
-            ceramic_data.append(temp_Ceramic)
-            cap_data.append(cap)
-
-            #Update plot
-            update_plot()
+            sample_ring.push((current_time, temp_Tip, temp_Ceramic, MV1, adc, capdac, ir, cap))
+            timer.lap("plot")
 
             # Log data
-            log_temps(data_f_name, [elapsed_time, round(temp_Tip, 3), round(temp_Ceramic, 3), round(MV1, 3), adc, capdac, ir, cap])
+            log_temps(log_file, [elapsed_time, round(temp_Tip, 3), round(temp_Ceramic, 3), round(MV1, 3), adc, capdac, ir, cap])
+            session.append((time.time_ns(), temp_Tip, temp_Ceramic, MV1, adc, capdac, ir, cap))
+            timer.lap("log")
 
             # Relay control
             if MV1 > 0:
                 Relay.value = True
             else:
                 Relay.value = False
+            timer.lap("relay")
+            timer.end()
 
-            # # Maintain timing
-            # elapsed = time.time() - end_time
-            # # if elapsed < loop_time:
-            # #     time.sleep(loop_time - elapsed)
+            # Wait for the next deadline, the loop is no longer paced by the serial port
+            pacer.wait()
 
     except KeyboardInterrupt:
         print("\nInterrupted")
@@ -228,4 +215,16 @@ if __name__ == "__main__":
 
     finally:
         Relay.value = False
+        cap_reader.stop()
+        if binary_frames:
+            print("Capacitance frames lost:", cap_reader.lost)
         log_file.close()
+        session.close()
+        if plotter is not None:
+            plotter.terminate()
+        sample_ring.close()
+        if "pacer" in locals():
+            print(pacer.summary())
+        if "timer" in locals():
+            timer.write_summary()
+        print("Log rows written:", log_file.rows_written, "dropped:", log_file.dropped_rows)
@@ -0,0 +1,77 @@
+"""
+A bank of PID loops updated together.
+
+PIDBank keeps the gains, integrators, last errors and timestamps of N loops
+in NumPy arrays and advances all of them with one update() call, so adding
+heater zones does not add per-loop Python work. Each element follows
+PID.PID.update exactly (sample_time skip, windup_guard clamp on ITerm,
+derivative on the error), so a one-channel bank produces the same outputs as
+PID.PID. Outputs can additionally be clamped per channel.
+
+The parameters broadcast, so the bank may have any shape. pid_sim uses this
+to step thousands of candidate tunings at once.
+"""
+
+import time
+
+import numpy as np
+
+
+class PIDBank:
+    """N PID.PID controllers stored as arrays
+
+    Kp, Ki, Kd, setpoint, sample_time, windup_guard, out_min and out_max are
+    scalars or arrays broadcast to the bank's shape. They stay writable per
+    channel (bank.Kp[2] = 0.1). update() returns the output array.
+    """
+
+    def __init__(self, Kp, Ki=0.0, Kd=0.0, setpoint=0.0, sample_time=0.0, windup_guard=20.0,
+                 out_min=-np.inf, out_max=np.inf, current_time=None):
+        params = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in
+                                       (Kp, Ki, Kd, setpoint, sample_time, windup_guard, out_min, out_max)))
+        (self.Kp, self.Ki, self.Kd, self.SetPoint, self.sample_time,
+         self.windup_guard, self.out_min, self.out_max) = (p.copy() for p in params)
+        self.shape = self.Kp.shape
+        self.clear(current_time)
+
+    def __len__(self):
+        return self.Kp.size
+
+    def clear(self, current_time=None):
+        """Resets the integrators, last errors and outputs of every channel"""
+        current_time = current_time if current_time is not None else time.time()
+        self.PTerm = np.zeros(self.shape)
+        self.ITerm = np.zeros(self.shape)
+        self.DTerm = np.zeros(self.shape)
+        self.last_error = np.zeros(self.shape)
+        self.last_time = np.full(self.shape, float(current_time))
+        self.output = np.zeros(self.shape)
+
+    def update(self, feedback_value, current_time=None):
+        """Advances every channel that is due with its feedback value, returns the outputs"""
+        current_time = current_time if current_time is not None else time.time()
+        error = self.SetPoint - np.asarray(feedback_value, dtype=np.float64)
+        delta_time = current_time - self.last_time
+        delta_error = error - self.last_error
+
+        due = delta_time >= self.sample_time
+        if not due.any():
+            return self.output
+
+        PTerm = self.Kp * error
+        ITerm = np.clip(self.ITerm + error * delta_time, -self.windup_guard, self.windup_guard)
+        DTerm = np.divide(delta_error, delta_time, out=np.zeros(self.shape), where=delta_time > 0)
+        output = np.clip(PTerm + (self.Ki * ITerm) + (self.Kd * DTerm), self.out_min, self.out_max)
+
+        if due.all():
+            self.PTerm, self.ITerm, self.DTerm, self.output = PTerm, ITerm, DTerm, output
+            self.last_time = np.full(self.shape, float(current_time))
+            self.last_error = error
+        else:
+            self.PTerm = np.where(due, PTerm, self.PTerm)
+            self.ITerm = np.where(due, ITerm, self.ITerm)
+            self.DTerm = np.where(due, DTerm, self.DTerm)
+            self.last_time = np.where(due, current_time, self.last_time)
+            self.last_error = np.where(due, error, self.last_error)
+            self.output = np.where(due, output, self.output)
+        return self.output
@@ -0,0 +1,196 @@
+"""
+Batch PID tuning against a simulated first-order-plus-dead-time thermal plant.
+
+Every gain combination is one channel of a PIDBank, so thousands of
+candidates are stepped at once with exactly the arithmetic of PID.PID.update:
+the sample_time skip, the windup_guard clamp on ITerm and the derivative on
+the error. FOPDTPlant is the thermal model
+
+    tau * dT/dt = base + gain * u(t - dead_time) - T
+
+discretised exactly for a zero-order hold, so the step size does not change
+the answer. u is the actuator state, 1 when the relay or heater is on
+(MV > 0, as in the control scripts) or MV clipped to [0, 1] for a DAC output.
+Settling time, overshoot and IAE are accumulated while stepping, so the
+memory use does not grow with the simulated time.
+
+The default plant numbers are placeholders. Fit gain, tau, dead_time and base
+to a logged cooldown before trusting a ranking.
+
+    python pid_sim.py --kp 0.01 1 30 --ki 0 0.01 30 --kd 0 10 20 --setpoint -110
+"""
+
+import argparse
+import math
+
+import numpy as np
+
+from loop_scheduler import pid_sample_time
+from pid_bank import PIDBank
+
+
+class FOPDTPlant:
+    """First-order-plus-dead-time plant, vectorised over any broadcastable parameters
+
+    With u = 0 the temperature relaxes to base, with u = 1 to base + gain.
+    """
+
+    def __init__(self, gain=150.0, tau=300.0, dead_time=15.0, base=-200.0, initial=20.0):
+        self.gain = gain
+        self.tau = tau
+        self.dead_time = dead_time
+        self.base = base
+        self.initial = initial
+
+    def reset(self, shape, dt):
+        """Prepares the state for len(shape) plants stepped every dt seconds, returns T"""
+        self.dt = dt
+        self._decay = np.exp(-dt / np.asarray(self.tau, dtype=np.float64))
+        self.temperature = np.broadcast_to(np.asarray(self.initial, dtype=np.float64), shape).copy()
+        # Actuator history, the plant sees the input from dead_time ago
+        delay = int(round(float(np.max(self.dead_time)) / dt))
+        self._delay_steps = np.broadcast_to(np.rint(np.asarray(self.dead_time) / dt).astype(int), shape)
+        self._history = np.zeros((delay + 1,) + tuple(shape))
+        self._cursor = 0
+        return self.temperature
+
+    def step(self, u):
+        """Advances one dt with actuator input u, returns the new temperature"""
+        size = len(self._history)
+        self._history[self._cursor] = u
+        if size > 1:
+            delayed = np.take_along_axis(self._history, ((self._cursor - self._delay_steps) % size)[None], 0)[0]
+        else:
+            delayed = self._history[0]
+        self._cursor = (self._cursor + 1) % size
+        target = self.base + self.gain * delayed
+        self.temperature = target + (self.temperature - target) * self._decay
+        return self.temperature
+
+
+def simulate(Kp, Ki, Kd, plant=None, setpoint=-110.0, duration=3600.0, dt=1.0, sample_time=None,
+             windup_guard=20.0, actuator='relay', band=1.0, noise=0.0, seed=None, record=None):
+    """Closed-loop response of every gain combination
+
+    Kp, Ki and Kd broadcast to the candidate shape. The controller runs every
+    dt seconds, like the scripts' loop_time. sample_time defaults to
+    pid_sample_time(dt) as in the scripts: with sample_time equal to dt the
+    float step times would make a third of the updates look early.
+    band is the settling tolerance in degrees, noise the standard deviation of
+    the simulated sensor noise. record, a list of flat candidate indices,
+    keeps their temperature traces.
+
+    Returns a dict of arrays over the candidates: settling_time (inf if the
+    last sample is outside the band), overshoot (degrees past the setpoint in
+    the direction of the approach), iae and final temperature, plus 't' and
+    'trace' when record is given.
+    """
+    plant = plant if plant is not None else FOPDTPlant()
+    sample_time = pid_sample_time(dt) if sample_time is None else sample_time
+    shape = np.broadcast_shapes(np.shape(Kp), np.shape(Ki), np.shape(Kd), np.shape(plant.gain), np.shape(plant.tau),
+                                np.shape(plant.dead_time), np.shape(plant.base), np.shape(plant.initial))
+    pid = PIDBank(np.broadcast_to(Kp, shape), Ki, Kd, setpoint, sample_time, windup_guard, current_time=0.0)
+    rng = np.random.default_rng(seed)
+
+    temperature = plant.reset(shape, dt)
+    # Overshoot is measured on the far side of the setpoint from the start
+    direction = np.sign(np.broadcast_to(setpoint, shape) - temperature)
+    direction[direction == 0] = 1
+    steps = int(round(duration / dt))
+
+    iae = np.zeros(shape)
+    overshoot = np.zeros(shape)
+    last_outside = np.full(shape, -1)
+    trace = np.empty((steps, len(record))) if record is not None else None
+
+    for k in range(steps):
+        current_time = (k + 1) * dt
+        measured = temperature + rng.normal(0.0, noise, shape) if noise else temperature
+        output = pid.update(measured, current_time)
+        if actuator == 'relay':
+            u = (output > 0).astype(np.float64)
+        else:
+            u = np.clip(output, 0.0, 1.0)
+        temperature = plant.step(u)
+
+        error = temperature - setpoint
+        iae += np.abs(error) * dt
+        np.maximum(overshoot, error * direction, out=overshoot)
+        last_outside[np.abs(error) > band] = k
+        if trace is not None:
+            trace[k] = temperature.reshape(-1)[record]
+
+    settling_time = np.where(last_outside == steps - 1, np.inf, (last_outside + 1) * dt)
+    result = {'settling_time': settling_time, 'overshoot': overshoot, 'iae': iae, 'final': temperature}
+    if trace is not None:
+        result['t'] = (np.arange(steps) + 1) * dt
+        result['trace'] = trace
+    return result
+
+
+def grid_search(kp, ki, kd, by=('settling_time', 'overshoot', 'iae'), max_overshoot=None, **kwargs):
+    """Simulates every combination of the kp, ki and kd values and ranks them
+
+    Candidates are sorted by the metrics in `by`, the first one being the
+    primary key. Settling times are compared at the simulation step, so ties
+    fall through to the next metric. max_overshoot drops candidates that
+    overshoot more than that many degrees. Returns a list of dicts, best first.
+    """
+    KP, KI, KD = np.meshgrid(np.asarray(kp, dtype=np.float64), np.asarray(ki, dtype=np.float64),
+                             np.asarray(kd, dtype=np.float64), indexing='ij')
+    result = simulate(KP.ravel(), KI.ravel(), KD.ravel(), **kwargs)
+    keep = np.ones(KP.size, dtype=bool)
+    if max_overshoot is not None:
+        keep &= result['overshoot'] <= max_overshoot
+    index = np.flatnonzero(keep)
+    # np.lexsort sorts by its last key first
+    order = index[np.lexsort([result[name][index] for name in reversed(by)])]
+    return [{'Kp': float(KP.flat[i]), 'Ki': float(KI.flat[i]), 'Kd': float(KD.flat[i]),
+             **{name: float(result[name][i]) for name in ('settling_time', 'overshoot', 'iae', 'final')}}
+            for i in order]
+
+
+def _span(values):
+    start, stop, num = values
+    return np.linspace(float(start), float(stop), int(num))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rank PID gains on a simulated FOPDT thermal plant')
+    parser.add_argument('--kp', nargs=3, required=True, metavar=('START', 'STOP', 'NUM'))
+    parser.add_argument('--ki', nargs=3, default=(0, 0, 1), metavar=('START', 'STOP', 'NUM'))
+    parser.add_argument('--kd', nargs=3, default=(0, 0, 1), metavar=('START', 'STOP', 'NUM'))
+    parser.add_argument('--setpoint', type=float, default=-110.0)
+    parser.add_argument('--gain', type=float, default=150.0, help='temperature rise with the actuator fully on')
+    parser.add_argument('--tau', type=float, default=300.0, help='time constant in seconds')
+    parser.add_argument('--dead-time', type=float, default=15.0, help='seconds')
+    parser.add_argument('--base', type=float, default=-200.0, help='temperature the plant settles to with the actuator off')
+    parser.add_argument('--initial', type=float, default=20.0)
+    parser.add_argument('--duration', type=float, default=3600.0)
+    parser.add_argument('--dt', type=float, default=1.0, help='control loop period')
+    parser.add_argument('--sample-time', type=float, default=None)
+    parser.add_argument('--windup', type=float, default=20.0)
+    parser.add_argument('--actuator', choices=('relay', 'linear'), default='relay')
+    parser.add_argument('--band', type=float, default=1.0, help='settling tolerance in degrees')
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--max-overshoot', type=float, default=None)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    plant = FOPDTPlant(args.gain, args.tau, args.dead_time, args.base, args.initial)
+    ranked = grid_search(_span(args.kp), _span(args.ki), _span(args.kd), max_overshoot=args.max_overshoot,
+                         plant=plant, setpoint=args.setpoint, duration=args.duration, dt=args.dt,
+                         sample_time=args.sample_time, windup_guard=args.windup, actuator=args.actuator,
+                         band=args.band, noise=args.noise)
+
+    print('{:>10} {:>10} {:>10} {:>10} {:>10} {:>12} {:>10}'.format(
+        'Kp', 'Ki', 'Kd', 'settle(s)', 'overshoot', 'IAE', 'final'))
+    for row in ranked[:args.top]:
+        settle = row['settling_time']
+        print('{:>10.4g} {:>10.4g} {:>10.4g} {:>10} {:>10.3f} {:>12.1f} {:>10.3f}'.format(
+            row['Kp'], row['Ki'], row['Kd'], 'never' if math.isinf(settle) else '{:.0f}'.format(settle),
+            row['overshoot'], row['iae'], row['final']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Replays recorded logs through a PID controller.
+
+A log's feedback column is fed to PID.PID (ivPID, through its current_time
+argument) or to simple_pid.PID (through dt), using the recorded timestamps
+rather than the wall clock. The loop runs as fast as the CPU allows. For every
+row the replayed output and the actuator command it implies are written next
+to the recorded ones, so a controller change can be checked against past
+runs before a cooldown.
+
+Rows are replayed at the logged cadence. temperature_control.py and
+temperature_pid_control.py log averages over itt_len loops, so their replays
+see one update per logged row, not per control cycle.
+
+    python replay.py "Logs/Temp log 01-27-2026, 17-49-06.csv" --feedback temp_hex_b --recorded "Heat B"
+    python replay.py Logs/Real_time_log_04-15-2025-08-15.session --feedback temp_tip --recorded mv --actuator none
+    python replay.py run.csv --feedback temp_hex_b --recorded heater_voltage --controller simple_pid --output-limits 0 22.5
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+import session_log
+from log_index import TimeDecoder, start_from_name
+from log_rotation import open_log_file, strip_compression
+
+# Gains the control scripts start from
+DEFAULT_P = 0.2 * 0.6
+DEFAULT_I = 1.2 * 0.2 / 60
+DEFAULT_D = 3 * 0.2 * 60 / 40
+
+
+def _number(field):
+    try:
+        return float(field)
+    except ValueError:
+        return math.nan
+
+
+def read_log(path):
+    """(epoch seconds, {column name: float array}) from a CSV (plain or compressed) or .session log
+
+    CSV times may be elapsed time (str(timedelta) or seconds) or an Rt wall
+    clock, as in log_index. Fields that are not numbers become NaN.
+    """
+    if session_log.is_session(path):
+        header, records = session_log.read_session(path, intact=True)
+        t = records['t_ns'] / 1e9
+        return t, {name: np.asarray(records[name], dtype=np.float64) for name in records.dtype.names
+                   if name not in ('t_ns', session_log.CRC_COLUMN)}
+
+    with open_log_file(path, 'rt', encoding='utf-8', errors='replace', newline='') as f:
+        header_line = f.readline()
+        names = [n.strip() for n in re.split(r'[\t,]', header_line) if n.strip()]
+        # One pass, compressed logs can't seek back
+        first = f.readline()
+        delimiter = '\t' if '\t' in first and ',' not in first else ','
+        start = start_from_name(os.path.basename(path))
+        start = start.timestamp() if start else os.stat(path).st_mtime
+        decoder = TimeDecoder(start, 'clock' if names and names[0] == 'Rt' else 'elapsed')
+
+        times = []
+        rows = []
+        for fields in csv.reader(itertools.chain([first], f), delimiter=delimiter):
+            if not fields:
+                continue
+            t = decoder(fields[0])
+            if t is None:
+                continue
+            times.append(t)
+            rows.append([_number(v) for v in fields[1:len(names)]] + [math.nan] * (len(names) - len(fields)))
+
+    data = np.array(rows, dtype=np.float64).reshape(len(rows), max(len(names) - 1, 0))
+    return np.array(times), {name: data[:, i] for i, name in enumerate(names[1:])}
+
+
+def find_column(columns, name):
+    """Column by name, ignoring case and surrounding blanks"""
+    wanted = name.strip().lower()
+    for key, values in columns.items():
+        if key.strip().lower() == wanted:
+            return values
+    raise KeyError('no column {!r}, have {}'.format(name, ', '.join(columns)))
+
+
+def ivpid_controller(Kp, Ki, Kd, setpoint, sample_time=0.0, windup_guard=20.0, t0=0.0):
+    """step(feedback, t) for PID.PID, timed through current_time"""
+    import PID
+    pid = PID.PID(Kp, Ki, Kd, current_time=t0)
+    pid.SetPoint = setpoint
+    pid.setSampleTime(sample_time)
+    pid.setWindup(windup_guard)
+
+    def step(feedback, t):
+        pid.update(feedback, current_time=t)
+        return pid.output
+    return step
+
+
+def simple_pid_controller(Kp, Ki, Kd, setpoint, sample_time=None, output_limits=(None, None), t0=0.0):
+    """step(feedback, t) for simple_pid.PID, timed through dt"""
+    from simple_pid import PID
+    # The sample_time skip is done here on the log's clock, simple_pid only sees due samples
+    pid = PID(Kp, Ki, Kd, setpoint=setpoint, sample_time=None, output_limits=output_limits)
+    state = {'t': t0, 'out': 0.0}
+
+    def step(feedback, t):
+        dt = t - state['t']
+        if dt <= 0 or (sample_time is not None and dt < sample_time):
+            return state['out']
+        state['out'] = pid(feedback, dt=dt)
+        state['t'] = t
+        return state['out']
+    return step
+
+
+# Actuator commands the scripts derive from the controller output
+def relay_command(mv):
+    """1 when the relay or heater is switched on (MV > 0)"""
+    return (mv > 0).astype(np.float64)
+
+
+def dac_command(mv, vmax=36.0):
+    """12-bit MCP4725 value temperature_pid_control.py writes for mv"""
+    input_voltage = np.round(mv / vmax * 5)
+    return np.round(np.minimum((4095 * input_voltage) / 3.3, 4095))
+
+
+ACTUATORS = {'relay': relay_command, 'dac': dac_command, 'none': None}
+
+
+def replay(t, feedback, step):
+    """Controller output for every finite feedback sample, NaN elsewhere"""
+    out = np.full(len(t), math.nan)
+    for i, (ti, y) in enumerate(zip(t.tolist(), feedback.tolist())):
+        if y == y:
+            out[i] = step(y, ti)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded log through a PID controller')
+    parser.add_argument('log')
+    parser.add_argument('--feedback', required=True, help='column fed to the controller')
+    parser.add_argument('--recorded', help='recorded output or actuator column to compare with')
+    parser.add_argument('--controller', choices=('ivpid', 'simple_pid'), default='ivpid')
+    parser.add_argument('--kp', type=float, default=DEFAULT_P)
+    parser.add_argument('--ki', type=float, default=DEFAULT_I)
+    parser.add_argument('--kd', type=float, default=DEFAULT_D)
+    parser.add_argument('--setpoint', type=float, default=-110.0)
+    parser.add_argument('--sample-time', type=float, default=0.0)
+    parser.add_argument('--windup', type=float, default=20.0, help='ivPID windup guard')
+    parser.add_argument('--output-limits', type=float, nargs=2, default=(None, None), help='simple_pid limits')
+    parser.add_argument('--actuator', choices=sorted(ACTUATORS), default='relay')
+    parser.add_argument('--out', help='CSV with the replayed commands, '
+                                      'default <log name>.replay.csv in the current directory')
+    args = parser.parse_args(argv)
+
+    load_start = time.perf_counter()
+    t, columns = read_log(args.log)
+    try:
+        feedback = find_column(columns, args.feedback)
+        recorded = find_column(columns, args.recorded) if args.recorded else None
+    except KeyError as e:
+        parser.error('{} has {}'.format(args.log, e.args[0]))
+    if not len(t):
+        parser.error('no data rows in {}'.format(args.log))
+
+    if args.controller == 'ivpid':
+        step = ivpid_controller(args.kp, args.ki, args.kd, args.setpoint, args.sample_time, args.windup, t0=t[0])
+    else:
+        step = simple_pid_controller(args.kp, args.ki, args.kd, args.setpoint, args.sample_time or None,
+                                     tuple(args.output_limits), t0=t[0])
+
+    replay_start = time.perf_counter()
+    mv = replay(t, feedback, step)
+    replay_time = time.perf_counter() - replay_start
+    actuator = ACTUATORS[args.actuator]
+    command = actuator(mv) if actuator is not None else mv
+
+    out_path = args.out or os.path.splitext(strip_compression(os.path.basename(args.log)))[0] + '.replay.csv'
+    with open(out_path, 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['t', args.feedback, 'mv', 'command'] + (['recorded'] if recorded is not None else []))
+        for i in range(len(t)):
+            row = [round(t[i] - t[0], 3), feedback[i], mv[i], command[i]]
+            if recorded is not None:
+                row.append(recorded[i])
+            writer.writerow(row)
+
+    print('{} rows spanning {:.0f} s replayed in {:.3f} s ({:.3f} s including load)'.format(
+        len(t), t[-1] - t[0], replay_time, time.perf_counter() - load_start))
+    if recorded is not None:
+        valid = np.isfinite(command) & np.isfinite(recorded)
+        if args.actuator == 'relay':
+            # Relay columns are 0/1 or the old 10/11 status codes
+            on = recorded[valid] % 10 > 0 if np.nanmax(recorded) > 1 else recorded[valid] > 0
+            agree = np.mean((command[valid] > 0) == on) if valid.any() else math.nan
+            print('Actuator agreement with the recording: {:.1%}'.format(agree))
+        elif valid.any():
+            diff = command[valid] - recorded[valid]
+            print('Difference from the recording: RMS {:.4g}, max {:.4g}'.format(
+                math.sqrt(np.mean(diff * diff)), np.max(np.abs(diff))))
+    print('Written to', out_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Preallocated multi-channel ring buffer with constant-time window min/max.
+
+Every sample is stored twice, at slot i and slot i + capacity of a
+(2 * capacity, channels) float64 array. The last `capacity` samples are then
+always one contiguous slice, so ordered views for plotting cost nothing and
+nothing is reallocated or rolled per sample. Window minimum and maximum are
+tracked per channel with monotonic deques, amortised O(1) per sample
+whatever the window size.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class MonotonicWindow:
+    """Running min and max of the last `size` values pushed"""
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        # (index, value) pairs, values increasing in _lo and decreasing in _hi
+        self._lo = deque()
+        self._hi = deque()
+
+    def push(self, value):
+        i = self.count
+        if value != value:
+            # NaN (missing reading) takes a slot but never becomes the min or max
+            self.count = i + 1
+            self._expire()
+            return
+        lo, hi = self._lo, self._hi
+        while lo and lo[-1][1] >= value:
+            lo.pop()
+        lo.append((i, value))
+        while hi and hi[-1][1] <= value:
+            hi.pop()
+        hi.append((i, value))
+        self.count = i + 1
+        self._expire()
+
+    def _expire(self):
+        oldest = self.count - self.size
+        lo, hi = self._lo, self._hi
+        while lo and lo[0][0] < oldest:
+            lo.popleft()
+        while hi and hi[0][0] < oldest:
+            hi.popleft()
+
+    @property
+    def min(self):
+        return self._lo[0][1] if self._lo else float('nan')
+
+    @property
+    def max(self):
+        return self._hi[0][1] if self._hi else float('nan')
+
+    def clear(self):
+        self.count = 0
+        self._lo.clear()
+        self._hi.clear()
+
+
+class RingBuffer:
+    """Fixed-capacity float64 ring of multi-channel samples
+
+    track_extrema lists the channels whose window min/max should be kept
+    (all channels by default, none with an empty list).
+    """
+
+    def __init__(self, capacity, channels, track_extrema=None):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((2 * capacity, channels))
+        self._cursor = 0
+        self.count = 0
+        if track_extrema is None:
+            track_extrema = range(channels)
+        self._windows = {ch: MonotonicWindow(capacity) for ch in track_extrema}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, row):
+        """Adds one sample (a sequence of `channels` values)"""
+        c = self._cursor
+        self._data[c] = row
+        self._data[c + self.capacity] = row
+        self._cursor = c + 1 if c + 1 < self.capacity else 0
+        self.count += 1
+        if self._windows:
+            for ch, window in self._windows.items():
+                window.push(row[ch])
+
+    def view(self):
+        """Read-only ordered view of the stored samples, oldest first. No copy."""
+        n = len(self)
+        end = self._cursor + self.capacity
+        out = self._data[end - n:end]
+        out.flags.writeable = False
+        return out
+
+    def channel(self, ch):
+        """Ordered view of one channel"""
+        return self.view()[:, ch]
+
+    def latest(self):
+        return self._data[self._cursor + self.capacity - 1] if self.count else None
+
+    def min(self, *chs):
+        """Window minimum over the given tracked channels, NaN if they hold no values"""
+        values = [self._windows[ch].min for ch in chs]
+        values = [v for v in values if v == v]
+        return min(values) if values else float('nan')
+
+    def max(self, *chs):
+        """Window maximum over the given tracked channels, NaN if they hold no values"""
+        values = [self._windows[ch].max for ch in chs]
+        values = [v for v in values if v == v]
+        return max(values) if values else float('nan')
+
+    def clear(self):
+        self._cursor = 0
+        self.count = 0
+        for window in self._windows.values():
+            window.clear()
@@ -0,0 +1,378 @@
+"""
+Append-only binary session logs for the CryoProbe acquisition scripts.
+
+A session file is a small JSON header followed by fixed-size NumPy records:
+
+    b'CRYOSES1' | uint32 header length | JSON header (padded to 8 bytes) | records...
+
+The header holds the record dtype, the session start time and how to rebuild
+the CSV layout the scripts have always written. Records are only ever appended
+in whole blocks, so a reader can map the file while it is still being written
+and simply ignores a partially written trailing record.
+
+Blocks are written by a background thread, as with log_writer.LogWriter, and
+the same durability options apply: rotation into segments (each one a
+complete session file, rotated-out ones compressed), a group fsync every
+fsync_interval seconds and a CRC32 of every record in a 'crc32' field.
+Records failing their checksum, torn or zero-filled after a power loss, are
+left out by read_session(path, intact=True) and the CSV export.
+
+Usage:
+    python session_log.py info Logs/Real_time_log_01-01-2025-12-00.session
+    python session_log.py to-csv Logs/Real_time_log_01-01-2025-12-00.session [-o out.csv]
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import traceback
+import zlib
+from datetime import datetime as dt, timedelta
+
+import numpy as np
+
+from log_rotation import Compressor, open_log_file, segment_path, strip_compression, sync_dir
+from log_writer import CRC_COLUMN
+
+MAGIC = b'CRYOSES1'
+VERSION = 2
+_PREFIX = struct.Struct('<8sI')
+
+_ROTATE = object()
+_STOP = object()
+
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+
+def is_session(path):
+    """Whether path names a session file, plain or compressed"""
+    return strip_compression(path).endswith('.session')
+
+
+def record_crcs(records):
+    """CRC32 of every record's bytes before its crc32 field, the last one"""
+    raw = np.ascontiguousarray(records).view(np.uint8).reshape(len(records), records.dtype.itemsize)
+    end = records.dtype.fields[CRC_COLUMN][1]
+    return np.fromiter((zlib.crc32(row[:end]) for row in raw), dtype=np.uint32, count=len(records))
+
+
+def check_records(records):
+    """Mask of the records whose checksum matches, all True for sessions written without checksums"""
+    if CRC_COLUMN not in records.dtype.names:
+        return np.ones(len(records), dtype=bool)
+    return record_crcs(records) == records[CRC_COLUMN]
+
+
+class SessionWriter:
+    """Appends fixed-dtype records to a session file
+
+    fields is a list of (name, dtype) pairs, e.g. [('t_ns', 'i8'), ('temp_tip', 'f8')].
+    csv_columns describes the CSV layout used by to_csv(): a list of dicts with
+    'name' (CSV header), 'field' (record field) and optionally 'format'
+    ('elapsed', 'elapsed_s' or 'clock' for the t_ns field) or 'round' (digits).
+    Rows are kept in a preallocated block, handed to the writer thread when
+    block_rows rows have accumulated or flush_interval seconds have passed.
+    When max_blocks blocks are already waiting the block is dropped and its
+    rows counted rather than stalling the caller.
+
+    rotation, fsync_interval and checksum are as for LogWriter; a rotated
+    session goes on in segment_path() files with the same header and start.
+    """
+
+    def __init__(self, path, fields, csv_columns=None, block_rows=64, flush_interval=2.0, start_ns=None,
+                 max_blocks=64, rotation=None, fsync_interval=None, checksum=False):
+        self.path = path
+        fields = list(fields) + [(CRC_COLUMN, 'u4')] if checksum else fields
+        self.dtype = np.dtype([(name, np.dtype(code).newbyteorder('<')) for name, code in fields])
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.flush_interval = flush_interval
+        self.rotation = rotation
+        self.fsync_interval = fsync_interval
+        self.checksum = checksum
+
+        self.rows_written = 0
+        self.dropped_rows = 0
+        self.segment = 0
+        self.segment_bytes = 0
+        self.fsyncs = 0
+        self.max_fsync_ms = 0.0
+        self.error = None
+
+        names = [name for name in self.dtype.names if name != CRC_COLUMN]
+        header = {
+            'version': VERSION,
+            'fields': [[name, self.dtype[name].str] for name in self.dtype.names],
+            'start_ns': self.start_ns,
+            'start_time': dt.fromtimestamp(self.start_ns / 1e9).isoformat(),
+            'csv': csv_columns or [{'name': name, 'field': name} for name in names],
+        }
+        blob = json.dumps(header).encode('utf-8')
+        blob += b' ' * (_pad8(_PREFIX.size + len(blob)) - _PREFIX.size - len(blob))
+        self._header = _PREFIX.pack(MAGIC, len(blob)) + blob
+
+        self._base_path = path
+        self._boundary = None
+        self._compressor = None
+        if rotation is not None and rotation.compress:
+            self._compressor = Compressor(rotation.compress, rotation.level, fsync=fsync_interval is not None)
+        self._open_segment()
+
+        self._block_rows = block_rows
+        self._block = np.zeros(block_rows, dtype=self.dtype)
+        self._n = 0
+        self._last_flush = time.monotonic()
+
+        self._queue = queue.Queue(maxsize=max_blocks)
+        self._thread = threading.Thread(target=self._run, name='SessionWriter', daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def append(self, row):
+        """Adds one record; row is a tuple in field order, without the checksum"""
+        self._block[self._n] = tuple(row) + (0,) if self.checksum else tuple(row)
+        self._n += 1
+        if self._n == len(self._block) or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Hands the buffered records to the writer thread"""
+        self._last_flush = time.monotonic()
+        if not self._n:
+            return
+        block = self._block[:self._n]
+        if self.error is not None or not self._thread.is_alive():
+            self.dropped_rows += self._n
+        else:
+            try:
+                self._queue.put_nowait(block)
+                # The writer owns the block now
+                self._block = np.zeros(self._block_rows, dtype=self.dtype)
+            except queue.Full:
+                self.dropped_rows += self._n
+        self._n = 0
+
+    def rotate(self):
+        """Starts a new segment after the records appended so far, for session events"""
+        if self.rotation is not None:
+            self.flush()
+            try:
+                self._queue.put_nowait(_ROTATE)
+            except queue.Full:
+                pass
+
+    def close(self, timeout=5.0):
+        """Writes what is buffered, closes the file and waits for the rotated segments' compression
+
+        If the writer thread does not finish within timeout the file is left to
+        it and error says so.
+        """
+        if self._thread.is_alive():
+            self.flush()
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(max(deadline - time.monotonic(), 0.0))
+        if self._thread.is_alive():
+            if self.error is None:
+                self.error = TimeoutError('session writer still busy after {} s'.format(timeout))
+            return
+        if not self._file.closed:
+            self._file.close()
+        if self._compressor is not None:
+            # The last segment stays plain, like a session that never rotated
+            self._compressor.close(timeout)
+            self._compressor = None
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'dropped_rows': self.dropped_rows,
+            'queue_depth': self._queue.qsize(),
+            'segments': self.segment + 1,
+            'fsyncs': self.fsyncs,
+            'max_fsync_ms': round(self.max_fsync_ms, 3),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _open_segment(self):
+        self.path = segment_path(self._base_path, self.segment)
+        self._file = open(self.path, 'wb')
+        self._file.write(self._header)
+        self._file.flush()
+        self.segment_bytes = len(self._header)
+        if self.fsync_interval is not None:
+            self._sync()
+            sync_dir(self.path)
+        if self.rotation is not None:
+            self._boundary = self.rotation.next_boundary(time.time())
+
+    def _sync(self):
+        start = time.perf_counter()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self.max_fsync_ms = max(self.max_fsync_ms, (time.perf_counter() - start) * 1000)
+
+    def _rotate(self):
+        if self.fsync_interval is not None:
+            self._sync()
+        self._file.close()
+        if self._compressor is not None:
+            self._compressor.submit(self.path)
+        self.segment += 1
+        self._open_segment()
+
+    def _write_block(self, block):
+        if self.checksum:
+            block[CRC_COLUMN] = record_crcs(block)
+        self._file.write(block.tobytes())
+        self._file.flush()
+        self.segment_bytes += block.nbytes
+        self.rows_written += len(block)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        unsynced = False
+        try:
+            while True:
+                # Wake up for a due fsync or time-based rotation even when no block arrives
+                timeout = 1.0
+                if unsynced:
+                    timeout = min(timeout, max(self.fsync_interval - (time.monotonic() - last_sync), 0.0))
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    if unsynced:
+                        self._sync()
+                    return
+                if item is _ROTATE:
+                    self._rotate()
+                    unsynced = False
+                elif item is not None:
+                    self._write_block(item)
+                    unsynced = self.fsync_interval is not None
+
+                now = time.monotonic()
+                # Group commit: one fsync for every block written since the last one
+                if unsynced and now - last_sync >= self.fsync_interval:
+                    self._sync()
+                    unsynced = False
+                    last_sync = now
+                if self.rotation is not None and self.rotation.due(self.segment_bytes, time.time(), self._boundary):
+                    self._rotate()
+                    unsynced = False
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_header(path):
+    """Returns (header dict, record dtype, byte offset of the first record)"""
+    with open_log_file(path, 'rb') as f:
+        magic, length = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a session log'.format(path))
+        header = json.loads(f.read(length).decode('utf-8'))
+    dtype = np.dtype([(name, code) for name, code in header['fields']])
+    return header, dtype, _PREFIX.size + length
+
+
+def read_session(path, intact=False):
+    """Maps the complete records of a session file, read-only
+
+    Safe to call while a writer is appending: only whole records present at
+    the time of the call are mapped. Call again to pick up new records.
+    Compressed segments are read into memory instead. With intact only the
+    records passing their checksum are returned, as a copy.
+    """
+    header, dtype, offset = read_header(path)
+    if strip_compression(path) != path:
+        with open_log_file(path, 'rb') as f:
+            data = f.read()
+        n = (len(data) - offset) // dtype.itemsize
+        records = np.frombuffer(data, dtype=dtype, count=max(n, 0), offset=offset)
+    else:
+        n = (os.path.getsize(path) - offset) // dtype.itemsize
+        if n <= 0:
+            return header, np.zeros(0, dtype=dtype)
+        records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(n,))
+    if intact:
+        records = records[check_records(records)]
+    return header, records
+
+
+def _format_column(values, spec, header):
+    fmt = spec.get('format')
+    if fmt == 'elapsed':
+        seconds = (values - header['start_ns']) / 1e9
+        return [str(timedelta(seconds=s)) for s in seconds.tolist()]
+    if fmt == 'elapsed_s':
+        seconds = (values - header['start_ns']) // 1_000_000_000
+        return [str(timedelta(seconds=s)) for s in seconds.tolist()]
+    if fmt == 'clock':
+        return [dt.fromtimestamp(t / 1e9).strftime('%H:%M:%S') for t in values.tolist()]
+    if 'round' in spec:
+        return np.round(values, spec['round']).tolist()
+    return values.tolist()
+
+
+def to_csv(path, csv_path=None):
+    """Writes the intact records out in the CSV layout recorded in its header"""
+    header, records = read_session(path, intact=True)
+    if csv_path is None:
+        csv_path = os.path.splitext(strip_compression(path))[0] + '.csv'
+    specs = header['csv']
+    columns = [_format_column(np.asarray(records[spec['field']]), spec, header) for spec in specs]
+    with open(csv_path, 'w', encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([spec['name'] for spec in specs])
+        writer.writerows(zip(*columns))
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect or convert CryoProbe session logs')
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help='print the header and record count')
+    info.add_argument('session')
+    conv = sub.add_parser('to-csv', help='write the session in the usual CSV layout')
+    conv.add_argument('session')
+    conv.add_argument('-o', '--output', default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        header, records = read_session(args.session)
+        print('Started:', header['start_time'])
+        print('Fields:', ', '.join('{} ({})'.format(n, c) for n, c in header['fields']))
+        print('Records:', len(records))
+        damaged = int(np.count_nonzero(~check_records(records)))
+        if damaged:
+            print('Failing their checksum:', damaged)
+    else:
+        print(to_csv(args.session, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Shared-memory ring buffer used to hand samples from a control loop to other processes.
+
+The control process is the only writer. Each push() copies one row of float64
+values into the next slot and bumps the write counter, so it never takes a
+lock or waits on a reader. A sequence number in the header works as a
+seqlock: it is odd while a row is being written and advances by two per row.
+Readers attach by name and either take the latest row, retrying if the
+sequence changed while they copied it, or copy a window and discard any slot
+that was overwritten during the copy.
+
+The header also holds the channel names, the start time and the PID of the
+creating process, so any local process can attach to a running controller and make sense of the data:
+
+    ring = SharedRing.attach('cryoprobe_monitor')
+    ring.latest()            # {'time': 812.25, 'temp_tip': -109.7, ...}
+    ring.window(100)         # last 100 rows, oldest first
+    ring.start_ns            # wall clock at time 0, in ns
+
+    python shared_ring.py cryoprobe_monitor --follow
+"""
+
+import argparse
+import json
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAGIC = 0x474E4952504F5243   # 'CROPRING'
+VERSION = 3
+
+# int64 header fields
+_MAGIC, _VERSION, _CAPACITY, _CHANNELS, _COUNT, _SEQ, _START_NS, _NAMES_LEN, _PID = range(9)
+_HEADER = 9
+
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attaching process registers the block with
+        # the resource tracker, which would unlink it when that process exits
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def _owner_pid(name):
+    """PID that created the ring under name, None if the block is not a ring that records one"""
+    shm = _attach(name)
+    # A copy, a view into the block would keep it from closing
+    header = np.frombuffer(bytes(shm.buf[:_HEADER * 8]), dtype=np.int64) if shm.size >= _HEADER * 8 else None
+    shm.close()
+    if header is None or header[_MAGIC] != MAGIC or header[_VERSION] != VERSION:
+        return None
+    return int(header[_PID])
+
+
+class SharedRing:
+    """Fixed-capacity ring of named float64 rows in shared memory"""
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        if self._header[_MAGIC] != MAGIC or self._header[_VERSION] != VERSION:
+            shm.close()
+            raise ValueError('{} is not a version {} SharedRing'.format(shm.name, VERSION))
+        self.capacity = int(self._header[_CAPACITY])
+        self.channels = int(self._header[_CHANNELS])
+        self.start_ns = int(self._header[_START_NS])
+        names_len = int(self._header[_NAMES_LEN])
+        offset = _HEADER * 8
+        self.names = json.loads(bytes(shm.buf[offset:offset + names_len]).decode('utf-8'))
+        self._data = np.ndarray((self.capacity, self.channels), dtype=np.float64,
+                                buffer=shm.buf, offset=offset + _pad8(names_len))
+
+    @classmethod
+    def create(cls, capacity, channels, name=None, start_ns=None):
+        """New ring; channels is a list of names or a count (names ch0, ch1, ...)
+
+        A ring left behind under name by a process that died is replaced. If
+        its creator is still running, or the block is not a ring of this
+        version, FileExistsError is raised and the block is left alone.
+        """
+        names = list(channels) if not isinstance(channels, int) else ['ch{}'.format(i) for i in range(channels)]
+        blob = json.dumps(names).encode('utf-8')
+        size = _HEADER * 8 + _pad8(len(blob)) + capacity * len(names) * 8
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            pid = _owner_pid(name)
+            if pid is None:
+                raise FileExistsError('shared memory block {!r} exists and is not a version {} SharedRing, '
+                                      'remove /dev/shm/{} if it is left over'.format(name, VERSION, name)) from None
+            if _pid_alive(pid):
+                raise FileExistsError('SharedRing {!r} is in use by process {}, is another control script '
+                                      'running?'.format(name, pid)) from None
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[_HEADER * 8:_HEADER * 8 + len(blob)] = blob
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (MAGIC, VERSION, capacity, len(names), 0, 0,
+                     time.time_ns() if start_ns is None else start_ns, len(blob), os.getpid())
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name), owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def count(self):
+        """Total number of rows pushed so far"""
+        return int(self._header[_COUNT])
+
+    def column(self, name):
+        """Index of the channel called name"""
+        return self.names.index(name)
+
+    def push(self, row):
+        """Writes one row. Only the creating process should call this."""
+        header = self._header
+        n = header[_COUNT]
+        header[_SEQ] += 1
+        self._data[n % self.capacity] = row
+        header[_COUNT] = n + 1
+        header[_SEQ] += 1
+
+    def latest_row(self, retries=100):
+        """Copy of the newest row, None before the first push or if the writer kept interfering"""
+        header = self._header
+        for _ in range(retries):
+            seq = header[_SEQ]
+            if seq & 1:
+                continue
+            n = header[_COUNT]
+            if n == 0:
+                return None
+            row = self._data[(n - 1) % self.capacity].copy()
+            if header[_SEQ] == seq:
+                return row
+        return None
+
+    def latest(self):
+        """{channel name: value} of the newest row, None before the first push"""
+        row = self.latest_row()
+        return None if row is None else dict(zip(self.names, row.tolist()))
+
+    def window(self, n=None):
+        """Copy of the most recent n rows (all available if None), oldest first"""
+        end = self.count
+        n = min(end, self.capacity if n is None else n)
+        if n <= 0:
+            return np.empty((0, self.channels))
+        start = end - n
+        idx = np.arange(start, end) % self.capacity
+        rows = self._data[idx]
+        # Rows the writer may have overwritten during the copy, including the
+        # slot it could be writing right now
+        overwritten = self.count - self.capacity - start + 1
+        if overwritten > 0:
+            rows = rows[overwritten:]
+        return rows
+
+    def close(self):
+        self._header = None
+        self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the latest samples of a running control script')
+    parser.add_argument('name', help='ring name, e.g. cryoprobe_monitor')
+    parser.add_argument('--window', type=int, help='print the last N rows instead of the latest one')
+    parser.add_argument('--follow', action='store_true', help='keep printing new rows')
+    parser.add_argument('--interval', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    ring = SharedRing.attach(args.name)
+    try:
+        print(','.join(ring.names))
+        if args.window:
+            for row in ring.window(args.window):
+                print(','.join('{:.6g}'.format(v) for v in row))
+        seen = ring.count
+        if not args.window:
+            row = ring.latest_row()
+            if row is not None:
+                print(','.join('{:.6g}'.format(v) for v in row))
+        while args.follow:
+            time.sleep(args.interval)
+            count = ring.count
+            if count > seen:
+                for row in ring.window(min(count - seen, ring.capacity)):
+                    print(','.join('{:.6g}'.format(v) for v in row), flush=True)
+                seen = count
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+if __name__ == '__main__':
+    main()
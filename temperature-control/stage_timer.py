@@ -0,0 +1,155 @@
+"""
+Per-stage timing of a control loop.
+
+    timer = StageTimer('Logs/stage_times.txt')
+    while True:
+        timer.start()
+        read_sensors()
+        timer.lap('spi')
+        update_pid()
+        timer.lap('pid')
+        timer.end()        # records the whole cycle, writes the summary when due
+        pacer.wait()
+
+Each lap is a time.perf_counter_ns() difference dropped into a fixed
+histogram, four buckets per power of two (so quantiles are good to within
+25%), plus the exact maximum. Memory does not grow with the run and a lap
+costs under a microsecond. Every `interval` seconds the count, p50, p99, max
+and mean of each stage are appended to the summary file and the histograms
+start over.
+
+SIGUSR1 toggles the timer while the script runs (kill -USR1 <pid>). When it
+is off, start/lap/end return straight away.
+"""
+
+import signal
+import time
+
+# Bucket index of a duration in ns: exact below 8 ns, then 4 buckets per octave
+_BUCKETS = 256
+
+
+def bucket(ns):
+    if ns < 8:
+        return ns if ns > 0 else 0
+    e = ns.bit_length() - 3
+    return min(4 * e + (ns >> e), _BUCKETS - 1)
+
+
+def bucket_upper(index):
+    """Largest duration in ns that falls in bucket index"""
+    if index < 8:
+        return index
+    e = index // 4 - 1
+    return ((index % 4 + 5) << e) - 1
+
+
+class StageHistogram:
+    """Fixed-bucket histogram of durations in ns"""
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.counts[bucket(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def quantile(self, q):
+        """Upper edge of the bucket holding the q quantile, in ns"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+    def clear(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class StageTimer:
+    """Lap timer for the stages of a loop, with a periodic summary file"""
+
+    def __init__(self, summary_path=None, interval=60.0, enabled=True, toggle_signal=getattr(signal, 'SIGUSR1', None)):
+        self.summary_path = summary_path
+        self.interval = interval
+        self.enabled = enabled
+        self.stages = {}
+        self._cycle_start = 0
+        self._last = 0
+        self._next_summary = time.monotonic() + interval
+        if toggle_signal is not None:
+            try:
+                signal.signal(toggle_signal, self._toggle)
+            except ValueError:
+                # Not the main thread, toggle through .enabled instead
+                pass
+
+    def _toggle(self, signum, frame):
+        self.enabled = not self.enabled
+        if self.enabled:
+            # Start from a clean slate so the idle period is not counted
+            self._cycle_start = self._last = 0
+        print('Stage timing', 'on' if self.enabled else 'off')
+
+    def start(self):
+        """Marks the start of a cycle"""
+        if not self.enabled:
+            return
+        self._cycle_start = self._last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        """Records the time since the previous mark under stage"""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        if self._last:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = StageHistogram()
+            hist.add(now - self._last)
+        self._last = now
+
+    def end(self):
+        """Records the whole cycle and writes the summary when it is due"""
+        if not self.enabled:
+            return
+        if self._cycle_start and self._last:
+            self._last = self._cycle_start
+            self.lap('cycle')
+        self._cycle_start = self._last = 0
+        if time.monotonic() >= self._next_summary:
+            self.write_summary()
+
+    def summary(self):
+        """Text table of count, p50, p99, max and mean per stage, times in ms"""
+        lines = ['{:<12} {:>8} {:>10} {:>10} {:>10} {:>10}'.format('stage', 'count', 'p50', 'p99', 'max', 'mean')]
+        for name, hist in self.stages.items():
+            if not hist.count:
+                continue
+            lines.append('{:<12} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                name, hist.count, hist.quantile(0.5) / 1e6, hist.quantile(0.99) / 1e6,
+                hist.max / 1e6, hist.total / hist.count / 1e6))
+        return '\n'.join(lines)
+
+    def write_summary(self):
+        """Appends the current summary to the summary file and starts a new interval"""
+        self._next_summary = time.monotonic() + self.interval
+        if self.summary_path is not None and self.stages:
+            with open(self.summary_path, 'a', encoding='UTF-8') as file:
+                file.write(time.strftime('%Y-%m-%d %H:%M:%S') + '\n')
+                file.write(self.summary() + '\n\n')
+        for hist in self.stages.values():
+            hist.clear()
@@ -0,0 +1,114 @@
+"""
+Startup time and memory of the control scripts, with and without the plot.
+
+    python startup_profile.py                      all scripts, both modes
+    python startup_profile.py monitor.py --runs 5
+
+Each script runs on the mock hardware (TEST_MODE=1) from a scratch copy of
+this directory, so no log files land in Logs. The time is from process start
+until the first paced control cycle has completed, which includes the first
+sensor reads; the RSS is the controller process's peak, the plot renderer
+runs in a process of its own. 'gui' sets HEADLESS=0 and 'headless' HEADLESS=1.
+
+The medians are added to bench_results.json under the current commit.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import RESULTS_PATH, commit_id, load_json, save_json
+
+ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
+SCRIPTS = ['monitor.py', 'temperature_control.py', 'temperature_pid_control.py',
+           'CryoProbe_Temp_Control_RealTimePlotting.py']
+MODES = {'gui': '0', 'headless': '1'}
+
+
+def scratch_copy():
+    """Copy of the scripts, mocks and calibration in a temporary directory"""
+    tmp_dir = tempfile.mkdtemp(prefix='startup_')
+    for path in glob.glob(os.path.join(ROOT_DIR, '*.py')) + glob.glob(os.path.join(ROOT_DIR, '*.json')):
+        shutil.copy(path, tmp_dir)
+    shutil.copytree(os.path.join(ROOT_DIR, 'mocks'), os.path.join(tmp_dir, 'mocks'),
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    os.makedirs(os.path.join(tmp_dir, 'Logs'))
+    return tmp_dir
+
+
+def run_once(work_dir, script, mode, timeout=60.0):
+    """{'seconds', 'rss_kb', 'matplotlib', 'tkinter'} of one start, None if no cycle completed"""
+    env = dict(os.environ, TEST_MODE='1', HEADLESS=MODES[mode], STARTUP_REPORT='1', PYTHONUNBUFFERED='1')
+    start = time.monotonic()
+    proc = subprocess.Popen([sys.executable, script], cwd=work_dir, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    result = None
+    tail = []
+    try:
+        deadline = start + timeout
+        for line in proc.stdout:
+            if line.startswith('STARTUP '):
+                result = {'seconds': time.monotonic() - start}
+                for field in line.split()[1:]:
+                    key, value = field.split('=')
+                    result[key] = int(value)
+                break
+            tail = (tail + [line.rstrip()])[-5:]
+            if time.monotonic() > deadline:
+                break
+    finally:
+        # The scripts clean up on KeyboardInterrupt
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    if result is None:
+        print('  {} {} did not reach its first cycle:'.format(script, mode))
+        for line in tail:
+            print('    ' + line)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure startup time and RSS of the control scripts')
+    parser.add_argument('scripts', nargs='*', default=SCRIPTS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--results', default=RESULTS_PATH)
+    args = parser.parse_args(argv)
+
+    work_dir = scratch_copy()
+    report = {}
+    try:
+        print('{:<45} {:<9} {:>9} {:>10} {:>11}'.format('script', 'mode', 'start (s)', 'RSS (MB)', 'matplotlib'))
+        for script in args.scripts:
+            for mode in MODES:
+                runs = [r for r in (run_once(work_dir, script, mode) for _ in range(args.runs)) if r]
+                if not runs:
+                    continue
+                entry = {
+                    'seconds': statistics.median(r['seconds'] for r in runs),
+                    'rss_kb': statistics.median(r['rss_kb'] for r in runs),
+                    'matplotlib': any(r['matplotlib'] or r['tkinter'] for r in runs),
+                }
+                report.setdefault(script, {})[mode] = entry
+                print('{:<45} {:<9} {:>9.2f} {:>10.1f} {:>11}'.format(
+                    script, mode, entry['seconds'], entry['rss_kb'] / 1024, 'yes' if entry['matplotlib'] else 'no'))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    history = load_json(args.results)
+    history.setdefault(commit_id(), {}).setdefault('startup', {}).update(report)
+    save_json(args.results, history)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,16 @@
 import time
-import csv
-import keyboard
 import os
 from datetime import datetime as dt
-import numpy as np
 import traceback
-import PID # Assuming PID.py is in the same directory
-from collections import deque
-import matplotlib.pyplot as plt
+from pid_bank import PIDBank
+from calibration import default_table
+from conversion_scheduler import ConversionScheduler
+from live_plot import open_plot
+from log_rotation import RotationPolicy
+from log_writer import open_log
+from shared_ring import SharedRing
+from ring_buffer import RingBuffer
+from loop_scheduler import LoopScheduler, pid_sample_time
 
 # --- Conditional Imports for Mocking ---
 if os.environ.get('TEST_MODE') == '1':
@@ -20,34 +23,16 @@ else:
     import adafruit_max31856
 # --- End Conditional Imports ---
 
-# ... (rest of your functions: log_temps, open_file, calibrated_temps) ...
+# ... (rest of your functions: log_temps, open_file) ...
 def log_temps(log_file, data):
-    temp_log_w = csv.writer(log_file)
-    temp_log_w.writerow(data)
+    log_file.write(data)
 
 def open_file(file_name, data_header, root_dir):
-    log_dir = os.path.join(root_dir, 'Logs')
-    os.makedirs(log_dir, exist_ok=True)
-    log_file = open(os.path.join(log_dir, file_name), 'w', encoding='UTF8', newline='')
-    temp_log_w = csv.writer(log_file)
-    temp_log_w.writerow(data_header)
-    return log_file
-
-def calibrated_temps(temp, TC):
-    ActualTemp = temp
-    if TC == 'HeatExB':
-        RawRange = 121
-        ReferenceRange = 126
-        ActualTemp = (((temp + 117) * ReferenceRange) / RawRange) - 108
-    elif TC == 'HeatExF':
-        RawRange = 184
-        ReferenceRange = 179
-        ActualTemp = (((temp + 174) * ReferenceRange) / RawRange) - 161
-    elif TC == 'ColdHead':
-        ActualTemp = temp
-    elif TC == 'Chamber':
-        ActualTemp = temp + 7.6
-    return ActualTemp
+    # Background writer, moves on to a new gzipped segment every 4 MB. Rows
+    # carry a CRC32 and are fsynced together every 10 s, so a power loss costs
+    # at most the last couple of rows (python log_recover.py to salvage a log)
+    return open_log(os.path.join(root_dir, 'Logs'), file_name, data_header, rotation=RotationPolicy(),
+                    fsync_interval=10.0, checksum=True)
 
 if __name__ == '__main__':
     ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
@@ -71,116 +56,77 @@ if __name__ == '__main__':
     HeaterB = digitalio.DigitalInOut(board.D23)
     HeaterB.direction = digitalio.Direction.OUTPUT
 
+    # Calibration for the four thermocouples, applied to the whole frame at once
+    tc_calibration = default_table().channels(['ColdHead', 'HeatExF', 'HeatExB', 'Chamber'])
+
     ColdHead = adafruit_max31856.MAX31856(spi, cs13, thermocouple_type=adafruit_max31856.ThermocoupleType.T)
     HeatExF = adafruit_max31856.MAX31856(spi, cs16, thermocouple_type=adafruit_max31856.ThermocoupleType.T)
     HeatExB = adafruit_max31856.MAX31856(spi, cs25, thermocouple_type=adafruit_max31856.ThermocoupleType.T)
     Chamber = adafruit_max31856.MAX31856(spi, cs26, thermocouple_type=adafruit_max31856.ThermocoupleType.T)
 
+    # Keeps a conversion running on every chip while the loop does its other work
+    scheduler = ConversionScheduler([('ColdHead', ColdHead), ('HeatExF', HeatExF), ('HeatExB', HeatExB), ('Chamber', Chamber)])
+
     HeaterF.value = False
     HeaterB.value = False
 
+    # Loop period in seconds, can go down to the MAX31856 conversion time
+    loop_time = 1
+
     targetT1 = -110
     P1 = 0.2 * 0.6
     I1 = 1.2 * 0.2 / 60
     D1 = 3 * 0.2 * 60 / 40
 
-    controllerF = PID.PID(P1, I1, D1)
-    controllerF.SetPoint = targetT1
-    controllerF.setSampleTime(1)
-
     targetT2 = -110
     P2 = 0.2 * 0.6
     I2 = 1.2 * 0.2 / 60
     D2 = 3 * 0.2 * 60 / 40
 
-    controllerB = PID.PID(P2, I2, D2)
-    controllerB.SetPoint = targetT2
-    controllerB.setSampleTime(1)
+    # One PID loop per heater zone (front, back), all updated in one call and
+    # stepped on the loop's scheduled deadlines
+    controllers = PIDBank([P1, P2], [I1, I2], [D1, D2], setpoint=[targetT1, targetT2],
+                          sample_time=pid_sample_time(loop_time), current_time=time.monotonic())
 
-    data_buffer = []
     itt_len = 6
+    # Last itt_len calibrated readings (cold head, hex F, hex B, chamber) for the averaged log row
+    avg_buffer = RingBuffer(itt_len, 4, track_extrema=[])
     
-    # Initialize data array for plotting
+    # Every sample is published in shared memory for the plot window (its own
+    # process, none when headless) and any other reader
     window_size = 200
-    time_data = deque(maxlen=window_size)
-    coldhead_data = deque(maxlen=window_size)
-    heatexF_data = deque(maxlen=window_size)
-    heatexB_data = deque(maxlen=window_size)
-    chamber_data = deque(maxlen=window_size)
-    
+    sample_ring = SharedRing.create(window_size, ['time', 'temp_ch', 'temp_hex_f', 'temp_hex_b', 'temp_chamber',
+                                                  'mv_hex_f', 'mv_hex_b',
+                                                  # Conversion-complete time of each reading
+                                                  't_ch', 't_hex_f', 't_hex_b', 't_chamber'],
+                                    name='cryoprobe_temperature_control')
+    plot_layout = [
+        {'ylabel': 'Temperature (C)', 'margin': 2,
+         'lines': [(1, 'cold head', 'b'), (2, 'Heat exchange front', 'r'),
+                   (3, 'Heat exchange back', 'g'), (4, 'chamber', 'pink')]},
+    ]
+    plotter = open_plot(sample_ring, plot_layout)
+
     start_time = time.time()
-    
-    #Plot set up
-    fig, ax = plt.subplots(figsize=(8,6))
-    
-    line_coldhead, = ax.plot([], [], "b", label='cold head')
-    line_heatexF, = ax.plot([], [], 'r', label='Heat exchange front')
-    line_heatexB, = ax.plot([], [], 'g', label='Heat exchange back')
-    line_chamber, = ax.plot([], [], 'pink', label='chamber')
-    
-    ax.set_ylabel('Temperature (C)')
-    ax.set_xlabel('Time (s)')
-    ax.legend()
-    
-    plt.show(block=False)
-    
-    def update_plot():
-        line_coldhead.set_data(time_data, coldhead_data)
-        line_heatexF.set_data(time_data, heatexF_data)
-        line_heatexB.set_data(time_data, heatexB_data)
-        line_chamber.set_data(time_data, chamber_data)
-        
-        ax.set_xlim(time_data[0], time_data[-1])
-        
-        t_min = min(min(coldhead_data), min(heatexF_data), min(heatexB_data), min(chamber_data))
-        t_max = max(max(coldhead_data), max(heatexF_data), max(heatexB_data), max(chamber_data))
-        
-        ax.set_ylim(t_min-2, t_max+2)
-        
-        plt.pause(0.01)
+    # The scheduler stamps readings on the monotonic clock, offset to start_time
+    start_mono = time.monotonic()
+    pacer = LoopScheduler(loop_time)
 
     try:
         while True:
             now = time.time()
 
-            if os.stat(os.path.join(ROOT_DIR, 'Logs', data_f_name)).st_size >= 4194304:
-                log_file.close()
-                data_f_name = 'Temp log {}.csv'.format(dt.now().strftime('%m-%d-%Y, %H-%M-%S'))
-                log_file = open_file(data_f_name, data_header, ROOT_DIR)
-
-            ColdHead.initiate_one_shot_measurement()
-            HeatExF.initiate_one_shot_measurement()
-            HeatExB.initiate_one_shot_measurement()
-            Chamber.initiate_one_shot_measurement()
-
-            ColdHead._wait_for_oneshot()
-            temp_coldhead = calibrated_temps(ColdHead.unpack_temperature(), 'ColdHead')
-
-            HeatExF._wait_for_oneshot()
-            temp_HeatExF = calibrated_temps(HeatExF.unpack_temperature(), 'HeatExF')
-
-            HeatExB._wait_for_oneshot()
-            temp_HeatExB = calibrated_temps(HeatExB.unpack_temperature(), 'HeatExB')
+            # Conversions were started at the end of the previous read, normally already done
+            raw_temps, conversion_times = scheduler.collect()
+            temp_coldhead, temp_HeatExF, temp_HeatExB, temp_chamber = tc_calibration.apply(raw_temps).tolist()
 
-            Chamber._wait_for_oneshot()
-            temp_chamber = calibrated_temps(Chamber.unpack_temperature(), 'Chamber')
-            
-            #Append data for plotting
-            current_time = time.time() - start_time
-            time_data.append(current_time)
-            coldhead_data.append(temp_coldhead)
-            heatexF_data.append(temp_HeatExF)
-            heatexB_data.append(temp_HeatExB)
-            chamber_data.append(temp_chamber)
-
-            controllerF.update(temp_HeatExF)
-            controllerB.update(temp_HeatExB)
-            
-            #update plot
-            update_plot()
+            MV1, MV2 = controllers.update((temp_HeatExF, temp_HeatExB), pacer.deadline).tolist()
 
-            MV1 = controllerF.output
-            MV2 = controllerB.output
+            #Publish the sample for plotting and other readers
+            # The row is stamped with when the chips finished converting, not when it was pushed
+            sample_times = [stamp - start_mono for stamp in conversion_times]
+            current_time = max(sample_times)
+            sample_ring.push((current_time, temp_coldhead, temp_HeatExF, temp_HeatExB, temp_chamber, MV1, MV2, *sample_times))
 
             if MV1 > 0:
                 HeaterF.value = True
@@ -196,34 +142,19 @@ if __name__ == '__main__':
                 HeaterB.value = False
                 HeatB_status = 0
 
-            time_stamp = dt.now().strftime('%H:%M:%S')
+            time_stamp = dt.fromtimestamp(start_time + current_time).strftime('%H:%M:%S')
 
-            current_data = [time_stamp, temp_coldhead, temp_HeatExF, temp_HeatExB, temp_chamber, MV1, HeatF_status, MV2, HeatB_status]
             print(temp_coldhead, temp_HeatExF, temp_HeatExB, temp_chamber, HeatF_status, HeatB_status)
-            data_buffer.append(current_data)
-
-            if len(data_buffer) > itt_len:
-                data_buffer.pop(0)
+            avg_buffer.append((temp_coldhead, temp_HeatExF, temp_HeatExB, temp_chamber))
 
-            if len(data_buffer) == itt_len:
-                temps_for_avg = np.array(data_buffer)[:, 1:5].astype(float)
-                mv_f_for_avg = np.array(data_buffer)[:, 5].astype(float)
-                mv_b_for_avg = np.array(data_buffer)[:, 7].astype(float)
-
-                Coldhead_avg = np.average(temps_for_avg[:, 0])
-                HeatExF_avg = np.average(temps_for_avg[:, 1])
-                HeatExB_avg = np.average(temps_for_avg[:, 2])
-                Chamber_avg = np.average(temps_for_avg[:, 3])
+            if len(avg_buffer) == itt_len:
+                Coldhead_avg, HeatExF_avg, HeatExB_avg, Chamber_avg = avg_buffer.view().mean(axis=0).tolist()
             
                 log_temps(log_file, [time_stamp, Coldhead_avg, HeatExF_avg, HeatExB_avg, Chamber_avg, HeatF_status, HeatB_status])
                 log_file.flush()
             
-            elapsed = time.time() - now
-            sleep_duration = 1 - elapsed
-            if sleep_duration > 0:
-                time.sleep(sleep_duration)
-            else:
-                time.sleep(0.01)
+            # Sleep to the next absolute deadline, an overrun skips to the following one
+            pacer.wait()
 
     except Exception as e:
         HeaterF.value = False
@@ -248,4 +179,9 @@ if __name__ == '__main__':
             log_file.close()
         HeaterF.value = False
         HeaterB.value = False
+        if plotter is not None:
+            plotter.terminate()
+        sample_ring.close()
         print("Heaters turned off and log file closed.")
+        print("Sample rate per channel (Hz):", scheduler.rates())
+        print(pacer.summary())
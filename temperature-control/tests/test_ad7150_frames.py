@@ -0,0 +1,56 @@
+import numpy as np
+
+from ad7150_frames import FRAME_SIZE, FrameDecoder, capacitance, encode, mean_adc
+
+
+def frames_bytes(seq):
+    seq = np.asarray(seq)
+    return encode(seq, seq * 1000, seq * 4 + 40000, 3, 0, count=4)
+
+
+def test_decodes_frames_fed_in_arbitrary_chunks():
+    data = frames_bytes(np.arange(50))
+    decoder = FrameDecoder()
+    chunks = [decoder.feed(data[i:i + 7]) for i in range(0, len(data), 7)]
+    frames = np.concatenate(chunks)
+    np.testing.assert_array_equal(frames['seq'], np.arange(50))
+    np.testing.assert_array_equal(mean_adc(frames), np.arange(50) + 10000)
+    assert decoder.frames == 50
+    assert decoder.bad_frames == decoder.skipped_bytes == decoder.lost == 0
+
+
+def test_resyncs_after_junk():
+    data = b'\x00\x5a\xa5junk' + frames_bytes([0, 1]) + b'\xa5\x5a\x01' + frames_bytes([2, 3])
+    decoder = FrameDecoder()
+    frames = decoder.feed(data)
+    np.testing.assert_array_equal(frames['seq'], [0, 1, 2, 3])
+    assert decoder.lost == 0
+    assert decoder.skipped_bytes > 0
+
+
+def test_rejects_frames_with_a_bad_crc():
+    data = bytearray(frames_bytes(np.arange(5)))
+    # Flip a bit in the ADC sum of frame 2
+    data[2 * FRAME_SIZE + 8] ^= 0x01
+    decoder = FrameDecoder()
+    frames = decoder.feed(bytes(data))
+    np.testing.assert_array_equal(frames['seq'], [0, 1, 3, 4])
+    assert decoder.bad_frames == 1
+    assert decoder.lost == 1
+
+
+def test_counts_sequence_gaps_across_feeds_and_wraparound():
+    decoder = FrameDecoder()
+    decoder.feed(frames_bytes([65533, 65534]))
+    frames = decoder.feed(frames_bytes([1, 2, 6]))
+    np.testing.assert_array_equal(frames['seq'], [1, 2, 6])
+    # 65535 and 0 are missing across the wrap, then 3, 4 and 5
+    assert decoder.lost == 5
+    assert decoder.gaps == 2
+
+
+def test_capacitance_matches_the_firmware_formula():
+    decoder = FrameDecoder()
+    frames = decoder.feed(encode([0], [0], [4 * 30000], [8], [3], count=4))
+    expected = (30000 - 12288.0) / 40944.0 * 4.0 + 8 * 12.5 / 64
+    np.testing.assert_allclose(capacitance(frames), [expected])
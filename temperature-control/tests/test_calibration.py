@@ -0,0 +1,66 @@
+import csv
+
+import numpy as np
+import pytest
+
+import calibration
+from calibration import CalibrationTable
+
+
+def legacy_calibrated_temps(temp, TC):
+    """The constants temperature_control.py and CryoProbe_Temp_Control.py used to carry"""
+    if TC == 'Tip':
+        return (((temp + 159.6) * 169.3) / 179.8) - 150.7
+    if TC == 'Ceramic':
+        return (((temp + 159.9) * 169.5) / 179.7) - 150.9
+    if TC == 'HeatExB':
+        return (((temp + 117) * 126) / 121) - 108
+    if TC == 'HeatExF':
+        return (((temp + 174) * 179) / 184) - 161
+    if TC == 'Chamber':
+        return temp + 7.6
+    return temp
+
+
+@pytest.mark.parametrize('name', ['Tip', 'Ceramic', 'HeatExB', 'HeatExF', 'ColdHead', 'Chamber'])
+def test_default_table_matches_the_old_scripts(name):
+    for temp in (-180.0, -110.5, 0.0, 25.0):
+        assert calibration.calibrated_temps(temp, name) == pytest.approx(legacy_calibrated_temps(temp, name))
+
+
+def test_channel_map_calibrates_frames_and_columns():
+    cmap = calibration.default_table().channels(['HeatExF', 'HeatExB', 'Chamber'])
+    raw = np.array([[-100.0, -90.0, 20.0], [-120.0, -95.0, 21.0]])
+    expected = [[legacy_calibrated_temps(v, n) for v, n in zip(row, cmap.names)] for row in raw.tolist()]
+    np.testing.assert_allclose(cmap.apply(raw), expected)
+    np.testing.assert_allclose(cmap.apply(raw[0]), expected[0])
+
+
+def test_poly_entry():
+    table = CalibrationTable({'_comment': 'ignored', 'RTD': {'poly': [1.0, 2.0, 0.5]}})
+    assert list(table.entries) == ['RTD']
+    assert table.calibrate(2.0, 'RTD') == pytest.approx(1.0 + 4.0 + 2.0)
+    np.testing.assert_allclose(table.channels(['RTD']).apply([[0.0], [-2.0]]), [[1.0], [-1.0]])
+
+
+def test_unknown_channel():
+    with pytest.raises(KeyError, match='Flow'):
+        calibration.default_table().channels(['Tip', 'Flow'])
+
+
+def test_calibrate_csv(tmp_path):
+    src = tmp_path / 'in.csv'
+    dst = tmp_path / 'out.csv'
+    with open(src, 'w', newline='') as f:
+        csv.writer(f).writerows([['Real time', 'Temp_Tip', 'MV'],
+                                 ['0:00:01', '-110.0', '3.5'],
+                                 ['0:00:02', 'nan?', '3.5']])
+    calibration.main([str(src), str(dst), '--map', 'Temp_Tip=Tip'])
+
+    with open(dst, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['Real time', 'Temp_Tip', 'MV']
+    assert float(rows[1][1]) == pytest.approx(legacy_calibrated_temps(-110.0, 'Tip'), abs=1e-3)
+    assert rows[1][2] == '3.5'
+    # Fields that are not numbers are left as they were
+    assert rows[2][1] == 'nan?'
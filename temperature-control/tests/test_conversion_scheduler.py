@@ -0,0 +1,94 @@
+import pytest
+
+import conversion_scheduler
+from conversion_scheduler import ConversionScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeChip:
+    """MAX31856 one-shot interface; a conversion takes conversion_time on the fake clock"""
+
+    def __init__(self, clock, conversion_time, temperature):
+        self.clock = clock
+        self.conversion_time = conversion_time
+        self.temperature = temperature
+        self.done_at = None
+        self.triggers = 0
+
+    def initiate_one_shot_measurement(self):
+        self.triggers += 1
+        self.done_at = self.clock() + self.conversion_time
+
+    @property
+    def oneshot_pending(self):
+        return self.done_at is None or self.clock() < self.done_at
+
+    def unpack_temperature(self):
+        return self.temperature
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(conversion_scheduler.time, 'sleep', clock.sleep)
+    return clock
+
+
+def make_scheduler(clock, conversion_times=(0.1, 0.1, 0.15), **kwargs):
+    chips = [FakeChip(clock, c, -100.0 - i) for i, c in enumerate(conversion_times)]
+    names = ['ColdHead', 'HeatExF', 'HeatExB'][:len(chips)]
+    return ConversionScheduler(list(zip(names, chips)), poll_interval=0.01, clock=clock, **kwargs), chips
+
+
+def test_first_collect_waits_for_every_chip(clock):
+    scheduler, chips = make_scheduler(clock)
+    values, stamps = scheduler.collect()
+    assert values == [-100.0, -101.0, -102.0]
+    assert stamps[0] == pytest.approx(100.1)
+    assert stamps[2] == pytest.approx(100.15)
+    assert scheduler.waited == pytest.approx(0.15)
+    # Every chip is re-armed as soon as it is read
+    assert [chip.triggers for chip in chips] == [2, 2, 2]
+
+
+def test_conversions_overlap_the_loop_work(clock):
+    scheduler, chips = make_scheduler(clock)
+    scheduler.collect()
+    for _ in range(60):
+        # PID, DAC and logging take longer than a conversion
+        clock.now += 0.25
+        done = [chip.done_at for chip in chips]
+        values, stamps = scheduler.collect()
+        assert scheduler.waited == 0.0
+        assert values == [-100.0, -101.0, -102.0]
+        # Stamped with the learned conversion-complete time, not when collect() got to it
+        assert stamps == pytest.approx(done)
+        assert max(stamps) < clock.now
+    # The rate estimate settles on the loop period
+    assert scheduler.rates() == pytest.approx({'ColdHead': 4.0, 'HeatExF': 4.0, 'HeatExB': 4.0}, rel=1e-2)
+
+
+def test_loop_faster_than_a_conversion_waits_only_the_remainder(clock):
+    scheduler, _ = make_scheduler(clock, conversion_times=(0.2,))
+    scheduler.collect()
+    clock.now += 0.05
+    scheduler.collect()
+    assert scheduler.waited == pytest.approx(0.15)
+    assert scheduler.rates()['ColdHead'] == pytest.approx(5.0)
+
+
+def test_timeout_names_the_stuck_chip(clock):
+    scheduler, chips = make_scheduler(clock, timeout=1.0)
+    chips[1].conversion_time = 10.0
+    with pytest.raises(RuntimeError, match='HeatExF'):
+        scheduler.collect()
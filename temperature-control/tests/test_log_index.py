@@ -0,0 +1,74 @@
+import gzip
+from datetime import datetime as dt, timedelta
+
+import log_index
+
+START = dt(2025, 4, 15, 8, 29, 5)
+NAME = 'Cap_Serial_04-15-2025-08-29-05.csv'
+
+
+def write_log(path, times, stray=None):
+    """Cap_Serial style log, one row every 0.1 s; stray is written as the first time"""
+    lines = ['"Real time \tCapacitance \t"']
+    if stray is not None:
+        lines.append('{}\t0.0'.format(stray))
+    for i, t in enumerate(times):
+        lines.append('{}\t{}'.format(timedelta(seconds=t), 1.0 + i * 1e-3))
+    path.write_text('\n'.join(lines) + '\n')
+
+
+def query(log_dir, t_from, t_to):
+    t0 = START.timestamp()
+    return [(name, round(t - t0, 6), values[0])
+            for name, t, values in log_index.query(str(log_dir), t0 + t_from, t0 + t_to, ['Capacitance'])]
+
+
+def test_query_seeks_to_the_range(tmp_path):
+    times = [0.1 * i for i in range(2000)]
+    write_log(tmp_path / NAME, times)
+
+    rows = query(tmp_path, 100.0, 100.45)
+    assert [t for _, t, _ in rows] == [100.0, 100.1, 100.2, 100.3, 100.4]
+    assert rows[0][2] == '2.0'
+
+    entry = log_index.update_index(str(tmp_path))['files'][NAME]
+    assert 'Capacitance' in entry['columns']
+    assert entry['rows'] == 2000
+    assert len(entry['checkpoints']) == -(-2000 // log_index.CHECKPOINT_ROWS)
+
+
+def test_stray_first_row(tmp_path):
+    write_log(tmp_path / NAME, [1.0 + 0.1 * i for i in range(600)], stray='968160')
+
+    entry = log_index.update_index(str(tmp_path))['files'][NAME]
+    assert entry['first'] == START.timestamp() + 1.0
+    assert entry['last'] == START.timestamp() + 968160
+    checkpoint_times = [t for t, _ in entry['checkpoints']]
+    assert checkpoint_times == sorted(checkpoint_times)
+
+    assert len(query(tmp_path, 0.0, 2.05)) == 11
+    assert len(query(tmp_path, 40.0, 40.05)) == 1
+
+
+def test_grown_file_is_scanned_incrementally(tmp_path):
+    path = tmp_path / NAME
+    write_log(path, [0.1 * i for i in range(300)])
+    log_index.update_index(str(tmp_path))
+
+    with open(path, 'a') as f:
+        f.write('{}\t5.0\n'.format(timedelta(seconds=30.0)))
+    entry = log_index.update_index(str(tmp_path))['files'][NAME]
+    assert entry['rows'] == 301
+    assert query(tmp_path, 29.95, 31.0) == [(NAME, 30.0, '5.0')]
+
+
+def test_compressed_segment(tmp_path):
+    write_log(tmp_path / 'plain.csv', [])
+    text = (tmp_path / 'plain.csv').read_text()
+    text += ''.join('{}\t{}\n'.format(timedelta(seconds=0.1 * i), i) for i in range(500))
+    with gzip.open(tmp_path / (NAME + '.gz'), 'wt') as f:
+        f.write(text)
+    (tmp_path / 'plain.csv').unlink()
+
+    rows = query(tmp_path, 20.0, 20.15)
+    assert [(t, v) for _, t, v in rows] == [(20.0, '200'), (20.1, '201')]
@@ -0,0 +1,89 @@
+import gzip
+
+import pytest
+
+import log_recover
+from log_writer import LogWriter
+
+
+@pytest.fixture
+def log_bytes(tmp_path):
+    """A checksummed log of 100 rows"""
+    path = tmp_path / 'log.csv'
+    with LogWriter(str(path), ['Real time', 'Temp_Tip', 'MV'], checksum=True) as writer:
+        for i in range(100):
+            writer.write(['0:00:{:02d}.{:06d}'.format(i // 4, i % 4 * 250000), -100.0 - i, i * 0.5])
+    return path.read_bytes()
+
+
+def test_intact_log(log_bytes):
+    header, kept, report = log_recover.recover(log_bytes)
+    assert header == 'Real time,Temp_Tip,MV,crc32'
+    assert len(kept) == 100
+    assert report['damaged'] == 0
+    assert report['checksums']
+
+
+def test_torn_last_row(log_bytes):
+    header, kept, report = log_recover.recover(log_bytes[:-9])
+    assert len(kept) == 99
+    assert report['damaged'] == 1
+    assert report['lost']['truncated'] == 1
+
+
+def test_row_torn_before_its_newline_fails_the_checksum(log_bytes):
+    lines = log_bytes.split(b'\r\n')
+    # Row 50 lost the end of its MV field but kept a line ending
+    lines[50] = lines[50][:-12] + lines[50][-8:]
+    header, kept, report = log_recover.recover(b'\r\n'.join(lines))
+    assert len(kept) == 99
+    assert report['lost']['bad checksum'] == 1
+
+
+def test_zero_filled_block(log_bytes):
+    start = log_bytes.index(b'\n', 1000) + 1
+    end = log_bytes.index(b'\n', 2000) + 1
+    damaged = log_bytes[:start] + b'\x00' * (end - start) + log_bytes[end:]
+    lost_rows = log_bytes[start:end].count(b'\n')
+
+    header, kept, report = log_recover.recover(damaged)
+    assert len(kept) == 100 - lost_rows
+    assert report['lost']['zero-filled'] == 1
+    assert report['zero_bytes'] == end - start
+    (first, last, reasons, before, after), = report['runs']
+    assert reasons == ['zero-filled']
+    # The rows either side of the hole are named in the report
+    assert before == kept[log_bytes[:start].count(b'\n') - 2].split(',')[0]
+    assert after == kept[log_bytes[:start].count(b'\n') - 1].split(',')[0]
+
+
+def test_zeros_replacing_the_end(log_bytes):
+    damaged = log_bytes[:-200] + b'\x00' * 200
+    header, kept, report = log_recover.recover(damaged)
+    assert kept == log_bytes.decode().splitlines()[1:len(kept) + 1]
+    # The zeros run into the last line, which has no newline left
+    assert report['damaged'] == 1
+    assert report['lost']['truncated'] == 1
+    assert report['zero_bytes'] == 200
+
+
+def test_truncated_gzip_segment(tmp_path, log_bytes):
+    path = tmp_path / 'log.001.csv.gz'
+    compressed = gzip.compress(log_bytes)
+    path.write_bytes(compressed[:len(compressed) * 2 // 3])
+
+    data, cut = log_recover.read_damaged(str(path))
+    assert cut
+    assert log_bytes.startswith(data)
+    header, kept, report = log_recover.recover(data)
+    assert header == 'Real time,Temp_Tip,MV,crc32'
+    assert 0 < len(kept) < 100
+    assert kept == log_bytes.decode().splitlines()[1:len(kept) + 1]
+
+
+def test_main_writes_the_recovered_rows(tmp_path, log_bytes):
+    path = tmp_path / 'log.csv'
+    path.write_bytes(log_bytes[:-9])
+    assert log_recover.main([str(path)]) == 1
+    recovered = (tmp_path / 'log.recovered.csv').read_bytes()
+    assert recovered == log_bytes[:log_bytes.rindex(b'\r\n', 0, len(log_bytes) - 9) + 2]
@@ -0,0 +1,103 @@
+import csv
+import os
+import threading
+
+from log_rotation import RotationPolicy, open_log_file, segment_path
+from log_writer import LogWriter, checked_line, verify_line
+
+
+def read_rows(path):
+    with open(path, encoding='UTF8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_close_drains_every_queued_row(tmp_path):
+    path = tmp_path / 'log.csv'
+    writer = LogWriter(str(path), ['i', 'x'], flush_rows=7)
+    for i in range(1000):
+        assert writer.write([i, i * 0.5])
+    writer.close()
+
+    assert writer.closed
+    assert writer.error is None
+    stats = writer.stats()
+    assert stats['rows_written'] == 1000
+    assert stats['dropped_rows'] == 0
+    assert stats['queue_depth'] == 0
+    rows = read_rows(path)
+    assert rows[0] == ['i', 'x']
+    assert [int(r[0]) for r in rows[1:]] == list(range(1000))
+
+
+def test_full_queue_drops_and_counts_rows(tmp_path):
+    path = tmp_path / 'log.csv'
+    writer = LogWriter(str(path), ['i'], max_queue=5)
+    entered = threading.Event()
+    release = threading.Event()
+    write_row = writer._write_row
+
+    def slow_write_row(row):
+        entered.set()
+        release.wait(5)
+        return write_row(row)
+
+    writer._write_row = slow_write_row
+    assert writer.write([0])
+    assert entered.wait(5)
+    # The writer thread is stuck on row 0, five more fit in the queue
+    results = [writer.write([i]) for i in range(1, 11)]
+    assert results == [True] * 5 + [False] * 5
+    assert writer.dropped_rows == 5
+    assert writer.max_queue_depth == 5
+
+    release.set()
+    writer.close()
+    assert writer.rows_written == 6
+    assert [r[0] for r in read_rows(path)] == ['i', '0', '1', '2', '3', '4', '5']
+
+
+def test_close_leaves_the_file_to_a_busy_writer(tmp_path):
+    writer = LogWriter(str(tmp_path / 'log.csv'), ['i'])
+    release = threading.Event()
+    write_row = writer._write_row
+    writer._write_row = lambda row: (release.wait(5), write_row(row))[1]
+    writer.write([0])
+
+    writer.close(timeout=0.1)
+    assert not writer.closed
+    assert isinstance(writer.error, TimeoutError)
+
+    release.set()
+    writer._thread.join(5)
+    assert writer.closed
+
+
+def test_checksum_column(tmp_path):
+    path = tmp_path / 'log.csv'
+    with LogWriter(str(path), ['i', 'name'], checksum=True) as writer:
+        writer.write([1, 'tip, ceramic'])
+    with open(path, encoding='UTF8', newline='') as f:
+        header, line = f.read().splitlines()
+    assert header == 'i,name,crc32'
+    assert verify_line(line) == '1,"tip, ceramic"'
+    assert verify_line(line.replace('1,', '2,', 1)) is None
+    assert verify_line(checked_line('a,b')) == 'a,b'
+
+
+def test_rotation_compresses_only_rotated_segments(tmp_path):
+    with LogWriter(str(tmp_path / 'log.csv'), ['i'], rotation=RotationPolicy(max_bytes=2000)) as writer:
+        for i in range(1000):
+            writer.write([i])
+    with LogWriter(str(tmp_path / 'short.csv'), ['i'], rotation=RotationPolicy()) as short:
+        short.write([0])
+
+    assert writer.segment > 0
+    # The segment being written when the log closed stays plain
+    assert os.path.exists(writer.path) and writer.path.endswith('.csv')
+    assert os.path.exists(short.path) and short.path.endswith('short.csv')
+    rotated = [segment_path(str(tmp_path / 'log.csv'), n) + '.gz' for n in range(writer.segment)]
+    rows = []
+    for path in rotated + [writer.path]:
+        with open_log_file(path, 'rt', encoding='UTF8', newline='') as f:
+            rows += [int(r[0]) for r in csv.reader(f) if r != ['i']]
+    assert rows == list(range(1000))
@@ -0,0 +1,101 @@
+import pytest
+
+from loop_scheduler import CATCH_UP, LoopScheduler, pid_sample_time
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the loop sleeps or works"""
+
+    def __init__(self, oversleep=0.0):
+        self.now = 100.0
+        self.oversleep = oversleep
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds + self.oversleep
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+def make(period=0.25, oversleep=0.0, **kwargs):
+    clock = FakeClock(oversleep)
+    return clock, LoopScheduler(period, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_keeps_to_absolute_deadlines():
+    clock, pacer = make(oversleep=0.001)
+    deadlines = []
+    for _ in range(40):
+        clock.work(0.1)
+        deadlines.append(pacer.wait())
+    # No drift from the oversleep, every cycle starts on the grid
+    assert deadlines == [100.0 + 0.25 * k for k in range(1, 41)]
+    assert pacer.dt == 0.25
+    assert pacer.overruns == pacer.skipped == 0
+    assert pacer.max_jitter == pytest.approx(0.001)
+    # The body is timed from the actual wake-up
+    assert pacer.busy.max == pytest.approx(0.1)
+
+
+def test_skip_drops_missed_deadlines():
+    clock, pacer = make()
+    clock.work(0.1)
+    pacer.wait()
+    # The cycle started at 100.25 runs until 101.1, past the deadlines at
+    # 100.5, 100.75 and 101.0; the first two are skipped
+    clock.work(0.85)
+    assert pacer.wait() == 101.0
+    assert pacer.dt == 0.75
+    assert pacer.overruns == 1
+    assert pacer.skipped == 2
+    assert pacer.max_jitter == pytest.approx(0.1)
+    clock.work(0.1)
+    assert pacer.wait() == 101.25
+    assert pacer.cycles == 3
+
+
+def test_catch_up_runs_missed_cycles_back_to_back():
+    clock, pacer = make(policy=CATCH_UP, max_catch_up=2)
+    clock.work(0.6)
+    # Two deadlines have passed, both are run without sleeping
+    assert pacer.wait() == 100.25
+    assert pacer.wait() == 100.5
+    assert clock.now == 100.6
+    assert pacer.wait() == 100.75
+    assert clock.now == 100.75
+    assert (pacer.overruns, pacer.skipped) == (2, 0)
+
+
+def test_catch_up_skips_beyond_max_catch_up():
+    clock, pacer = make(policy=CATCH_UP, max_catch_up=2)
+    clock.work(1.3)
+    # Four missed deadlines are more than two, keep to the grid instead
+    assert pacer.wait() == 101.25
+    assert (pacer.overruns, pacer.skipped) == (1, 4)
+
+
+def test_iteration_yields_scheduled_starts():
+    clock, pacer = make()
+    starts = []
+    for start in pacer:
+        starts.append(start)
+        clock.work(0.05)
+        if len(starts) == 4:
+            break
+    assert starts == [100.0, 100.25, 100.5, 100.75]
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        LoopScheduler(1.0, policy='drop')
+
+
+def test_pid_sample_time_tolerates_deadline_rounding():
+    period = 0.1
+    deadlines = [k * period for k in range(1, 1000)]
+    steps = [b - a for a, b in zip(deadlines, deadlines[1:])]
+    assert min(steps) < period
+    assert min(steps) >= pid_sample_time(period)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from lttb import DownsampledTrace, lttb_indices
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[437] = 10.0
+    keep = lttb_indices(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 437 in keep
+    assert np.all(np.diff(keep) > 0)
+    np.testing.assert_array_equal(lttb_indices(x[:10], y[:10], 50), np.arange(10))
+
+
+def test_trace_covers_a_long_run_evenly():
+    # 12 hour cooldown at 4 Hz
+    t = np.arange(0, 12 * 3600, 0.25)
+    y = -110 + 130 * np.exp(-t / 7200) + np.sin(t / 60)
+    y[40000] = 50.0
+    trace = DownsampledTrace(400)
+    for a, b in zip(t.tolist(), y.tolist()):
+        trace.append(a, b)
+
+    x, v = trace.points()
+    assert trace.total == len(t)
+    assert len(x) == len(trace) <= 800
+    assert np.all(np.diff(x) > 0)
+    assert x[0] == 0.0
+    per_hour = np.histogram(x, bins=12, range=(0, 12 * 3600))[0]
+    assert per_hour.min() >= 0.9 * per_hour.max()
+    # Extremes survive every merge
+    assert v.max() == 50.0
+    assert v.min() == y.min()
+
+    x2, v2 = trace.points(300)
+    assert len(x2) == 300
+    assert 50.0 in v2
+
+
+def test_short_trace_is_kept_raw():
+    trace = DownsampledTrace(100)
+    for i in range(150):
+        trace.append(i, -i)
+    x, y = trace.points()
+    np.testing.assert_array_equal(x, np.arange(150))
+    np.testing.assert_array_equal(y, -np.arange(150))
+
+
+def test_constant_time_points_do_not_fail():
+    trace = DownsampledTrace(10)
+    for i in range(100):
+        trace.append(5.0, float(i))
+    x, y = trace.points()
+    assert set(x.tolist()) == {5.0}
+    assert y.min() == 0.0 and y.max() == 99.0
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import PID
+from pid_bank import PIDBank
+
+
+@pytest.mark.parametrize('sample_time', [0.0, 0.3])
+def test_bank_matches_pid(sample_time):
+    rng = np.random.default_rng(1)
+    gains = rng.uniform(0.0, 2.0, size=(3, 6))
+    setpoints = rng.uniform(-120.0, 20.0, size=6)
+    bank = PIDBank(gains[0], gains[1], gains[2], setpoints, sample_time, windup_guard=5.0, current_time=0.0)
+    pids = []
+    for i in range(6):
+        pid = PID.PID(*gains[:, i], current_time=0.0)
+        pid.SetPoint = setpoints[i]
+        pid.setSampleTime(sample_time)
+        pid.setWindup(5.0)
+        pids.append(pid)
+
+    t = 0.0
+    for _ in range(200):
+        # Irregular steps, some shorter than sample_time
+        t += rng.choice([0.1, 0.25, 0.5, 1.0])
+        feedback = rng.uniform(-150.0, 30.0, size=6)
+        outputs = bank.update(feedback, t)
+        for pid, value in zip(pids, feedback):
+            pid.update(value, t)
+        np.testing.assert_allclose(outputs, [pid.output for pid in pids], rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(bank.ITerm, [pid.ITerm for pid in pids], rtol=1e-12, atol=1e-12)
+
+
+def test_channels_are_due_independently():
+    bank = PIDBank(1.0, sample_time=[0.0, 1.0], current_time=0.0)
+    np.testing.assert_array_equal(bank.update([1.0, 1.0], 0.5), [-1.0, 0.0])
+    np.testing.assert_array_equal(bank.update([2.0, 2.0], 1.0), [-2.0, -2.0])
+
+
+def test_output_clamp():
+    bank = PIDBank(10.0, out_min=-1.0, out_max=1.0, current_time=0.0)
+    np.testing.assert_array_equal(bank.update(-5.0, 1.0), 1.0)
+    np.testing.assert_array_equal(bank.update(5.0, 2.0), -1.0)
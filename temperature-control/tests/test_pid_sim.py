@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pytest
+
+import PID
+from loop_scheduler import pid_sample_time
+from pid_sim import FOPDTPlant, grid_search, simulate
+
+
+def open_loop(plant, u, duration, dt):
+    temperature = plant.reset((1,), dt)
+    trace = []
+    for _ in range(int(round(duration / dt))):
+        temperature = plant.step(np.array([u]))
+        trace.append(float(temperature[0]))
+    return trace
+
+
+def test_plant_step_is_exact_for_any_step_size():
+    plant = FOPDTPlant(gain=150.0, tau=300.0, dead_time=0.0, base=-200.0, initial=20.0)
+    expected = -50.0 + (20.0 + 50.0) * math.exp(-600.0 / 300.0)
+    assert open_loop(plant, 1.0, 600.0, 1.0)[-1] == pytest.approx(expected)
+    assert open_loop(plant, 1.0, 600.0, 7.5)[-1] == pytest.approx(expected)
+
+
+def test_plant_dead_time():
+    heated = open_loop(FOPDTPlant(dead_time=15.0), 1.0, 30.0, 1.0)
+    idle = open_loop(FOPDTPlant(dead_time=15.0), 0.0, 30.0, 1.0)
+    assert heated[:15] == idle[:15]
+    assert heated[15] > idle[15]
+
+
+def test_step_response_matches_the_scalar_pid():
+    Kp, Ki, Kd, setpoint, dt = 0.05, 0.0005, 0.5, -110.0, 1.0
+    result = simulate(np.array([Kp]), Ki, Kd, setpoint=setpoint, duration=1800.0, dt=dt,
+                      actuator='dac', record=[0])
+
+    # The same loop one sample at a time through PID.PID, as the control scripts run it
+    plant = FOPDTPlant()
+    temperature = plant.reset((1,), dt)
+    pid = PID.PID(Kp, Ki, Kd, current_time=0.0)
+    pid.SetPoint = setpoint
+    pid.setSampleTime(pid_sample_time(dt))
+    pid.setWindup(20.0)
+    expected = []
+    for k in range(1800):
+        pid.update(float(temperature[0]), current_time=(k + 1) * dt)
+        temperature = plant.step(np.clip([pid.output], 0.0, 1.0))
+        expected.append(float(temperature[0]))
+
+    np.testing.assert_allclose(result['trace'][:, 0], expected)
+    assert result['final'][0] == pytest.approx(expected[-1])
+    errors = np.abs(np.array(expected) - setpoint)
+    assert result['iae'][0] == pytest.approx(errors.sum() * dt)
+
+
+def test_step_response_metrics():
+    # Cooling from 20 C to -110 C on a short dead time: off, proportional-only and a stiff controller
+    plant = FOPDTPlant(dead_time=2.0)
+    result = simulate(np.array([0.0, 0.05, 1.0]), 0.0, 0.0, plant=plant, duration=3600.0, actuator='dac')
+    assert math.isinf(result['settling_time'][0])
+    assert result['final'][0] == pytest.approx(-200.0 + 220.0 * math.exp(-3600.0 / 300.0))
+    assert result['overshoot'][0] == pytest.approx(90.0, abs=1e-2)
+    # Proportional-only offset: T = base + gain * Kp * (setpoint - T)
+    assert math.isinf(result['settling_time'][1])
+    assert result['final'][1] == pytest.approx((-200.0 + 7.5 * -110.0) / 8.5, abs=1e-3)
+    assert 0 < result['settling_time'][2] < 600
+    assert abs(result['final'][2] + 110.0) <= 1.0
+    assert result['overshoot'][2] < 2.0
+    assert result['iae'][2] < result['iae'][1] < result['iae'][0]
+
+
+def test_grid_search_ranks_and_filters():
+    kwargs = dict(plant=FOPDTPlant(dead_time=2.0), duration=3600.0, actuator='dac')
+    ranked = grid_search([0.0, 0.05, 1.0], [0.0], [0.0, 1.0], **kwargs)
+    assert len(ranked) == 6
+    settling = [r['settling_time'] for r in ranked]
+    assert settling == sorted(settling)
+    assert ranked[0]['Kp'] == 1.0
+    assert ranked[-1]['Kp'] == 0.0
+
+    kept = grid_search([0.0, 0.05, 1.0], [0.0], [0.0, 1.0], max_overshoot=5.0, **kwargs)
+    assert {r['Kp'] for r in kept} == {1.0}
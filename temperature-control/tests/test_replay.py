@@ -0,0 +1,55 @@
+import csv
+
+import numpy as np
+import pytest
+
+import replay
+
+FEEDBACK = [-105.0, -112.0, -108.5, -110.0, -115.25, -109.0]
+
+
+@pytest.fixture
+def temp_log(tmp_path):
+    """A temperature_control.py log: Rt wall clock, heater status as 0/1"""
+    path = tmp_path / 'Temp log 01-27-2026, 23-59-57.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Rt', 'temp_ch', 'temp_hex_b', 'Heat B'])
+        for i, temp in enumerate(FEEDBACK):
+            # Crosses midnight after three rows
+            clock = '23:59:{:02d}'.format(57 + i) if i < 3 else '00:00:{:02d}'.format(i - 3)
+            writer.writerow([clock, -150.0, temp, int(temp < -110.0)])
+    return path
+
+
+def test_read_log_clock_times(temp_log):
+    t, columns = replay.read_log(str(temp_log))
+    assert np.diff(t).tolist() == [1.0] * 5
+    assert replay.find_column(columns, ' HEAT b ').tolist() == [0, 1, 0, 0, 1, 0]
+    with pytest.raises(KeyError):
+        replay.find_column(columns, 'mv')
+
+
+def test_cli_writes_the_replay(temp_log, tmp_path, capsys):
+    out = tmp_path / 'out.csv'
+    replay.main([str(temp_log), '--feedback', 'temp_hex_b', '--recorded', 'Heat B',
+                 '--kp', '1', '--ki', '0', '--kd', '0', '--setpoint', '-110', '--out', str(out)])
+
+    printed = capsys.readouterr().out
+    assert '6 rows spanning 5 s' in printed
+    assert 'Actuator agreement with the recording: 100.0%' in printed
+
+    with open(out, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['t', 'temp_hex_b', 'mv', 'command', 'recorded']
+    assert [float(r[0]) for r in rows[1:]] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    # Proportional only: mv = setpoint - feedback
+    assert [float(r[2]) for r in rows[1:]] == pytest.approx([-110.0 - y for y in FEEDBACK])
+    assert [float(r[3]) for r in rows[1:]] == [0.0, 1.0, 0.0, 0.0, 1.0, 0.0]
+
+
+def test_cli_missing_column_is_a_usage_error(temp_log, capsys):
+    with pytest.raises(SystemExit) as e:
+        replay.main([str(temp_log), '--feedback', 'temp_tip'])
+    assert e.value.code == 2
+    assert "no column 'temp_tip'" in capsys.readouterr().err
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from ring_buffer import RingBuffer
+
+
+def test_ring_buffer_keeps_the_last_capacity_rows():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(257, 3))
+    ring = RingBuffer(40, 3)
+    for k, row in enumerate(data, 1):
+        ring.append(row)
+        expected = data[max(k - 40, 0):k]
+        np.testing.assert_array_equal(ring.view(), expected)
+        np.testing.assert_array_equal(ring.channel(1), expected[:, 1])
+        np.testing.assert_array_equal(ring.latest(), row)
+        assert ring.min(0) == expected[:, 0].min()
+        assert ring.max(1, 2) == expected[:, 1:].max()
+    assert len(ring) == 40
+    assert not ring.view().flags.writeable
+
+
+def test_ring_buffer_untracked_and_empty():
+    ring = RingBuffer(4, 2, track_extrema=[1])
+    assert ring.latest() is None
+    assert np.isnan(ring.max(1))
+    ring.append([5.0, 6.0])
+    with pytest.raises(KeyError):
+        ring.min(0)
+    ring.clear()
+    assert len(ring) == 0
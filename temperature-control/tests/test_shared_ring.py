@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+import shared_ring
+from shared_ring import SharedRing
+
+CHANNELS = 64
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRing.create(32, ['time'] + ['ch{}'.format(i) for i in range(1, CHANNELS)],
+                             name='test_ring_{}'.format(os.getpid()), start_ns=123)
+    yield ring
+    ring.close()
+
+
+def _writer(name, rows):
+    # Only the creator pushes in the control scripts; a forked writer keeps the test simple
+    ring = SharedRing.attach(name)
+    for i in range(1, rows + 1):
+        ring.push(np.full(ring.channels, float(i)))
+    ring.close()
+
+
+def test_attach_sees_names_and_rows(ring):
+    other = SharedRing.attach(ring.name)
+    try:
+        assert other.names == ring.names
+        assert other.start_ns == 123
+        assert other.latest() is None
+        ring.push(np.arange(CHANNELS, dtype=float))
+        assert other.latest()['ch5'] == 5.0
+        assert other.count == 1
+    finally:
+        other.close()
+
+
+def test_window_after_wrapping(ring):
+    for i in range(100):
+        ring.push(np.full(CHANNELS, float(i)))
+    assert ring.window(5)[:, 0].tolist() == [95, 96, 97, 98, 99]
+    # The oldest slot may be the one being rewritten, so a full window leaves it out
+    assert ring.window()[:, 0].tolist() == list(range(69, 100))
+
+
+def test_odd_sequence_means_a_write_in_progress(ring):
+    ring.push(np.zeros(CHANNELS))
+    ring._header[shared_ring._SEQ] += 1
+    assert ring.latest_row(retries=5) is None
+    ring._header[shared_ring._SEQ] += 1
+    assert ring.latest_row() is not None
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_reads_are_never_torn(ring):
+    rows = 200_000
+    writer = multiprocessing.get_context('fork').Process(target=_writer, args=(ring.name, rows))
+    writer.start()
+    latest = windows = 0
+    deadline = time.monotonic() + 30
+    while writer.is_alive() and time.monotonic() < deadline:
+        row = ring.latest_row()
+        if row is not None:
+            # Every channel of a row is written with the same value
+            assert (row == row[0]).all()
+            latest += 1
+        window = ring.window(16)
+        if len(window):
+            assert (window == window[:, :1]).all()
+            assert (np.diff(window[:, 0]) == 1).all()
+            windows += 1
+    writer.join()
+    assert writer.exitcode == 0
+    assert ring.count == rows
+    assert ring.latest_row()[0] == rows
+    assert latest and windows
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import stage_timer
+from stage_timer import StageHistogram, StageTimer, bucket, bucket_upper
+
+
+def test_buckets_cover_every_duration_once():
+    previous = -1
+    for ns in sorted(set(range(5000)) | {2 ** k + d for k in range(12, 40) for d in (-1, 0, 1)}):
+        index = bucket(ns)
+        assert index >= previous
+        previous = index
+        assert ns <= bucket_upper(index)
+        if index:
+            assert ns > bucket_upper(index - 1)
+
+
+def test_bucket_width_is_a_quarter_octave():
+    for index in range(8, 200):
+        low = bucket_upper(index - 1) + 1
+        assert bucket_upper(index) - low + 1 <= low / 4
+
+
+def test_quantiles_within_a_bucket():
+    rng = random.Random(1)
+    samples = [int(rng.lognormvariate(13, 1)) for _ in range(10000)]
+    hist = StageHistogram()
+    for ns in samples:
+        hist.add(ns)
+    samples.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = samples[int(q * len(samples)) - 1]
+        assert exact <= hist.quantile(q) <= exact * 1.25
+    assert hist.quantile(1.0) == hist.max == samples[-1]
+    assert hist.total == sum(samples)
+
+    hist.clear()
+    assert hist.count == 0 and hist.quantile(0.5) == 0
+
+
+def test_timer_laps_and_summary(tmp_path, monkeypatch):
+    clock = iter(range(1000, 10 ** 9, 1000))
+    monkeypatch.setattr(stage_timer.time, 'perf_counter_ns', lambda: next(clock))
+    summary = tmp_path / 'stage_times.txt'
+    timer = StageTimer(str(summary), toggle_signal=None)
+
+    for _ in range(10):
+        timer.start()
+        timer.lap('spi')
+        timer.lap('pid')
+        timer.end()
+    assert timer.stages['spi'].count == 10
+    assert timer.stages['spi'].max == 1000
+    assert timer.stages['cycle'].max == 3000
+
+    timer.enabled = False
+    timer.start()
+    timer.lap('spi')
+    timer.end()
+    assert timer.stages['spi'].count == 10
+
+    timer.write_summary()
+    lines = summary.read_text().splitlines()
+    assert lines[1].split() == ['stage', 'count', 'p50', 'p99', 'max', 'mean']
+    assert lines[2].split() == ['spi', '10', '0.001', '0.001', '0.001', '0.001']
+    assert timer.stages['cycle'].count == 0
+
+
+@pytest.mark.parametrize('ns', [0, 1, 7, 8, 9, 1023, 1024, 10 ** 12])
+def test_bucket_in_range(ns):
+    assert 0 <= bucket(ns) < stage_timer._BUCKETS
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from window_stats import SlidingStats
+
+
+@pytest.mark.parametrize('window', [1, 7, 100])
+def test_sliding_stats_match_numpy(window):
+    rng = np.random.default_rng(3)
+    # Large offset and a few genuine zeros, both of which the sums must survive
+    data = 1e6 + rng.normal(size=1000)
+    data[::97] = 0.0
+    stats = SlidingStats(window, ewma_alpha=0.1)
+    ewma = None
+    for k, x in enumerate(data, 1):
+        stats.push(x)
+        ewma = x if ewma is None else ewma + 0.1 * (x - ewma)
+        values = data[max(k - window, 0):k]
+        assert stats.count == len(values)
+        assert stats.mean == pytest.approx(values.mean(), rel=1e-12, abs=1e-6)
+        assert stats.std == pytest.approx(values.std(), rel=1e-6, abs=1e-4)
+        assert stats.min == values.min()
+        assert stats.max == values.max()
+        assert stats.ewma == pytest.approx(ewma)
+
+
+def test_sliding_stats_empty():
+    stats = SlidingStats(5)
+    assert stats.count == 0
+    assert np.isnan(stats.mean)
+    assert np.isnan(stats.variance)
@@ -0,0 +1,102 @@
+"""
+Incremental sliding-window statistics.
+
+SlidingStats keeps the mean, variance, min and max of the last `window`
+samples (and optionally an exponentially weighted mean) with O(1) work per
+sample, so the window can be tens of thousands of samples long without
+slowing down a GUI callback. Unlike a zero mask, the fill count is explicit,
+so genuine zero readings are counted like any other value.
+"""
+
+import math
+
+import numpy as np
+
+from ring_buffer import MonotonicWindow
+
+
+class SlidingStats:
+    """Mean, variance, min, max and EWMA over a sliding window"""
+
+    def __init__(self, window, ewma_alpha=None):
+        self.window = window
+        self.ewma_alpha = ewma_alpha
+        self._values = np.zeros(window)
+        self._extrema = MonotonicWindow(window)
+        self.total = 0
+        self.ewma = float('nan')
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self._shift = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    @property
+    def count(self):
+        """Number of samples currently in the window"""
+        return min(self.total, self.window)
+
+    def push(self, x):
+        x = float(x)
+        slot = self.total % self.window
+        if self._shift is None:
+            # Sums are kept relative to the first value to limit cancellation
+            self._shift = x
+        d = x - self._shift
+        if self.total >= self.window:
+            old = self._values[slot] - self._shift
+            self._sum -= old
+            self._sumsq -= old * old
+        self._values[slot] = x
+        self._sum += d
+        self._sumsq += d * d
+        self._extrema.push(x)
+        self.total += 1
+
+        if self.ewma_alpha is not None:
+            self.ewma = x if self.total == 1 else self.ewma + self.ewma_alpha * (x - self.ewma)
+
+        if self.total % self.window == 0:
+            self._resync()
+
+    def _resync(self):
+        # Recompute the sums from the stored window once per window length so
+        # add/subtract rounding cannot drift, amortised O(1) per sample
+        values = self._values[:self.count]
+        self._shift = float(values.mean())
+        d = values - self._shift
+        self._sum = float(d.sum())
+        self._sumsq = float(d @ d)
+
+    @property
+    def mean(self):
+        n = self.count
+        return self._shift + self._sum / n if n else float('nan')
+
+    @property
+    def variance(self):
+        """Population variance, as np.var"""
+        n = self.count
+        if not n:
+            return float('nan')
+        m = self._sum / n
+        return max(self._sumsq / n - m * m, 0.0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self):
+        return self._extrema.min
+
+    @property
+    def max(self):
+        return self._extrema.max
+
+    def clear(self):
+        self.total = 0
+        self.ewma = float('nan')
+        self._extrema.clear()
+        self._reset_sums()
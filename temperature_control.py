@@ -2,6 +2,7 @@ import time
 import csv
 import keyboard
 import os
+import sys
 from datetime import datetime as dt
 import numpy as np
 import traceback
@@ -9,6 +10,10 @@ import PID # Assuming PID.py is in the same directory
 from collections import deque
 import matplotlib.pyplot as plt
 
+# The shared calibration registry lives in temperature-control/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temperature-control'))
+from calibration import calibrated_temps
+
 # --- Conditional Imports for Mocking ---
 if os.environ.get('TEST_MODE') == '1':
     print("Running in TEST_MODE: Using mock hardware modules.")
@@ -20,7 +25,7 @@ else:
     import adafruit_max31856
 # --- End Conditional Imports ---
 
-# ... (rest of your functions: log_temps, open_file, calibrated_temps) ...
+# ... (rest of your functions: log_temps, open_file) ...
 def log_temps(log_file, data):
     temp_log_w = csv.writer(log_file)
     temp_log_w.writerow(data)
@@ -33,22 +38,6 @@ def open_file(file_name, data_header, root_dir):
     temp_log_w.writerow(data_header)
     return log_file
 
-def calibrated_temps(temp, TC):
-    ActualTemp = temp
-    if TC == 'HeatExB':
-        RawRange = 121
-        ReferenceRange = 126
-        ActualTemp = (((temp + 117) * ReferenceRange) / RawRange) - 108
-    elif TC == 'HeatExF':
-        RawRange = 184
-        ReferenceRange = 179
-        ActualTemp = (((temp + 174) * ReferenceRange) / RawRange) - 161
-    elif TC == 'ColdHead':
-        ActualTemp = temp
-    elif TC == 'Chamber':
-        ActualTemp = temp + 7.6
-    return ActualTemp
-
 if __name__ == '__main__':
     ROOT_DIR = os.path.realpath(os.path.dirname(__file__))
 
@@ -1,14 +1,19 @@
 import serial
 import os
+import sys
 import time
 from datetime import datetime as dt
 from datetime import timedelta
-import csv
 import matplotlib.pyplot as plt
 #matplotlib.use("tkAgg")
-import numpy as np
 from matplotlib.animation import FuncAnimation
 
+# Shared modules live next to the temperature control scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'temperature-control'))
+from log_rotation import RotationPolicy
+from log_writer import open_log
+from ring_buffer import RingBuffer
+
 # Initialize serial connection
 ser = serial.Serial(port='/dev/ttyACM0', baudrate=9600, timeout=1)
 ser.flush
@@ -17,8 +22,7 @@ ser.flushOutput()
 
 # Set window size and initialize data arrays
 plot_window = 100
-y_var = np.zeros(plot_window) 
-x_var = np.zeros(plot_window) 
+buffer = RingBuffer(plot_window, 2)  # elapsed time, capacitance
 #y_var = np.array(np.zeros([plot_window]))
 #x_var = [dt.now().strftime('%M:%S')]*plot_window
 
@@ -49,14 +53,11 @@ ax.set_title("Real-time Capacitance Measurement")
 ROOT_DIR = os.path.realpath(os.path.join(os.path.dirname("CapSerial_modified.py")))
 data_f_name = 'Cap_Serial_{}.csv'.format(dt.now().strftime('%m-%d-%Y-%H-%M-%S'))
 data_header = ['Real time \t' + 'Capacitance \t']
-log_file = log_file = open(os.path.join(ROOT_DIR, 'Logs', data_f_name), 'w', encoding='UTF8', newline='')
-cap_log_w=csv.writer(log_file)
-cap_log_w.writerow(data_header)
+log_file = open_log(os.path.join(ROOT_DIR, 'Logs'), data_f_name, data_header, rotation=RotationPolicy())
 
 def log_cap(data):
-        with open(os.path.join(ROOT_DIR, 'Logs', data_f_name), 'a', encoding='UTF8', newline='') as log_file:
-                cap_log_w=csv.writer(log_file)
-                cap_log_w.writerow(data)
+        # Queued, written by the log writer thread
+        log_file.write(data)
 
 #def open_file(file_name,data_header):
         #Open the log file in the Log subfolder of the working directory with the specified filename
@@ -72,8 +73,6 @@ start_time = time.time()
 
 def update(frame):
 
-        global y_var, x_var
-
 # Main loop to read serial data and update plot
 #while True:
         try:
@@ -89,13 +88,14 @@ def update(frame):
                 # Strip the newline and carriage return characters and decode the byte sequence to a string
                 str_value = ser_bytes.decode('utf-8').strip()
 
-                # If the data includes 'Value :', remove that part and convert the remaining part to an integer
+                # If the data includes 'Value :', remove that part and convert the remaining part to a number
                 if str_value.startswith("Value :"):
                     str_value = str_value.replace("Value :", "").strip()
 
-                # Now try converting the extracted numeric string to an integer
+                # Now try converting the extracted numeric string to a number
                 try:
-                    value = int(str_value)
+                    # First field of the Arduino's CSV line, a decimal mean when it averages
+                    value = float(str_value.split(',')[0])
                     print(f"Extracted Value: {value}")
                 except ValueError:
                     print(f"Invalid data received: {ser_bytes}")
@@ -104,19 +104,14 @@ def update(frame):
  
                 cap = round((value - 12288)/40944*4,5)
                 print(f"Capacitance: {cap} pF")
-                #y_var = np.append(y_var, cap)
-                y_var = np.roll(y_var,-1)
-                #x_var.append(dt.now().strftime('%M:%S'))
-                y_var[-1] = cap
-                #y_var = y_var[1: plot_window + 1]
-                x_var = np.roll(x_var,-1)
                 elapsed_time=time.time()-start_time
                 #Sets elapsed time in a format 00:00:00
                 elapsed_time_formatted = str(timedelta(seconds = elapsed_time))
                 print(f"Time: {elapsed_time_formatted}")
-                #x_var = [elapsed_time]*plot_window
-                #x_var[-1] = dt.now().strftime('%M:%S')
-                x_var[-1] = elapsed_time
+                # Ring buffer keeps the last plot_window samples in order, no per-sample copies
+                buffer.append((elapsed_time, cap))
+                x_var = buffer.channel(0)
+                y_var = buffer.channel(1)
                 
                 #log_cap(data_f_name, data_header,[elapsed_time, cap])
                 log_cap([elapsed_time_formatted, cap])    
@@ -130,8 +125,8 @@ def update(frame):
                 ax.autoscale_view()
                 
                 if len(x_var) > 1:
-                    x_min = min(x_var)
-                    x_max = max(x_var)
+                    x_min = buffer.min(0)
+                    x_max = buffer.max(0)
                     # Expand the range if limits are the same
                     if x_max == x_min:
                         x_max += 1  
@@ -144,8 +139,8 @@ def update(frame):
                 #ax.set_xlim(0, plot_window)
                     
                 #Autoscale the y_min and y_max values based on data
-                y_min = min(y_var) - 3
-                y_max = max(y_var) + 3
+                y_min = buffer.min(1) - 3
+                y_max = buffer.max(1) + 3
                 # Set y-axis range as needed    
                 ax.set_ylim(y_min, y_max)  
                 plt.legend()
@@ -158,6 +153,8 @@ ani = FuncAnimation(fig, update, interval=1000,cache_frame_data=False)  # Update
 
 # Show the plot
 plt.legend()
-plt.show()
-
-ser.close()
+try:
+        plt.show()
+finally:
+        ser.close()
+        log_file.close()
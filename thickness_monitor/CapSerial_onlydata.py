@@ -54,13 +54,14 @@ def update():
         # Debugging: Print the decoded string value
         print(f"Decoded string: {str_value}")
 
-        # If the data includes 'Value :', remove that part and convert the remaining part to an integer
+        # If the data includes 'Value :', remove that part and convert the remaining part to a number
         if str_value.startswith("Value:"):
             str_value = str_value.replace("Value:", "").strip()
 
         # Initialize 'value' only if valid data is present
         try:
-            value = int(str_value)  # Attempt to convert the value to an integer
+            # First field of the Arduino's CSV line, a decimal mean when it averages
+            value = float(str_value.split(',')[0])
             print(f"Extracted value: {value}")
         except ValueError:
             print(f"Invalid data received: {ser_bytes}")
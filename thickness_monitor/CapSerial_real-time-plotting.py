@@ -77,7 +77,8 @@ def update(frame):
             str_value = str_value.replace("Value :", "").strip()
 
         try:
-            value = int(str_value)
+            # First field of the Arduino's CSV line, a decimal mean when it averages
+            value = float(str_value.split(',')[0])
         except ValueError:
             return
 
@@ -1,16 +1,24 @@
 import serial
 import os
+import sys
 import time
-import csv
-import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-from matplotlib.animation import FuncAnimation
 import tkinter as tk
 from tkinter import ttk
 from datetime import datetime as dt, timedelta
 
+# Shared modules live next to the temperature control scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "temperature-control"))
+from log_rotation import RotationPolicy
+from log_writer import open_log
+from session_log import SessionWriter
+from ring_buffer import RingBuffer
+from window_stats import SlidingStats
+from ad7150_reader import parse_line
+from live_plot import BlitRenderer, band_limits, scroll_limits
+
 # ------------------ Serial Setup ------------------
 ser = serial.Serial(port='/dev/ttyACM1', baudrate=9600, timeout=1)
 
@@ -27,82 +35,119 @@ ax = fig.add_subplot(111)
 line, = ax.plot([], [], '-', label='Capacitance')
 ax.set_xlabel("Time (s)")
 ax.set_ylabel("Capacitance (pF)")
+ax.legend()
 canvas = FigureCanvasTkAgg(fig, master=root)
 canvas.get_tk_widget().pack()
+# Only the line is redrawn each frame, limits move when the data leaves them
+renderer = BlitRenderer(fig, [line])
 
 # ------------------ Data Buffers ------------------
 window_size = 200
-y_data = np.zeros(window_size)
-x_data = np.zeros(window_size)
+buffer = RingBuffer(window_size, 2, track_extrema=[1])  # elapsed, capacitance
+# Statistics window, independent of the plotted window so film noise can be
+# characterised over tens of thousands of samples
+stats_window = 20000
+cap_stats = SlidingStats(stats_window, ewma_alpha=0.05)
 start_time = time.time()
 
 # ------------------ File Logging ------------------
 log_dir = os.path.join(os.getcwd(), "Logs")
 os.makedirs(log_dir, exist_ok=True)
 filename = f"Cap_Serial_{dt.now().strftime('%m-%d-%Y-%H-%M-%S')}.csv"
-filepath = os.path.join(log_dir, filename)
 
-# Write header: all four Arduino fields + timestamp
-with open(filepath, 'w', newline='', encoding='UTF8') as f:
-    writer = csv.writer(f)
-    writer.writerow(['Time', 'ADC', 'CAPDAC', 'InputRange', 'Capacitance'])
+# Write header: all four Arduino fields + timestamp, gzipped 4 MB segments
+log_file = open_log(log_dir, filename, ['Time', 'ADC', 'CAPDAC', 'InputRange', 'Capacitance'],
+                    rotation=RotationPolicy())
+
+# Binary session log alongside the CSV, same columns
+session = SessionWriter(
+    os.path.join(log_dir, filename.replace(".csv", ".session")),
+    # adc is a decimal mean when the Arduino averages (AVG > 1)
+    [("t_ns", "i8"), ("adc", "f8"), ("capdac", "i4"), ("input_range", "f8"), ("capacitance", "f8")],
+    [{"name": "Time", "field": "t_ns", "format": "elapsed_s"},
+     {"name": "ADC", "field": "adc"},
+     {"name": "CAPDAC", "field": "capdac"},
+     {"name": "InputRange", "field": "input_range"},
+     {"name": "Capacitance", "field": "capacitance"}],
+    start_ns=int(start_time * 1e9),
+)
 
 def log_row(elapsed, adc, capdac, ir, cap):
-    with open(filepath, 'a', newline='', encoding='UTF8') as f:
-        writer = csv.writer(f)
-        writer.writerow([elapsed, adc, capdac, ir, cap])
+    log_file.write([elapsed, adc, capdac, ir, cap])
 
 # ------------------ Update Function ----------------
-def update(frame):
-    global y_data, x_data
+# Bytes of a line still being received
+pending = b''
 
-    try:
-        line_str = ser.readline().decode().strip()
-        if not line_str or line_str.startswith("ADC"):  # skip Arduino header
-            return
+def handle_line(raw):
+    """Buffers, stats and logs one Arduino line, returns its capacitance or None"""
+    # Parse Arduino CSV line, None for the header and partial lines
+    fields = parse_line(raw)
+    if fields is None:
+        return None
 
-        # Parse Arduino CSV line
-        parts = line_str.split(",")
-        if len(parts) != 4:
-            return
+    adc, capdac, ir, cap = fields
 
-        adc, capdac, ir, cap = parts
-        adc, capdac, ir, cap = int(adc), int(capdac), float(ir), float(cap)
+    # Update buffers
+    elapsed = time.time() - start_time
+    buffer.append((elapsed, cap))
 
-        # Update buffers
-        elapsed = time.time() - start_time
-        y_data = np.roll(y_data, -1); y_data[-1] = cap
-        x_data = np.roll(x_data, -1); x_data[-1] = elapsed
+    # Rolling stats, O(1) per sample
+    cap_stats.push(cap)
 
-        # Rolling stats (ignore zeros at startup)
-        valid = y_data[y_data != 0]
-        cap_avg = np.mean(valid) if valid.size else 0
-        cap_std = np.std(valid) if valid.size else 0
+    # Log everything
+    log_row(str(timedelta(seconds=int(elapsed))), adc, capdac, ir, cap)
+    session.append((time.time_ns(), adc, capdac, ir, cap))
+    return cap
+
+def update():
+    global pending
+    try:
+        # Take every line that arrived since the last tick: the Arduino sends
+        # about 10 a second, one per 100 ms tick would fall further behind
+        pending += ser.read(ser.in_waiting)
+        *lines, pending = pending.split(b'\n')
+        caps = [cap for cap in map(handle_line, lines) if cap is not None]
+        if not caps:
+            return
+        cap = caps[-1]
+        x_data = buffer.channel(0)
+        y_data = buffer.channel(1)
 
         # Update label
         cap_label.config(
             text=f"Capacitance: {cap:.5f} pF\n"
-                 f"Rolling Avg: {cap_avg:.5f} pF\n"
-                 f"Rolling Std: {cap_std:.5f} pF"
+                 f"Rolling Avg: {cap_stats.mean:.5f} pF\n"
+                 f"Rolling Std: {cap_stats.std:.5f} pF\n"
+                 f"EWMA: {cap_stats.ewma:.5f} pF\n"
+                 f"Samples: {cap_stats.count}/{stats_window}"
         )
 
-        # Log everything
-        log_row(str(timedelta(seconds=int(elapsed))), adc, capdac, ir, cap)
-
-        # Update plot
-        line.set_ydata(y_data)
-        line.set_xdata(x_data - x_data[0])
-        ax.set_xlim(0, max(20, x_data[-1] - x_data[0]))
-        ax.set_ylim(min(y_data) - 0.5, max(y_data) + 0.5)
-        ax.legend()
-        canvas.draw()
+        # Update plot, once per tick however many lines came in
+        line.set_data(x_data - x_data[0], y_data)
+        xlim = scroll_limits(0, max(20, x_data[-1] - x_data[0]), ax.get_xlim())
+        ylim = band_limits(buffer.min(1) - 0.5, buffer.max(1) + 0.5, ax.get_ylim(), pad=0)
+        if xlim is not None:
+            ax.set_xlim(xlim)
+        if ylim is not None:
+            ax.set_ylim(ylim)
+        renderer.draw(full=xlim is not None or ylim is not None)
 
     except Exception:
         pass
 
 # ------------------ Animation ----------------------
-ani = FuncAnimation(fig, update, interval=100, blit=False, cache_frame_data=False)
+# A plain Tk timer, FuncAnimation would also schedule a full redraw per frame
+def tick():
+    update()
+    root.after(100, tick)
+
+root.after(100, tick)
 
 # ------------------ Mainloop -----------------------
-root.mainloop()
-ser.close()
+try:
+    root.mainloop()
+finally:
+    ser.close()
+    log_file.close()
+    session.close()